@@ -10,6 +10,10 @@ from shared.model.article import (
     FetchArticleError,
     ArticleIssue,
 )
+from shared.util.url import url_key
+import dedup
+
+MAX_FINGERPRINT_CANDIDATES = 20
 
 
 class NotFoundError(Exception):
@@ -25,24 +29,33 @@ class NotFoundError(Exception):
 def store_requested_article(
     client: datastore.Client, request: RequestedArticle, note: Optional[str] = None
 ) -> Tuple[str, bool]:
+    """
+    Note: requests are deduplicated by url_key (see shared.util.url), so
+    variants of an article's url are stored as one article (under the url
+    first requested).
+    """
     url = request.url
     try:
-        id = find_article_id(client, url=url)
+        id = find_article_id_by_url(client, url)
         if note is not None:
             _ = store_article_note(client, article_id=id, note=note)
         return (id, False)
 
     except NotFoundError:
-        id = store_article(client, request)
+        id = store_article(client, request, url=url)
         if note is not None:
             _ = store_article_note(client, article_id=id, note=note)
         return (id, True)
 
 
 def store_fetched_article(
-    client: datastore.Client, id: str, url: str, article: FetchedArticle
+    client: datastore.Client,
+    id: str,
+    url: str,
+    article: FetchedArticle,
+    duplicate_of: Optional[str] = None,
 ) -> str:
-    return store_article(client, article, id=id, url=url)
+    return store_article(client, article, id=id, url=url, duplicate_of=duplicate_of)
 
 
 def store_fetch_article_error(
@@ -55,18 +68,81 @@ def find_article_id(client, **params) -> str:
     return find_id(client, kind="Article", **params)
 
 
+def find_article_id_by_url(client: datastore.Client, url: str) -> str:
+    """
+    Note: articles stored without a url_key (before it was added) are found by
+    their url instead, and their url_key is set then, so they are found by it
+    from then on.
+    """
+    key = url_key(url)
+    try:
+        return find_article_id(client, url_key=key)
+    except NotFoundError:
+        id = find_article_id(client, url=url)
+        update(client, {"url_key": key}, kind="Article", id=id)
+        return id
+
+
 def store_article(
     client: datastore.Client,
     article: Article,
     id: Optional[str] = None,
     url: Optional[str] = None,
+    duplicate_of: Optional[str] = None,
 ) -> str:
     data = article.to_json()
     if url is not None:
         data["url"] = url
+        data["url_key"] = url_key(url)
+    if duplicate_of is not None:
+        data["duplicate_of"] = duplicate_of
     return store(client, data, kind="Article", id=id)
 
 
+def find_near_duplicate(
+    client: datastore.Client, article_id: str, fingerprint: int
+) -> Optional[str]:
+    """
+    The id of another article with a near-duplicate text fingerprint (see
+    dedup), if any. Note if that article is itself a duplicate, the id of the
+    article it duplicates is returned instead.
+    """
+    candidates = {}
+    for band in dedup.bands(fingerprint):
+        query = client.query(kind="ArticleFingerprint")
+        query.add_filter("bands", "=", band)
+        for entity in query.fetch(limit=MAX_FINGERPRINT_CANDIDATES):
+            id = entity.key.id_or_name
+            if str(id) != str(article_id):
+                candidates[id] = entity
+
+    found = dedup.nearest(
+        fingerprint,
+        [(id, dedup.from_signed(e["simhash"])) for (id, e) in candidates.items()],
+    )
+    if found is None:
+        return None
+    return candidates[found].get("duplicate_of", None) or found
+
+
+def store_article_fingerprint(
+    client: datastore.Client,
+    article_id: str,
+    fingerprint: int,
+    duplicate_of: Optional[str] = None,
+) -> str:
+    return store(
+        client,
+        {
+            "simhash": dedup.to_signed(fingerprint),
+            "bands": dedup.bands(fingerprint),
+            "duplicate_of": duplicate_of,
+        },
+        kind="ArticleFingerprint",
+        id=article_id,
+    )
+
+
 def store_article_note(client: datastore.Client, article_id: str, note: str) -> str:
     return store(
         client, {"note": note}, parent=["Article", article_id], kind="ArticleNote"
@@ -133,6 +209,16 @@ def find(
         raise NotFoundError(kind=kind, params=params)
 
 
+def update(client: datastore.Client, data: dict, kind: str, id: str, parent=[]):
+    """ Note: sets the given properties, keeping the others """
+    with client.transaction():
+        entity = client.get(client.key(*parent, kind, id))
+        if entity is None:
+            raise NotFoundError(kind=kind, params={"id": id})
+        entity.update(data)
+        client.put(entity)
+
+
 def select(
     client: datastore.Client,
     kind: str,
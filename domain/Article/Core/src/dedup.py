@@ -0,0 +1,106 @@
+from collections import Counter
+from hashlib import blake2b
+import re
+from typing import Iterator, List, Optional, Tuple
+
+"""
+Near-duplicate detection for fetched articles (e.g. the same syndicated story
+under different urls), using 64-bit SimHash fingerprints of the article text.
+Texts that differ only slightly have fingerprints that differ in only a few
+bits.
+
+For lookup, fingerprints are split into BANDS bands of 16 bits. Two
+fingerprints within MAX_DISTANCE bits of each other (MAX_DISTANCE < BANDS)
+must agree exactly on at least one band, so candidates can be found by exact
+lookup of each band (which the datastore indexes), and then checked by
+Hamming distance.
+
+Texts of fewer than MIN_WORDS words are not fingerprinted (see fingerprint):
+paywall stubs, cookie walls and "subscribe to read" notices from one site are
+near duplicates of each other, but not of the articles they stand in for.
+
+Note fingerprints are stored as signed 64-bit ints, as the datastore expects.
+"""
+
+BITS = 64
+BANDS = 4
+BAND_BITS = BITS // BANDS
+MAX_DISTANCE = 3
+SHINGLE_SIZE = 3
+MIN_WORDS = 200
+
+WORD = re.compile(r"\w+")
+
+
+def fingerprint(text: Optional[str], min_words: int = MIN_WORDS) -> Optional[int]:
+    """ The simhash of the text, or None if it is missing or too short """
+    if text is None:
+        return None
+    words = WORD.findall(text.lower())
+    if len(words) < min_words:
+        return None
+    return simhash_words(words)
+
+
+def simhash(text: str) -> Optional[int]:
+    """ None if the text has no words """
+    return simhash_words(WORD.findall(text.lower()))
+
+
+def simhash_words(words: List[str]) -> Optional[int]:
+    features = Counter(shingles(words))
+    if len(features) == 0:
+        return None
+    weights = [0] * BITS
+    for (feature, count) in features.items():
+        h = feature_hash(feature)
+        for i in range(BITS):
+            weights[i] = weights[i] + (count if h >> i & 1 else -count)
+    return sum(1 << i for (i, w) in enumerate(weights) if w > 0)
+
+
+def shingles(words: List[str], size: int = SHINGLE_SIZE) -> Iterator[str]:
+    if len(words) < size:
+        return iter(words)
+    return (" ".join(words[i : i + size]) for i in range(len(words) - size + 1))
+
+
+def feature_hash(feature: str) -> int:
+    return int.from_bytes(
+        blake2b(feature.encode("utf8"), digest_size=BITS // 8).digest(), "big"
+    )
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def bands(fingerprint: int) -> List[str]:
+    mask = (1 << BAND_BITS) - 1
+    return [
+        "%d:%04x" % (i, fingerprint >> (i * BAND_BITS) & mask) for i in range(BANDS)
+    ]
+
+
+def nearest(
+    fingerprint: int,
+    candidates: Iterator[Tuple[str, int]],
+    max_distance: int = MAX_DISTANCE,
+) -> Optional[str]:
+    """ The id of the closest candidate within max_distance, if any """
+    found = None
+    found_distance = max_distance + 1
+    for (id, candidate) in candidates:
+        distance = hamming(fingerprint, candidate)
+        if distance < found_distance:
+            found = id
+            found_distance = distance
+    return found
+
+
+def to_signed(fingerprint: int) -> int:
+    return fingerprint - (1 << BITS) if fingerprint >= 1 << (BITS - 1) else fingerprint
+
+
+def from_signed(value: int) -> int:
+    return value + (1 << BITS) if value < 0 else value
@@ -67,6 +67,10 @@ def local_logging():
     return not remote_logging()
 
 
+def logging_connect_timeout():
+    return float(os.environ.get("APP_LOGGING_CONNECT_TIMEOUT", 2.0))
+
+
 # ------------------------------------------------------------------------------
 # Environment variables: Runtime
 # ------------------------------------------------------------------------------
@@ -114,29 +118,25 @@ def logging_client():
 
 
 def init_logging():
+    """
+    Note: connects to Stackdriver in the background, so as not to delay cold
+    starts; logs locally if not connected within logging_connect_timeout().
+    """
     if local_logging():
         logging.init_local_logging(level=logging_level(), labels=log_labels())
         return
 
-    try:
-        logging.init_logging(
+    logging.init_deferred_logging(
+        lambda: logging.remote_handler(
             logging_client(),
-            level=logging_level(),
             labels=log_labels(),
             resource_type=log_resource_type(),
             resource_labels=log_resource_labels(),
-        )
-        return
-
-    except Exception as e:
-        logging.init_local_logging(logging_level(), labels=log_labels())
-        logger = logging.get_logger(__name__)
-        logger.warning(
-            "Note: unable to connect to Stackdriver logging, logging locally. "
-            "(Error: {error})",
-            log_record(error=str(e)),
-        )
-        return
+        ),
+        level=logging_level(),
+        labels=log_labels(),
+        timeout=logging_connect_timeout(),
+    )
 
 
 def get_logger(name):
@@ -1,3 +1,7 @@
+from shared.util import startup
+
+startup.begin()  # before other imports, to time them (if profiling startup)
+
 from shared.adapter import pubsub
 from shared.adapter import logging
 from shared.command import UnknownCommandError
@@ -5,10 +9,12 @@ from shared.command import core as core_command
 from shared.event import core as core_event
 from shared.event import fetch as fetch_event
 from shared.model.article import RequestedArticle, ArticleIssues
+from shared.util import lazy_json
 from shared.util.url import standardized_url
 
 import adapter.storage as storage
 
+import dedup
 import env
 
 
@@ -16,7 +22,8 @@ def done(x=None, returning=""):
     return returning
 
 
-env.init_logging()
+with startup.phase("init_logging"):
+    env.init_logging()
 logger = env.get_logger(__name__)
 
 # ------------------------------------------------------------------------------
@@ -40,19 +47,44 @@ def _core(command: core_command.Command, attributes: dict, ctx) -> str:
         id = command.id
         url = standardized_url(command.url)
         article = command.article
+        fingerprint = dedup.fingerprint(article.text)
+        duplicate_of = (
+            None
+            if fingerprint is None
+            else storage.find_near_duplicate(env.storage_client(), id, fingerprint)
+        )
         _ = storage.store_fetched_article(
-            env.storage_client(), id, url=url, article=article
+            env.storage_client(),
+            id,
+            url=url,
+            article=article,
+            duplicate_of=duplicate_of,
         )
+        if fingerprint is not None:
+            _ = storage.store_article_fingerprint(
+                env.storage_client(), id, fingerprint, duplicate_of=duplicate_of
+            )
+        if duplicate_of is not None:
+            logger.info(
+                "Article {id} is a near duplicate of {duplicate_of}",
+                env.log_record(
+                    log_type="NearDuplicateArticle", id=id, duplicate_of=duplicate_of
+                ),
+            )
 
         issue_ids = []
         try:
-            article.validate()
+            article.validate()  # only if Fetch did not (trusts its issues if it did)
         except ArticleIssues as w:
             issue_ids = storage.store_article_issues_unless_ignored(
                 env.storage_client(), article_id=id, issues=w.issues
             )
 
-        env.publish(core_event.SavedFetchedArticle(id=id, url=url).to_json())
+        env.publish(
+            core_event.SavedFetchedArticle(
+                id=id, url=url, duplicate_of=duplicate_of
+            ).to_json()
+        )
         if len(issue_ids) > 0:
             env.publish(
                 core_event.SavedArticleIssues(
@@ -97,8 +129,11 @@ def _from_fetch(event: fetch_event.Event, attributes: dict, ctx) -> str:
 # ------------------------------------------------------------------------------
 
 handle_errors = logging.log_errors(logger, on_error=done, on_warning=done)
-command_adapter = pubsub.gcf_adapter(core_command.from_json)
-fetch_event_adapter = pubsub.gcf_adapter(fetch_event.from_json)
-
-core = handle_errors(command_adapter(_core))
-from_fetch = handle_errors(fetch_event_adapter(_from_fetch))
+flush_logs = logging.flush_logs()
+command_adapter = pubsub.gcf_adapter(core_command.from_json, loads=lazy_json.loads)
+fetch_event_adapter = pubsub.gcf_adapter(fetch_event.from_json, loads=lazy_json.loads)
+
+core = startup.profiled(flush_logs(handle_errors(command_adapter(_core))), logger)
+from_fetch = startup.profiled(
+    flush_logs(handle_errors(fetch_event_adapter(_from_fetch))), logger
+)
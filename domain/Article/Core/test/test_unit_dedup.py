@@ -0,0 +1,89 @@
+from random import Random
+
+from hypothesis import given
+import hypothesis.strategies as hyp
+import pytest
+
+import dedup
+
+STORY = """
+The council met on Tuesday to discuss the new budget for the city parks, which
+has been delayed for several months because of disagreements about how the
+money should be spent. Residents who spoke at the meeting asked for more trees
+and for the playgrounds to be repaired before the summer, when most families
+visit. The mayor said a final vote would be held next month, after a review of
+the costs by the finance committee, and that she expected it to pass.
+"""
+
+OTHER_STORY = """
+Heavy rain flooded several roads on the east side of town overnight, and the
+fire department rescued two drivers whose cars stalled in high water. Schools
+opened two hours late, and the weather service warned that more storms could
+arrive by the weekend, with the river expected to crest on Saturday.
+"""
+
+ARTICLE = (
+    STORY
+    + OTHER_STORY
+    + STORY.replace("council", "board")
+    + OTHER_STORY.replace("rain", "snow")
+)
+
+
+@pytest.mark.unit
+def test_simhash_near_duplicates():
+    fp = dedup.simhash(ARTICLE)
+    assert dedup.hamming(fp, dedup.simhash(ARTICLE)) == 0
+    for variant in [
+        "By The Associated Press. " + ARTICLE,
+        ARTICLE.replace("Tuesday", "Wednesday"),
+        ARTICLE + " Copyright 2019 The Associated Press. All rights reserved.",
+    ]:
+        assert dedup.hamming(fp, dedup.simhash(variant)) <= dedup.MAX_DISTANCE
+    assert dedup.hamming(fp, dedup.simhash(STORY)) > dedup.MAX_DISTANCE
+    assert dedup.hamming(fp, dedup.simhash(OTHER_STORY)) > dedup.MAX_DISTANCE
+
+
+@pytest.mark.unit
+def test_simhash_no_words():
+    assert dedup.simhash("") is None
+    assert dedup.simhash(" -- ") is None
+
+
+@pytest.mark.unit
+def test_short_or_missing_texts_are_not_fingerprinted():
+    assert dedup.fingerprint(ARTICLE) == dedup.simhash(ARTICLE)
+    assert dedup.fingerprint(None) is None
+    assert dedup.fingerprint(STORY) is None
+    assert dedup.fingerprint("Subscribe to read the full story. " * 5) is None
+
+
+@given(fingerprint=hyp.integers(min_value=0, max_value=(1 << 64) - 1))
+@pytest.mark.unit
+def test_signed_round_trip(fingerprint):
+    signed = dedup.to_signed(fingerprint)
+    assert -(1 << 63) <= signed < 1 << 63
+    assert dedup.from_signed(signed) == fingerprint
+
+
+@given(
+    fingerprint=hyp.integers(min_value=0, max_value=(1 << 64) - 1),
+    seed=hyp.integers(),
+    distance=hyp.integers(min_value=0, max_value=dedup.MAX_DISTANCE),
+)
+@pytest.mark.unit
+def test_bands_find_near_fingerprints(fingerprint, seed, distance):
+    bits = Random(seed).sample(range(dedup.BITS), distance)
+    near = fingerprint
+    for bit in bits:
+        near = near ^ (1 << bit)
+    assert len(set(dedup.bands(fingerprint)) & set(dedup.bands(near))) > 0
+
+
+@pytest.mark.unit
+def test_nearest():
+    fp = 0b1111
+    candidates = [("a", 0b0000), ("b", 0b0111), ("c", 0b1110), ("d", 0b1111 << 8)]
+    assert dedup.nearest(fp, candidates) == "b"
+    assert dedup.nearest(fp, [("a", 0b0000)]) is None
+    assert dedup.nearest(fp, []) is None
@@ -13,10 +13,11 @@ from shared.adapter.pubsub import gcf_encoding
 from shared.util.test import assert_serialized_event
 from shared.command import core as core_command
 from shared.event import core as core_event
-from shared.util.url import standardized_url
+from shared.util.url import standardized_url, url_key
 from shared.model import article
 
 from main import core
+import dedup
 import env
 
 from test.util.examples import (
@@ -54,6 +55,29 @@ def test_core_success_request_article(requested_article_data):
     assert storage_util.requested_article_exists(db, url=standardized_url(command.url))
 
 
+@given(url=url_examples())
+@settings(deadline=None, max_examples=3)
+@pytest.mark.unit
+def test_core_request_article_finds_article_stored_without_url_key(url):
+    db = env.storage_client()
+    storage_util.zap_articles(db)
+
+    id, _ = storage_util.store_requested_article(
+        db, article.RequestedArticle(url=standardized_url(url))
+    )
+    assert "url_key" not in storage_util.find_article(db, url=standardized_url(url))
+
+    command = core_command.RequestArticle(url=url)
+    message, ctx = gcf_encoding(command.to_json(), {})
+    with patch("env.publish") as publish:
+        assert core(message, ctx) == ""
+
+    publish.assert_not_called()
+    actual = storage_util.find_article(db, url=standardized_url(url))
+    assert actual.id == id
+    assert actual["url_key"] == url_key(url)
+
+
 @given(
     url=url_examples(), fetched_article_data=fetched_article_examples(dates_near=TODAY)
 )
@@ -154,6 +178,56 @@ def test_core_success_save_fetch_article_error(url, fetch_article_error_data):
     _ = article.FetchArticleError.from_json(actual)
 
 
+STORY = " ".join(
+    "Paragraph %d of a story about the new budget for the city parks." % (i,)
+    for i in range(30)
+)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "text,near_duplicate",
+    [
+        (STORY, None),
+        (STORY, "2"),
+        ("Subscribe to read this story.", None),
+        (None, None),
+    ],
+)
+def test_core_fingerprints_fetched_article(text, near_duplicate):
+    fetched = article.FetchedArticle(
+        title="Parks", authors=[], encoding="utf8", text=text, html="<p/>"
+    )
+    command = core_command.SaveFetchedArticle(
+        id="1", url="https://example.com/parks", article=fetched
+    )
+    message, ctx = gcf_encoding(command.to_json(), {})
+
+    with patch("env.storage_client"), patch("env.publish") as publish, patch(
+        "adapter.storage.store_fetched_article"
+    ) as store_fetched, patch(
+        "adapter.storage.store_article_issues_unless_ignored", return_value=[]
+    ), patch(
+        "adapter.storage.find_near_duplicate", return_value=near_duplicate
+    ) as find_near_duplicate, patch(
+        "adapter.storage.store_article_fingerprint"
+    ) as store_fingerprint:
+        assert core(message, ctx) == ""
+
+    if text != STORY:  # too short to fingerprint
+        find_near_duplicate.assert_not_called()
+        store_fingerprint.assert_not_called()
+        assert store_fetched.call_args[1]["duplicate_of"] is None
+        return
+    fingerprint = dedup.fingerprint(STORY)
+    assert find_near_duplicate.call_args[0][1:] == ("1", fingerprint)
+    assert store_fetched.call_args[1]["duplicate_of"] == near_duplicate
+    assert store_fingerprint.call_args[0][1:] == ("1", fingerprint)
+    assert store_fingerprint.call_args[1] == {"duplicate_of": near_duplicate}
+    saved = publish.call_args_list[0][0][0]
+    assert saved["duplicate_of"] == near_duplicate
+
+
 """ Failure test -- not needed yet
 @pytest.mark.unit
 def test_core_failure_retry_example():
@@ -68,7 +68,6 @@ def fetched_article_examples(dates_near=None, dates_range=(7, 7), size=1500):
             "title": hyp.text(),
             "authors": hyp.lists(hyp.text()),
             "encoding": hyp.just("utf8"),
-            "raw_html": hyp.text(),
             "text": hyp.text(),
             "html": hyp.text(min_size=size, max_size=size),
             "publish_date": date_gen,
@@ -19,6 +19,7 @@ class NotFoundError(Exception):
 def zap_articles(client: datastore.Client):
     zap(client, "Article")
     zap(client, "ArticleIssue")
+    zap(client, "ArticleFingerprint")
 
 
 ##### PLEASE NOTE: these are duplicated from the actual adapter.storage.
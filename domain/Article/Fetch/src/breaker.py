@@ -0,0 +1,152 @@
+from threading import Lock
+from time import time
+from typing import Any, Callable, Optional, Tuple, Type
+
+import env
+
+"""
+Per-domain circuit breaker. After `threshold` consecutive failures for a
+domain, the circuit opens and calls for that domain fail fast with
+CircuitOpen, without trying any configs. After `reset_timeout` seconds, one
+trial call is let through (half-open): if it succeeds the circuit closes, if
+it fails it opens again.
+
+Breaker state is kept in a pluggable BreakerStore. Note the only store is
+MemoryBreakerStore, so for now each instance has its own breakers, which
+start closed on each cold start. Updates are read-modify-write with last
+write winning, which is fine for this purpose: at worst a few extra calls get
+through.
+"""
+
+logger = env.get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+THRESHOLD = 5
+RESET_TIMEOUT = 300
+
+
+class CircuitOpen(Exception):
+    """
+    Note: not a retry (see RetryException), so that requests for a failing
+    site are shed: each fails once, instead of being retried while the
+    circuit is open.
+    """
+
+    def __init__(self, domain: str, retry_after: float):
+        self.domain = domain
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return "Circuit open for %s: not fetching for another %d seconds" % (
+            self.domain,
+            self.retry_after,
+        )
+
+
+class BreakerStore:
+    def get(self, domain: str) -> Optional[dict]:
+        raise NotImplementedError()
+
+    def set(self, domain: str, state: dict):
+        raise NotImplementedError()
+
+
+class MemoryBreakerStore(BreakerStore):
+    def __init__(self):
+        self.states = {}
+
+    def get(self, domain: str) -> Optional[dict]:
+        return self.states.get(domain, None)
+
+    def set(self, domain: str, state: dict):
+        self.states[domain] = state
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        store: Optional[BreakerStore] = None,
+        threshold: int = THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        failure_class: Tuple[Type[Exception], ...] = (Exception,),
+    ):
+        self.store = MemoryBreakerStore() if store is None else store
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failure_class = failure_class
+        self._lock = Lock()
+
+    def call(self, domain: str, fn: Callable, *args, **kwargs) -> Any:
+        self.before_call(domain)
+        try:
+            result = fn(*args, **kwargs)
+        except self.failure_class:
+            self.record_failure(domain)
+            raise
+        self.record_success(domain)
+        return result
+
+    def state(self, domain: str) -> dict:
+        state = self.store.get(domain)
+        return (
+            {"state": CLOSED, "failures": 0, "opened_at": None}
+            if state is None
+            else state
+        )
+
+    def before_call(self, domain: str):
+        with self._lock:
+            state = self.state(domain)
+            if state["state"] == CLOSED:
+                return
+
+            waited = time() - state["opened_at"]
+            if waited < self.reset_timeout:
+                raise CircuitOpen(domain, self.reset_timeout - waited)
+
+            # Let one trial call through, and hold the rest off for another
+            # reset_timeout while it runs.
+            self.store.set(
+                domain,
+                {
+                    "state": HALF_OPEN,
+                    "failures": state["failures"],
+                    "opened_at": time(),
+                },
+            )
+
+    def record_success(self, domain: str):
+        with self._lock:
+            state = self.state(domain)
+            if state["state"] == CLOSED and state["failures"] == 0:
+                return
+            self.store.set(domain, {"state": CLOSED, "failures": 0, "opened_at": None})
+        if state["state"] != CLOSED:
+            logger.info(
+                "Circuit closed for {domain}",
+                env.log_record(log_type="CircuitClosed", domain=domain),
+            )
+
+    def record_failure(self, domain: str):
+        with self._lock:
+            state = self.state(domain)
+            failures = state["failures"] + 1
+            opening = state["state"] == HALF_OPEN or failures >= self.threshold
+            self.store.set(
+                domain,
+                {
+                    "state": OPEN if opening else CLOSED,
+                    "failures": failures,
+                    "opened_at": time() if opening else None,
+                },
+            )
+        if opening:
+            logger.warning(
+                "Circuit opened for {domain} after {failures} consecutive failures",
+                env.log_record(
+                    log_type="CircuitOpened", domain=domain, failures=failures
+                ),
+            )
@@ -1,58 +1,88 @@
-from time import sleep
-from typing import Iterator
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from time import sleep, time
+from typing import Callable, Iterable, Iterator, Optional
 from urllib.parse import urlparse
 
-from html2text import HTML2Text
-from markdown2 import markdown
-
 from shared.adapter.logging import RetryException
 from shared.adapter import logging
-from shared.model.article import FetchedArticle
-from config import Config, Downloader, MetadataParser, BodyParser
+from shared.model.article import FetchedArticle, ArticleIssues, METADATA, BODY
+from shared.util.singleflight import SingleFlight
+from shared.util.url import url_key, learn_canonical_url
+from config import Config
+from deadline import Deadline, call_with_timeout, stage_budget
+import breaker
 import env
+import parsing
+import sites
+import stats
 import strategy
-import strategy.newspaper
-import strategy.bs
-import strategy.lxml
+from strategy.registry import strategies
 
 logger = env.get_logger(__name__)
 
-CONFIG_MAP = {
-    "nytimes.com": [
-        Config(
-            body_parser=BodyParser.BeautifulSoup,
-            body_parser_options={
-                "html_parsers": ["lxml", "html.parser", "html5lib"],
-                "css_selectors": ["article .meteredContent"],
-            },
-        )
-    ]
-}
+site_configs = sites.SiteConfigs(env.site_config_file())
+strategy_stats = stats.StrategyStats(
+    backend=(
+        None
+        if env.strategy_stats_file() is None
+        else stats.FileStatsBackend(env.strategy_stats_file())
+    )
+)
 
 
 class FetchError(RetryException):
     pass
 
 
-def configs_for_url(url: str) -> Iterator[Config]:
-    _, key = url_site_and_domain(url)
-    return CONFIG_MAP.get(key, [Config()])
+circuit_breaker = breaker.CircuitBreaker(failure_class=(FetchError,))
+parse_engine = parsing.ParseEngine(
+    max_workers=env.parse_workers(), inline=env.parse_inline()
+)
+
 
+@dataclass
+class FetchResult:
+    url: str
+    article: Optional[FetchedArticle] = None
+    error: Optional[Exception] = None
+
+
+def configs_for_url(url: str) -> Iterator[Config]:
+    site, domain = url_site_and_domain(url)
+    return strategy_stats.order(domain, site_configs.configs_for_host(site))
+
+
+def fetch(
+    url: str,
+    configs: Iterator[Config],
+    pause=2,
+    deadline: Optional[Deadline] = None,
+    keep_page: bool = False,
+) -> FetchedArticle:
+    """
+    Note: each stage runs within its budget (see deadline), and no further
+    configs are tried once the deadline, if given, has passed. The article is
+    validated as it is parsed (see shared.model.article.ValidatorRegistry): an
+    attempt ends early if a fatal validator rejects it. The downloaded page is
+    only kept on the article (as page) if keep_page.
+    """
 
-def fetch(url: str, configs: Iterator[Config], pause=2) -> FetchedArticle:
     def _fetch():
         tries = 0
         for config in configs:
+            if deadline is not None and deadline.expired():
+                return
             tries = tries + 1
             html = None
             article = None
-            body = None
             download_ctx = download_context(url, config.downloader)
-            meta_ctx = metadata_parse_context(url, config.metadata_parser)
-            body_ctx = body_parse_context(url, config.body_parser)
+            fetch_ctx = strategy.FetchContext(url=url)
 
             if tries > 1:  # pause before trying another download
-                sleep(pause)
+                sleep(pause if deadline is None else min(pause, deadline.remaining()))
+            t0 = time()
 
             try:
                 with logging.log_elapsed(
@@ -61,65 +91,261 @@ def fetch(url: str, configs: Iterator[Config], pause=2) -> FetchedArticle:
                     context=download_ctx,
                     raise_error=True,
                 ):
-                    html = get_downloader(config)(url)
-            except Exception:
-                continue
-
-            try:
-                with logging.log_elapsed(
-                    "Metadata parsing from {url_site} with {metadata_parser}",
-                    logger,
-                    context=meta_ctx,
-                    raise_error=True,
-                ):
-                    article = get_metadata_parser(config)(url, html)
+                    fetch_ctx.deadline = stage_deadline("download", config, deadline)
+                    html = get_downloader(config)(url, context=fetch_ctx)
+            except strategy.DownloadRejected:
+                raise  # no point trying other configs
             except Exception:
+                record_attempt(url, config, t0)
                 continue
 
             try:
-                with logging.log_elapsed(
-                    "Article body parsing from {url_site} with {body_parser}",
-                    logger,
-                    context=body_ctx,
-                    raise_error=True,
-                ):
-                    body = get_body_parser(config)(url, html, article)
+                article = (
+                    parse_stages(url, html, config, fetch_ctx, deadline)
+                    if parse_engine.inline()
+                    else parse_in_worker(url, html, config, fetch_ctx, deadline)
+                )
             except Exception:
+                record_attempt(url, config, t0)
                 continue
 
-            article.text = markdown_from_html(body)
-            article.html = markdown(article.text)
+            if keep_page:
+                article.page = html
+            record_attempt(url, config, t0, article)
+            if fetch_ctx.final_url is not None:
+                learn_canonical_url(url, fetch_ctx.final_url, verified=True)
+            if fetch_ctx.canonical_url is not None:
+                learn_canonical_url(url, fetch_ctx.canonical_url)
             yield article
 
     try:
         return next(_fetch())
     except StopIteration:
+        if deadline is not None and deadline.expired():
+            raise FetchError("Deadline passed before fetching %s" % (url,))
         raise FetchError("All %d fetch strategies failed for %s" % (len(configs), url))
 
 
+def parse_stages(
+    url: str,
+    html: str,
+    config: Config,
+    fetch_ctx: strategy.FetchContext,
+    deadline: Optional[Deadline] = None,
+) -> FetchedArticle:
+    with logging.log_elapsed(
+        "Metadata parsing from {url_site} with {metadata_parser}",
+        logger,
+        context=metadata_parse_context(url, config.metadata_parser),
+        raise_error=True,
+    ):
+        fetch_ctx.deadline = stage_deadline("metadata_parse", config, deadline)
+        article = call_with_timeout(
+            "metadata_parse",
+            fetch_ctx.deadline.seconds,
+            get_metadata_parser(config),
+            url,
+            html,
+            context=fetch_ctx,
+        )
+    article.check(METADATA)
+
+    with logging.log_elapsed(
+        "Article body parsing from {url_site} with {body_parser}",
+        logger,
+        context=body_parse_context(url, config.body_parser),
+        raise_error=True,
+    ):
+        fetch_ctx.deadline = stage_deadline("body_parse", config, deadline)
+        body = call_with_timeout(
+            "body_parse",
+            fetch_ctx.deadline.seconds,
+            get_body_parser(config),
+            url,
+            html,
+            article,
+            context=fetch_ctx,
+        )
+
+    from normalize import text_and_html  # on first use (see strategy.registry)
+
+    article.set_body(body, text_and_html)
+    article.check(BODY)
+    return article
+
+
+def parse_in_worker(
+    url: str,
+    html: str,
+    config: Config,
+    fetch_ctx: strategy.FetchContext,
+    deadline: Optional[Deadline] = None,
+) -> FetchedArticle:
+    """
+    Note: parses with the parse engine's worker processes, within the
+    combined metadata and body parsing budgets.
+    """
+    context = metadata_parse_context(url, config.metadata_parser)
+    context.update(body_parse_context(url, config.body_parser))
+    with logging.log_elapsed(
+        "Parsing from {url_site} with {metadata_parser} and {body_parser} "
+        "in a worker process",
+        logger,
+        context=context,
+        raise_error=True,
+    ):
+        return parse_engine.parse(
+            url,
+            html,
+            config,
+            context=fetch_ctx,
+            timeout=stage_budget("metadata_parse", config.stage_budgets, deadline)
+            + stage_budget("body_parse", config.stage_budgets, deadline),
+        )
+
+
+def stage_deadline(
+    stage: str, config: Config, deadline: Optional[Deadline] = None
+) -> Deadline:
+    return Deadline.after(stage_budget(stage, config.stage_budgets, deadline))
+
+
+def record_attempt(
+    url: str, config: Config, t0: float, article: Optional[FetchedArticle] = None
+):
+    _, domain = url_site_and_domain(url)
+    issues = False
+    if article is not None:
+        try:
+            article.validate()
+        except ArticleIssues:
+            issues = True
+    strategy_stats.record(
+        domain, config, success=article is not None, seconds=time() - t0, issues=issues
+    )
+
+
+def fetch_many(
+    urls: Iterable[str],
+    configs_for: Optional[Callable[[str], Iterator[Config]]] = None,
+    max_workers: int = 8,
+    max_per_host: int = 2,
+    pause=2,
+) -> Iterator[FetchResult]:
+    """
+    Fetch a batch of urls concurrently in a thread pool, yielding results as
+    they complete (not in the order given). At most max_workers fetches run at
+    once, and at most max_per_host of those against any one site. Each url is
+    fetched with its own list of configs (by default from configs_for_url).
+    Pages are parsed by parse_engine, so with several parse workers (see
+    env.parse_workers) the threads download while parsing uses every core.
+
+    Note errors are not raised, but returned in the FetchResult, including
+    errors finding a url's site or configs.
+    """
+    if max_workers < 1 or max_per_host < 1:
+        raise ValueError("Expected max_workers and max_per_host to be at least 1")
+    configs_for = configs_for_url if configs_for is None else configs_for
+
+    pending = deque(urls)
+    running = {}
+    host_counts = Counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while len(pending) > 0 or len(running) > 0:
+            deferred = []
+            while len(pending) > 0 and len(running) < max_workers:
+                url = pending.popleft()
+                try:
+                    site, _ = url_site_and_domain(url)
+                    if host_counts[site] >= max_per_host:
+                        deferred.append(url)
+                        continue
+                    configs = configs_for(url)
+                except Exception as e:
+                    yield FetchResult(url=url, error=e)
+                    continue
+                host_counts[site] = host_counts[site] + 1
+                future = executor.submit(fetch_coalesced, url, configs, pause)
+                running[future] = (url, site)
+            pending.extendleft(reversed(deferred))
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, site = running.pop(future)
+                host_counts[site] = host_counts[site] - 1
+                error = future.exception()
+                yield FetchResult(
+                    url=url,
+                    article=None if error is not None else future.result(),
+                    error=error,
+                )
+
+
+def fetch_guarded(
+    url: str,
+    configs: Iterator[Config],
+    pause=2,
+    deadline: Optional[Deadline] = None,
+) -> FetchedArticle:
+    """
+    Like fetch, but through the circuit breaker for the url's site (by its
+    registrable or configured domain, see url_site_and_domain): raises
+    breaker.CircuitOpen without fetching if the site has been failing.
+    """
+    _, domain = url_site_and_domain(url)
+    return circuit_breaker.call(domain, fetch, url, configs, pause, deadline)
+
+
+def fetch_coalesced(
+    url: str,
+    configs: Iterator[Config],
+    pause=2,
+    deadline: Optional[Deadline] = None,
+) -> FetchedArticle:
+    """
+    Like fetch_guarded, but if a fetch of the same article (by url_key) is
+    already in progress on this instance, wait for and return its result
+    instead of fetching again. Note the same FetchedArticle is returned to all callers
+    (and the fetch runs to the first caller's deadline).
+    """
+    return inflight.do(url_key(url), fetch_guarded, url, configs, pause, deadline)
+
+
+async def fetch_coalesced_async(
+    url: str,
+    configs: Iterator[Config],
+    pause=2,
+    deadline: Optional[Deadline] = None,
+) -> FetchedArticle:
+    return await inflight.do_async(
+        url_key(url), fetch_guarded, url, configs, pause, deadline
+    )
+
+
+def log_coalesced(url: str):
+    logger.info(
+        "Coalesced fetch of {url} with one already in progress "
+        "({coalesced} coalesced in total)",
+        env.log_record(
+            log_type="CoalescedFetch", url=url, coalesced=inflight.coalesced
+        ),
+    )
+
+
+inflight = SingleFlight(on_coalesced=log_coalesced)
+
+
 def get_downloader(config: Config) -> strategy.Downloader:
-    if config.downloader == Downloader.Newspaper:
-        return strategy.newspaper.Downloader(config.downloader_options)
-    else:
-        raise ValueError("Unknown downloader: %s" % (config.downloader,))
+    return strategies.downloader(config)
 
 
 def get_metadata_parser(config: Config) -> strategy.MetadataParser:
-    if config.metadata_parser == MetadataParser.Newspaper:
-        return strategy.newspaper.MetadataParser(config.metadata_parser_options)
-    else:
-        raise ValueError("Unknown metadata parser: %s" % (config.metadata_parser,))
+    return strategies.metadata_parser(config)
 
 
 def get_body_parser(config: Config) -> strategy.BodyParser:
-    if config.body_parser == BodyParser.Newspaper:
-        return strategy.newspaper.BodyParser(config.body_parser_options)
-    elif config.body_parser == BodyParser.BeautifulSoup:
-        return strategy.bs.BodyParser(config.body_parser_options)
-    elif config.body_parser == BodyParser.LXML:
-        return strategy.lxml.BodyParser(config.body_parser_options)
-    else:
-        raise ValueError("Unknown body parser: %s" % (config.body_parser,))
+    return strategies.body_parser(config)
 
 
 def download_context(url, downloader):
@@ -153,12 +379,6 @@ def body_parse_context(url, body_parser):
 
 
 def url_site_and_domain(url):
+    """ Note: the domain is the key of the site's state (see sites.site_key) """
     _, site, _, _, _, _ = urlparse(url)
-    return (site, ".".join(site.split(".")[-2:]))
-
-
-def markdown_from_html(html):
-    md_maker = HTML2Text()
-    md_maker.escape_snob = True
-    md_maker.inline_links = False
-    return md_maker.handle(html)
+    return (site, site_configs.site_key(site))
@@ -0,0 +1,196 @@
+from collections import OrderedDict
+from hashlib import sha1
+import json
+import os
+import os.path
+from threading import Lock
+from time import time
+from typing import Callable, Iterator, Optional
+
+from shared.model.article import FetchedArticle
+from shared.util.url import url_key
+from config import Config
+import env
+
+"""
+Cache of fetched articles, keyed by standardized url and the fingerprints of
+the configs used to fetch it (so changing a site's configs invalidates its
+cached articles). Entries are stored serialized, with the time they were
+stored, and expire after a TTL. Backends are bounded in size; see CacheBackend
+to plug in a remote store.
+"""
+
+logger = env.get_logger(__name__)
+
+TTL = 24 * 60 * 60
+MAX_ENTRIES = 256
+
+
+def cache_key(url: str, configs: Iterator[Config]) -> str:
+    fingerprints = sorted(config.fingerprint() for config in configs)
+    encoded = "|".join([url_key(url)] + fingerprints).encode("utf8")
+    return sha1(encoded).hexdigest()
+
+
+class CacheBackend:
+    def get(self, key: str) -> Optional[dict]:
+        raise NotImplementedError()
+
+    def set(self, key: str, entry: dict):
+        raise NotImplementedError()
+
+
+class NullCacheBackend(CacheBackend):
+    def get(self, key: str) -> Optional[dict]:
+        return None
+
+    def set(self, key: str, entry: dict):
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    """ Least-recently-used, up to max_entries """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class DiskCacheBackend(CacheBackend):
+    """
+    One JSON file per entry in dirname. When there are more than max_entries,
+    the least recently written are removed.
+    """
+
+    def __init__(self, dirname: str, max_entries: int = MAX_ENTRIES):
+        self.dirname = dirname
+        self.max_entries = max_entries
+        os.makedirs(dirname, exist_ok=True)
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._fname(key), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key: str, entry: dict):
+        tmpname = "%s.%d.tmp" % (self._fname(key), os.getpid())
+        with open(tmpname, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmpname, self._fname(key))
+        self._prune()
+
+    def _fname(self, key: str) -> str:
+        return os.path.join(self.dirname, key + ".json")
+
+    def _prune(self):
+        entries = [e for e in os.scandir(self.dirname) if e.name.endswith(".json")]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for e in entries[: len(entries) - self.max_entries]:
+            try:
+                os.remove(e.path)
+            except OSError:
+                pass
+
+
+class ResultCache:
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl: float = TTL):
+        self.backend = MemoryCacheBackend() if backend is None else backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_fetch(
+        self, key: str, fetch: Callable[[], FetchedArticle], bypass: bool = False
+    ) -> FetchedArticle:
+        """
+        Return the cached article for key if there is one and it has not
+        expired, otherwise fetch and cache it. If bypass, always fetch (and
+        replace any cached article).
+        """
+        article = None if bypass else self.get(key)
+        if article is not None:
+            self.hits = self.hits + 1
+            self.log("Fetch cache hit", key, "FetchCacheHit")
+            return article
+
+        self.misses = self.misses + 1
+        self.log(
+            "Fetch cache bypassed" if bypass else "Fetch cache miss",
+            key,
+            "FetchCacheBypass" if bypass else "FetchCacheMiss",
+        )
+        article = fetch()
+        self.set(key, article)
+        return article
+
+    def get(self, key: str) -> Optional[FetchedArticle]:
+        try:
+            entry = self.backend.get(key)
+            if entry is None or time() - entry["stored_at"] > self.ttl:
+                return None
+            return FetchedArticle.from_json(entry["article"])
+        except Exception as e:
+            self.log_error("Unable to read fetch cache", key, e)
+            return None
+
+    def set(self, key: str, article: FetchedArticle):
+        try:
+            self.backend.set(
+                key, {"stored_at": time(), "article": article.to_json(full=True)}
+            )
+        except Exception as e:
+            self.log_error("Unable to write fetch cache", key, e)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return 0.0 if total == 0 else self.hits / total
+
+    def log(self, msg: str, key: str, log_type: str):
+        logger.info(
+            msg + " ({hits} hits, {misses} misses, hit rate {hit_rate:.2f})",
+            env.log_record(
+                log_type=log_type,
+                cache_key=key,
+                hits=self.hits,
+                misses=self.misses,
+                hit_rate=self.hit_rate(),
+            ),
+        )
+
+    def log_error(self, msg: str, key: str, error: Exception):
+        logger.warning(
+            msg + ": {error}",
+            env.log_record(log_type="FetchCacheError", cache_key=key, error=str(error)),
+        )
+
+
+def backend_for(
+    backend_type: str, dirname: str, max_entries: int = MAX_ENTRIES
+) -> CacheBackend:
+    if backend_type == "memory":
+        return MemoryCacheBackend(max_entries)
+    elif backend_type == "disk":
+        return DiskCacheBackend(dirname, max_entries)
+    elif backend_type == "none":
+        return NullCacheBackend()
+    else:
+        raise ValueError("Unknown fetch cache type: %s" % (backend_type,))
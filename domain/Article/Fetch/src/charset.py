@@ -0,0 +1,77 @@
+import codecs
+import re
+from typing import Optional, Union
+
+"""
+Layered charset resolution for downloaded html. In order:
+
+1. the charset in the HTTP Content-Type header, if any;
+2. a <meta charset> or <meta http-equiv="Content-Type"> in the first few KB
+   of the document;
+3. utf-8, if the whole document decodes as utf-8 (which other charsets
+   rarely do by accident);
+4. detection over the whole document with UnicodeDammit (which uses cchardet
+   when it is installed), only if none of the above is found.
+
+Declared charsets that Python doesn't recognize are skipped.
+"""
+
+HEAD_SIZE = 4096
+DEFAULT_ENCODING = "utf8"
+
+CONTENT_TYPE_CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+META_CHARSET = re.compile(r"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+META_CHARSET_BYTES = re.compile(META_CHARSET.pattern.encode("ascii"), re.I)
+
+
+def resolve_encoding(
+    html: Union[str, bytes], content_type: Optional[str] = None
+) -> str:
+    encoding = encoding_from_content_type(content_type)
+    if encoding is None:
+        encoding = encoding_from_meta(html)
+    if encoding is None:
+        encoding = detect_encoding(html)
+    return encoding
+
+
+def encoding_from_content_type(content_type: Optional[str]) -> Optional[str]:
+    if content_type is None:
+        return None
+    match = CONTENT_TYPE_CHARSET.search(content_type)
+    return None if match is None else known_encoding(match.group(1))
+
+
+def encoding_from_meta(html: Union[str, bytes], head_size=HEAD_SIZE) -> Optional[str]:
+    head = html[:head_size]
+    if isinstance(head, bytes):
+        match = META_CHARSET_BYTES.search(head)
+        return None if match is None else known_encoding(match.group(1).decode("ascii"))
+    else:
+        match = META_CHARSET.search(head)
+        return None if match is None else known_encoding(match.group(1))
+
+
+def detect_encoding(html: Union[str, bytes]) -> str:
+    """
+    Note: str input has already been decoded, so there is nothing to detect
+    (UnicodeDammit reports no original encoding for it); use the default.
+    """
+    if isinstance(html, str):
+        return DEFAULT_ENCODING
+    try:
+        html.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    from bs4 import UnicodeDammit  # on first use: bs4 is slow to import
+
+    attempt = UnicodeDammit(html, is_html=True).original_encoding
+    return DEFAULT_ENCODING if attempt is None else attempt
+
+
+def known_encoding(name: str) -> Optional[str]:
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
@@ -1,9 +1,14 @@
 from dataclasses import dataclass, field
 from enum import Enum
+from hashlib import sha1
+import json
+
+from deadline import DEFAULT_BUDGETS
 
 
 class Downloader(Enum):
     Newspaper = 1
+    Replay = 2
 
 
 class MetadataParser(Enum):
@@ -16,7 +21,7 @@ class BodyParser(Enum):
     LXML = 3
 
 
-@dataclass
+@dataclass(frozen=True)
 class Config:
     downloader: Downloader = Downloader.Newspaper
     downloader_options: dict = field(default_factory=dict)
@@ -24,3 +29,64 @@ class Config:
     metadata_parser_options: dict = field(default_factory=dict)
     body_parser: BodyParser = BodyParser.Newspaper
     body_parser_options: dict = field(default_factory=dict)
+    stage_budgets: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        """ Note: the fingerprint is computed once, as the config is frozen """
+        encoded = json.dumps(self.to_json(), sort_keys=True).encode("utf8")
+        object.__setattr__(self, "_fingerprint", sha1(encoded).hexdigest()[:16])
+
+    @classmethod
+    def from_json(cls, d: dict) -> "Config":
+        """
+        Note: strategies are given by enum name, e.g. `body_parser: LXML`.
+        Missing keys take the defaults; unknown keys or names raise ValueError.
+        Stage budgets are in seconds, by stage name (see deadline).
+        """
+        unknown = set(d.keys()) - set(cls.__dataclass_fields__.keys())
+        if len(unknown) > 0:
+            raise ValueError("Unknown config keys: %s" % (", ".join(sorted(unknown)),))
+        stage_budgets = {k: float(v) for (k, v) in d.get("stage_budgets", {}).items()}
+        unknown = set(stage_budgets.keys()) - set(DEFAULT_BUDGETS.keys())
+        if len(unknown) > 0:
+            raise ValueError("Unknown stages: %s" % (", ".join(sorted(unknown)),))
+        return cls(
+            downloader=enum_from_json(Downloader, d.get("downloader", "Newspaper")),
+            downloader_options=dict(d.get("downloader_options", {})),
+            metadata_parser=enum_from_json(
+                MetadataParser, d.get("metadata_parser", "Newspaper")
+            ),
+            metadata_parser_options=dict(d.get("metadata_parser_options", {})),
+            body_parser=enum_from_json(BodyParser, d.get("body_parser", "Newspaper")),
+            body_parser_options=dict(d.get("body_parser_options", {})),
+            stage_budgets=stage_budgets,
+        )
+
+    def to_json(self) -> dict:
+        """ Note: stage_budgets only if set, so fingerprints of others are kept """
+        d = {
+            "downloader": self.downloader.name,
+            "downloader_options": self.downloader_options,
+            "metadata_parser": self.metadata_parser.name,
+            "metadata_parser_options": self.metadata_parser_options,
+            "body_parser": self.body_parser.name,
+            "body_parser_options": self.body_parser_options,
+        }
+        if len(self.stage_budgets) > 0:
+            d["stage_budgets"] = self.stage_budgets
+        return d
+
+    def fingerprint(self) -> str:
+        """
+        A short, stable identifier for the config (equal configs have equal
+        fingerprints, across processes). Note the options are not copied: they
+        must not be changed once the config is built.
+        """
+        return self._fingerprint
+
+
+def enum_from_json(enum, name: str):
+    try:
+        return enum[name]
+    except KeyError:
+        raise ValueError("Unknown %s: %s" % (enum.__name__, name))
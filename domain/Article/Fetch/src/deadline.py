@@ -0,0 +1,83 @@
+from threading import Thread
+from time import time
+from typing import Any, Callable, Optional
+
+"""
+Deadlines for fetches, and time budgets for the stages of a fetch attempt.
+
+A Deadline is set when the invocation starts and passed down to each stage.
+A stage gets the lesser of its budget (per domain, from the config's
+stage_budgets, or DEFAULT_BUDGETS) and the time left before the deadline.
+
+Stages that run code we control check their deadline cooperatively (see
+FetchContext.check_deadline): only downloads (whose requests also time out by
+the deadline) and the BeautifulSoup body parser are interrupted this way.
+Parsing stages run in a worker process (see parsing.ParseEngine) within
+their combined budgets: when they run over budget the worker is killed, and
+the fetch attempt fails with StageTimeout and moves on to the next config.
+If parsing inline (see env.parse_inline), parsing stages run under a watchdog
+thread instead (see call_with_timeout), which cannot be killed: an abandoned
+Newspaper or lxml parse runs on in the background until it finishes.
+"""
+
+DEFAULT_BUDGETS = {"download": 15.0, "metadata_parse": 10.0, "body_parse": 10.0}
+
+
+class StageTimeout(Exception):
+    def __init__(self, stage: str, seconds: float):
+        self.stage = stage
+        self.seconds = seconds
+
+    def __str__(self):
+        return "%s did not finish within %.1f seconds" % (self.stage, self.seconds)
+
+
+class Deadline:
+    def __init__(self, expires_at: float, seconds: Optional[float] = None):
+        self.expires_at = expires_at
+        self.seconds = seconds
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time() + seconds, seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, stage: str):
+        if self.expired():
+            raise StageTimeout(stage, 0.0 if self.seconds is None else self.seconds)
+
+
+def stage_budget(
+    stage: str, budgets: dict = {}, deadline: Optional[Deadline] = None
+) -> float:
+    budget = budgets.get(stage, DEFAULT_BUDGETS[stage])
+    return budget if deadline is None else min(budget, deadline.remaining())
+
+
+def call_with_timeout(stage: str, seconds: float, fn: Callable, *args, **kwargs) -> Any:
+    """
+    Run fn in a watchdog thread, raising StageTimeout if it has not finished
+    within seconds. Note fn is not stopped: it runs on until it finishes, or
+    until it checks its deadline (see FetchContext.check_deadline).
+    """
+    outcome = {}
+
+    def _run():
+        try:
+            outcome["result"] = fn(*args, **kwargs)
+        except BaseException as e:
+            outcome["error"] = e
+
+    worker = Thread(target=_run, name="stage-%s" % (stage,), daemon=True)
+    worker.start()
+    worker.join(seconds)
+    if worker.is_alive():
+        raise StageTimeout(stage, seconds)
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
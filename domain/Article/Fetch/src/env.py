@@ -65,6 +65,67 @@ def local_logging():
     return not remote_logging()
 
 
+def logging_connect_timeout():
+    return float(os.environ.get("APP_LOGGING_CONNECT_TIMEOUT", 2.0))
+
+
+def fetch_cache_type():
+    """
+    Note: one of "memory" (default), "disk", or "none" to disable the cache.
+    """
+    return os.environ.get("APP_FETCH_CACHE", "memory")
+
+
+def fetch_cache_dir():
+    return os.environ.get("APP_FETCH_CACHE_DIR", "/tmp/fetch-cache")
+
+
+def fetch_cache_ttl():
+    return int(os.environ.get("APP_FETCH_CACHE_TTL", 24 * 60 * 60))
+
+
+def fetch_cache_size():
+    return int(os.environ.get("APP_FETCH_CACHE_SIZE", 256))
+
+
+def fetch_deadline():
+    """
+    Note: seconds allowed for fetching, by default leaving 10 seconds of the
+    function timeout to publish the result.
+    """
+    default = int(os.environ.get("FUNCTION_TIMEOUT_SEC", 60)) - 10
+    return float(os.environ.get("APP_FETCH_DEADLINE", default))
+
+
+def parse_workers():
+    """
+    Note: worker processes for parsing (see parsing.ParseEngine); 0 means one
+    per CPU.
+    """
+    return int(os.environ.get("APP_PARSE_WORKERS", 1))
+
+
+def parse_inline():
+    """
+    Note: if set, pages are parsed in the calling thread instead of worker
+    processes, so over-budget parses cannot be stopped (see deadline).
+    """
+    return os.environ.get("APP_PARSE_INLINE", None) == "1"
+
+
+def strategy_stats_file():
+    """
+    Note: if not set, strategy stats are kept in memory only.
+    """
+    return os.environ.get("APP_STRATEGY_STATS_FILE", None)
+
+
+def site_config_file():
+    return os.environ.get(
+        "APP_SITE_CONFIG", os.path.join(os.path.dirname(__file__), "sites.yaml")
+    )
+
+
 # ------------------------------------------------------------------------------
 # Environment variables: Runtime
 # ------------------------------------------------------------------------------
@@ -112,29 +173,25 @@ def logging_client():
 
 
 def init_logging():
+    """
+    Note: connects to Stackdriver in the background, so as not to delay cold
+    starts; logs locally if not connected within logging_connect_timeout().
+    """
     if local_logging():
         logging.init_local_logging(level=logging_level(), labels=log_labels())
         return
 
-    try:
-        logging.init_logging(
+    logging.init_deferred_logging(
+        lambda: logging.remote_handler(
             logging_client(),
-            level=logging_level(),
             labels=log_labels(),
             resource_type=log_resource_type(),
             resource_labels=log_resource_labels(),
-        )
-        return
-
-    except Exception as e:
-        logging.init_local_logging(logging_level(), labels=log_labels())
-        logger = logging.get_logger(__name__)
-        logger.warning(
-            "Note: unable to connect to Stackdriver logging, logging locally. "
-            "(Error: {error})",
-            log_record(error=str(e)),
-        )
-        return
+        ),
+        level=logging_level(),
+        labels=log_labels(),
+        timeout=logging_connect_timeout(),
+    )
 
 
 def get_logger(name):
@@ -1,3 +1,9 @@
+from shared.util import startup
+
+startup.begin()  # before other imports, to time them (if profiling startup)
+
+from typing import Optional
+
 from shared.adapter import logging
 from shared.adapter import pubsub
 from shared.event.fetch import (
@@ -9,16 +15,30 @@ import shared.event.core as core_event
 from shared.model.article import FetchedArticle, ArticleIssues
 
 import browser
+import cache
+from deadline import Deadline
 import env
+import stats
 
-env.init_logging()
+with startup.phase("init_logging"):
+    env.init_logging()
 logger = env.get_logger(__name__)
 
+fetch_cache = cache.ResultCache(
+    cache.backend_for(
+        env.fetch_cache_type(), env.fetch_cache_dir(), env.fetch_cache_size()
+    ),
+    ttl=env.fetch_cache_ttl(),
+)
+
 
 def _fetch(event: core_event.Event, metadata: dict, ctx) -> str:
     if isinstance(event, core_event.SavedNewRequestedArticle):
+        deadline = Deadline.after(env.fetch_deadline())
         try:
-            article = _fetch_article(event.url)
+            article = _fetch_article(
+                event.url, refetch=is_refetch(metadata), deadline=deadline
+            )
             article.validate()
             env.publish(
                 SucceededFetchingArticle(
@@ -47,9 +67,22 @@ def _fetch(event: core_event.Event, metadata: dict, ctx) -> str:
     return done()  # Unhandled event
 
 
-def _fetch_article(url: str) -> FetchedArticle:
+def _fetch_article(
+    url: str, refetch: bool = False, deadline: Optional[Deadline] = None
+) -> FetchedArticle:
     configs = browser.configs_for_url(url)
-    return browser.fetch(url, configs)
+    return fetch_cache.get_or_fetch(
+        cache.cache_key(url, configs),
+        lambda: browser.fetch_coalesced(url, configs, deadline=deadline),
+        bypass=refetch,
+    )
+
+
+def is_refetch(metadata: dict) -> bool:
+    """
+    Note: set the message attribute `refetch` to "1" to bypass the fetch cache.
+    """
+    return metadata.get("refetch", None) == "1"
 
 
 def done(x=None, returning=""):
@@ -61,6 +94,10 @@ def done(x=None, returning=""):
 # ------------------------------------------------------------------------------
 
 handle_errors = logging.log_errors(logger, on_error=done, on_warning=done)
+flush_logs = logging.flush_logs()
+flush_stats = stats.flush_stats(browser.strategy_stats)
 message_adapter = pubsub.gcf_adapter(core_event.from_json)
 
-fetch = handle_errors(message_adapter(_fetch))
+fetch = startup.profiled(
+    flush_logs(flush_stats(handle_errors(message_adapter(_fetch)))), logger
+)
@@ -0,0 +1,48 @@
+from threading import local
+from typing import Tuple
+
+from html2text import HTML2Text
+from markdown2 import Markdown
+
+"""
+Normalization of an extracted article body into markdown text, and html
+rendered from that text (so the html we publish contains only what survives
+the markdown conversion).
+
+Note this is two conversions, as before: html to markdown by HTML2Text, then
+markdown to html by markdown2. Rendering the html from the body directly
+would not give the same html. The markdown renderer is reused per thread (it
+is reset on each conversion, but is not thread-safe). HTML2Text is not reset
+between documents, so a fresh one is made each time (with the settings
+below).
+"""
+
+_converters = local()
+
+
+def text_and_html(body: str) -> Tuple[str, str]:
+    text = markdown_from_html(body)
+    return (text, html_from_markdown(text))
+
+
+def markdown_from_html(html: str) -> str:
+    return html_to_markdown_converter().handle(html)
+
+
+def html_from_markdown(text: str) -> str:
+    return markdown_to_html_converter().convert(text)
+
+
+def html_to_markdown_converter() -> HTML2Text:
+    md_maker = HTML2Text()
+    md_maker.escape_snob = True
+    md_maker.inline_links = False
+    return md_maker
+
+
+def markdown_to_html_converter() -> Markdown:
+    converter = getattr(_converters, "markdown", None)
+    if converter is None:
+        converter = Markdown()
+        _converters.markdown = converter
+    return converter
@@ -0,0 +1,232 @@
+import multiprocessing
+import os
+import pickle
+from queue import Empty, Queue
+from threading import Lock
+from time import time
+from typing import Any, Optional, Tuple, Union
+
+from shared.model.article import FetchedArticle, METADATA, BODY
+from config import Config
+from deadline import StageTimeout
+import strategy
+
+"""
+Engine for parsing downloaded pages into articles (metadata parse, body parse
+and markdown conversion) in worker processes, so that parsing is not limited
+to one core by the GIL. Downloads can run in threads, each handing its page
+to the engine and waiting for the article.
+
+Workers are started as needed, up to max_workers (with the strategy modules
+imported), and kept warm; each keeps its strategy objects by config, between
+tasks. Even with one worker (the default), pages are parsed in a worker
+process, so that a parse over its budget can be stopped. An inline engine
+parses in the calling thread instead.
+
+Each worker runs one task at a time, sent over its own pipe. A running task
+cannot be interrupted, so when a parse runs over its timeout its worker is
+killed, and a new one is started when next needed.
+"""
+
+
+class WorkerError(Exception):
+    """ An error raised in a worker that could not be sent back as it was """
+
+    pass
+
+
+class ParseEngine:
+    def __init__(self, max_workers: Optional[int] = None, inline: bool = False):
+        """ Note: max_workers of None or 0 means one per CPU """
+        self.max_workers = (
+            (os.cpu_count() or 1) if max_workers in (None, 0) else max_workers
+        )
+        self._inline = inline
+        self._lock = Lock()
+        self._idle: Queue = Queue()
+        self._started = 0
+
+    def inline(self) -> bool:
+        return self._inline
+
+    def parse(
+        self,
+        url: str,
+        html: Union[bytes, str],
+        config: Config,
+        context: Optional[strategy.FetchContext] = None,
+        timeout: Optional[float] = None,
+    ) -> FetchedArticle:
+        """
+        Parse and wait for the article, raising StageTimeout after timeout
+        seconds (killing the worker). The content type and encoding are taken
+        from the context, and the canonical url found is set on it.
+        """
+        args = (
+            url,
+            html,
+            config,
+            None if context is None else context.content_type,
+            None if context is None else context.encoding,
+        )
+        if self.inline():
+            article, canonical_url = parse(*args)
+        else:
+            article, canonical_url = self.run(args, timeout)
+        if context is not None and canonical_url is not None:
+            context.canonical_url = canonical_url
+        return article
+
+    def run(self, args: tuple, timeout: Optional[float] = None):
+        """ Note: a task whose worker died (not by timeout) is run once more """
+        deadline = None if timeout is None else time() + timeout
+        for attempt in (1, 2):
+            worker = self.acquire(deadline)
+            try:
+                ok, value = worker.run(
+                    args, None if deadline is None else max(0.0, deadline - time())
+                )
+            except TimeoutError:
+                self.discard(worker)
+                raise StageTimeout("parse", timeout)
+            except (EOFError, OSError):
+                self.discard(worker)
+                if attempt == 2:
+                    raise WorkerError("Parse worker exited")
+                continue
+            self._idle.put(worker)
+            if not ok:
+                raise value
+            return value
+
+    def acquire(self, deadline: Optional[float] = None) -> "Worker":
+        """ An idle worker, started if there is none and fewer than max_workers """
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            start = self._started < self.max_workers
+            if start:
+                self._started = self._started + 1
+        if start:
+            try:
+                return Worker()
+            except BaseException:
+                with self._lock:
+                    self._started = self._started - 1
+                raise
+        try:
+            return self._idle.get(
+                timeout=None if deadline is None else max(0.0, deadline - time())
+            )
+        except Empty:
+            raise StageTimeout("parse", 0.0)
+
+    def discard(self, worker: "Worker"):
+        worker.kill()
+        with self._lock:
+            self._started = self._started - 1
+
+    def shutdown(self):
+        """ Note: stops the idle workers; those running tasks stop when done """
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except Empty:
+                return
+            self.discard(worker)
+
+
+class Worker:
+    """ A worker process, running one task at a time sent over its pipe """
+
+    def __init__(self):
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=work, args=(child_conn,), name="parse-worker", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def run(self, args: tuple, timeout: Optional[float] = None) -> Tuple[bool, Any]:
+        """
+        (True, result) or (False, error raised), or raises TimeoutError if not
+        done within timeout seconds
+        """
+        self.conn.send(args)
+        if not self.conn.poll(timeout):
+            raise TimeoutError()
+        return self.conn.recv()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+def work(conn):
+    """ A worker's loop: warm, then run tasks until the pipe is closed """
+    warm()
+    while True:
+        try:
+            args = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send((True, parse_task(*args)))
+        except Exception as e:  # parse_task's errors, or the result's pickling
+            conn.send((False, e))
+
+
+def warm():
+    """ Import the strategies once, when a worker starts """
+    import normalize  # noqa: F401
+    from strategy.registry import strategies
+
+    strategies.load_all()
+
+
+def parse_task(*args) -> Tuple[FetchedArticle, Optional[str]]:
+    try:
+        return parse(*args)
+    except Exception as e:
+        try:
+            pickle.dumps(e)
+        except Exception:
+            raise WorkerError("%s: %s" % (e.__class__.__name__, e))
+        raise
+
+
+def parse(
+    url: str,
+    html: Union[bytes, str],
+    config: Config,
+    content_type: Optional[str] = None,
+    encoding: Optional[str] = None,
+) -> Tuple[FetchedArticle, Optional[str]]:
+    context = strategy.FetchContext(
+        url=url, content_type=content_type, encoding=encoding
+    )
+    if isinstance(html, bytes):
+        html = html.decode(context.resolve_encoding(html), errors="replace")
+    from normalize import text_and_html
+
+    metadata_parser, body_parser = strategies_for(config)
+    article = metadata_parser(url, html, context=context)
+    article.check(METADATA)
+    body = body_parser(url, html, article, context=context)
+    article.set_body(body, text_and_html)
+    article.check(BODY)
+    article.derive()  # here, so the body is not sent back
+    return (article, context.canonical_url)
+
+
+def strategies_for(
+    config: Config,
+) -> Tuple[strategy.MetadataParser, strategy.BodyParser]:
+    """ Note: instances are cached by config (see strategy.registry) """
+    from strategy.registry import strategies
+
+    return (strategies.metadata_parser(config), strategies.body_parser(config))
@@ -0,0 +1,154 @@
+from functools import lru_cache
+import os
+import os.path
+from threading import Lock
+from time import time
+from typing import Dict, List, Optional, Tuple
+
+from shared.util.env import load_yaml
+from config import Config
+import env
+
+"""
+Index of site-specific fetch configs, loaded from a YAML file of
+`domain: [config, ...]` (see sites.yaml). Domains are stored in a trie of
+reversed labels, so finding the configs for a host is a walk down its labels
+(longest matching suffix wins), regardless of how many sites are configured.
+
+The file is checked for changes (by mtime) at most every check_interval
+seconds, and reloaded if changed. If a reload fails, the previous index is
+kept.
+
+Per-site state (strategy stats, circuit breakers) is keyed by site_key: the
+configured domain a host resolves to, else its registrable domain (the label
+under its public suffix, e.g. bbc.co.uk for news.bbc.co.uk), so that sites
+under a public suffix like co.uk don't share state.
+"""
+
+logger = env.get_logger(__name__)
+
+DEFAULT_CHECK_INTERVAL = 10
+DOMAIN_CACHE_SIZE = 4096
+
+_extract = None  # tldextract.TLDExtract, on first use
+
+
+class SiteTrie:
+    def __init__(self):
+        self.children: Dict[str, "SiteTrie"] = {}
+        self.configs: Optional[List[Config]] = None
+        self.domain: Optional[str] = None
+
+    def insert(self, domain: str, configs: List[Config]):
+        labels = host_labels(domain)
+        node = self
+        for label in reversed(labels):
+            node = node.children.setdefault(label, SiteTrie())
+        node.configs = configs
+        node.domain = ".".join(labels)
+
+    def lookup(self, host: str) -> Optional[List[Config]]:
+        found = self.match(host)
+        return None if found is None else found[1]
+
+    def match(self, host: str) -> Optional[Tuple[str, List[Config]]]:
+        """ The longest configured domain matching the host, and its configs """
+        node = self
+        found = None
+        for label in reversed(host_labels(host)):
+            node = node.children.get(label, None)
+            if node is None:
+                break
+            if node.configs is not None:
+                found = (node.domain, node.configs)
+        return found
+
+
+class SiteConfigs:
+    def __init__(
+        self,
+        fname: str,
+        check_interval: float = DEFAULT_CHECK_INTERVAL,
+        default: Optional[List[Config]] = None,
+    ):
+        self.fname = fname
+        self.check_interval = check_interval
+        self.default = [Config()] if default is None else default
+        self._lock = Lock()
+        self._trie = SiteTrie()
+        self._mtime = None
+        self._checked = None
+
+    def configs_for_host(self, host: str) -> List[Config]:
+        self.reload_if_changed()
+        configs = self._trie.lookup(host)
+        return self.default if configs is None else configs
+
+    def site_key(self, host: str) -> str:
+        """ The configured domain for the host if any, else its registrable domain """
+        self.reload_if_changed()
+        found = self._trie.match(host)
+        return registrable_domain(host) if found is None else found[0]
+
+    def reload_if_changed(self):
+        now = time()
+        if self._checked is not None and now - self._checked < self.check_interval:
+            return
+
+        with self._lock:
+            if self._checked is not None and now - self._checked < self.check_interval:
+                return
+            self._checked = now
+            try:
+                mtime = os.stat(self.fname).st_mtime
+                if mtime == self._mtime:
+                    return
+                self._trie = compile_site_configs(load_yaml(self.fname))
+                self._mtime = mtime
+                logger.info(
+                    "Loaded site configs from {fname}",
+                    env.log_record(log_type="LoadedSiteConfigs", fname=self.fname),
+                )
+            except Exception as e:
+                logger.warning(
+                    "Unable to load site configs from {fname}, keeping previous: "
+                    "{error}",
+                    env.log_record(
+                        log_type="SiteConfigsError", fname=self.fname, error=str(e)
+                    ),
+                )
+
+
+def compile_site_configs(data: Optional[dict]) -> SiteTrie:
+    trie = SiteTrie()
+    for (domain, configs) in ({} if data is None else data).items():
+        if not isinstance(configs, list) or len(configs) == 0:
+            raise ValueError("Expected a list of configs for %s" % (domain,))
+        try:
+            trie.insert(domain, [Config.from_json(c or {}) for c in configs])
+        except ValueError as e:
+            raise ValueError("Invalid config for %s: %s" % (domain, e))
+    return trie
+
+
+@lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def registrable_domain(host: str) -> str:
+    """
+    The host's domain under its public suffix, or the host itself if it has
+    none (e.g. localhost, or an IP address). Note the public suffix list is
+    the snapshot bundled with tldextract (it is never fetched).
+    """
+    global _extract
+    if _extract is None:
+        import tldextract  # on first use: slow to import
+
+        _extract = tldextract.TLDExtract(suffix_list_urls=())
+    name = ".".join(host_labels(host))
+    parts = _extract(name)
+    if parts.domain == "" or parts.suffix == "":
+        return name
+    return "%s.%s" % (parts.domain, parts.suffix)
+
+
+def host_labels(host: str) -> List[str]:
+    return host.split(":")[0].strip(".").lower().split(".")
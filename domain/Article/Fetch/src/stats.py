@@ -0,0 +1,281 @@
+from collections import deque
+from functools import wraps
+import json
+from math import ceil
+import os
+import os.path
+from random import random, randrange
+from tempfile import mkstemp
+from threading import Lock
+from time import time
+from typing import Dict, Iterator, List, Optional
+
+from config import Config
+import env
+
+"""
+Per-domain, per-config statistics of fetch attempts (success rate, issue rate
+and latency percentiles), used to order the configs tried for a url so that
+the fastest config that works for the domain comes first.
+
+Stats are kept in memory, with a bounded window of recent latencies of
+successful attempts per config (so a config that fails fast does not look
+cheap), and saved to a pluggable backend (see StatsBackend) at most every
+flush_interval seconds. Saving is not done while recording an attempt, but
+after each invocation (see flush_stats), like flushing the logs.
+"""
+
+logger = env.get_logger(__name__)
+
+LATENCY_WINDOW = 64
+MIN_ATTEMPTS = 3
+EXPLORATION_RATE = 0.05
+FLUSH_INTERVAL = 60
+MIN_EFFECTIVE_RATE = 0.01
+
+
+class ConfigStats:
+    def __init__(self, config: dict, attempts=0, successes=0, issues=0, latencies=()):
+        self.config = config
+        self.attempts = attempts
+        self.successes = successes
+        self.issues = issues
+        self.latencies = deque(latencies, maxlen=LATENCY_WINDOW)
+
+    @classmethod
+    def from_json(cls, d: dict) -> "ConfigStats":
+        return cls(
+            config=d["config"],
+            attempts=d["attempts"],
+            successes=d["successes"],
+            issues=d["issues"],
+            latencies=d["latencies"],
+        )
+
+    def to_json(self) -> dict:
+        return {
+            "config": self.config,
+            "attempts": self.attempts,
+            "successes": self.successes,
+            "issues": self.issues,
+            "latencies": list(self.latencies),
+        }
+
+    def record(self, success: bool, seconds: float, issues: bool = False):
+        """ Note: the latency of failed attempts is not kept """
+        self.attempts = self.attempts + 1
+        if success:
+            self.successes = self.successes + 1
+            if issues:
+                self.issues = self.issues + 1
+            self.latencies.append(seconds)
+
+    def success_rate(self) -> float:
+        return 0.0 if self.attempts == 0 else self.successes / self.attempts
+
+    def issue_rate(self) -> float:
+        return 0.0 if self.successes == 0 else self.issues / self.successes
+
+    def percentile(self, p: float) -> Optional[float]:
+        return percentile(self.latencies, p)
+
+    def score(self) -> float:
+        """
+        Expected seconds per usable result (lower is better): median latency
+        divided by the rate of successes without issues.
+        """
+        rate = self.success_rate() * (1 - self.issue_rate())
+        return self.percentile(50) / max(rate, MIN_EFFECTIVE_RATE)
+
+    def report(self) -> dict:
+        return {
+            "config": self.config,
+            "attempts": self.attempts,
+            "success_rate": self.success_rate(),
+            "issue_rate": self.issue_rate(),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class StatsBackend:
+    def load(self) -> dict:
+        raise NotImplementedError()
+
+    def save(self, data: dict):
+        raise NotImplementedError()
+
+
+class MemoryStatsBackend(StatsBackend):
+    def __init__(self):
+        self.data = {}
+
+    def load(self) -> dict:
+        return self.data
+
+    def save(self, data: dict):
+        self.data = data
+
+
+class FileStatsBackend(StatsBackend):
+    def __init__(self, fname: str):
+        self.fname = fname
+
+    def load(self) -> dict:
+        if not os.path.exists(self.fname):
+            return {}
+        with open(self.fname, "r") as f:
+            return json.load(f)
+
+    def save(self, data: dict):
+        """ Note: each save writes its own temporary file, then replaces the file """
+        fd, tmpname = mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.fname)), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmpname, self.fname)
+        except BaseException:
+            os.unlink(tmpname)
+            raise
+
+
+class StrategyStats:
+    def __init__(
+        self,
+        backend: Optional[StatsBackend] = None,
+        exploration_rate: float = EXPLORATION_RATE,
+        min_attempts: int = MIN_ATTEMPTS,
+        flush_interval: float = FLUSH_INTERVAL,
+    ):
+        self.backend = MemoryStatsBackend() if backend is None else backend
+        self.exploration_rate = exploration_rate
+        self.min_attempts = min_attempts
+        self.flush_interval = flush_interval
+        self._lock = Lock()
+        self._stats: Dict[str, Dict[str, ConfigStats]] = {}
+        self._flushed = time()
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            data = self.backend.load()
+        except Exception as e:
+            logger.warning(
+                "Unable to load strategy stats: {error}",
+                env.log_record(log_type="StrategyStatsError", error=str(e)),
+            )
+            return
+        with self._lock:
+            self._stats = {
+                domain: {fp: ConfigStats.from_json(s) for (fp, s) in by_config.items()}
+                for (domain, by_config) in data.items()
+            }
+
+    def flush(self):
+        with self._lock:
+            data = {
+                domain: {fp: s.to_json() for (fp, s) in by_config.items()}
+                for (domain, by_config) in self._stats.items()
+            }
+            self._flushed = time()
+            self._dirty = False
+        try:
+            self.backend.save(data)
+        except Exception as e:
+            logger.warning(
+                "Unable to save strategy stats: {error}",
+                env.log_record(log_type="StrategyStatsError", error=str(e)),
+            )
+
+    def record(
+        self,
+        domain: str,
+        config: Config,
+        success: bool,
+        seconds: float,
+        issues: bool = False,
+    ):
+        fp = config.fingerprint()
+        with self._lock:
+            by_config = self._stats.setdefault(domain, {})
+            stats = by_config.get(fp, None)
+            if stats is None:
+                stats = ConfigStats(config.to_json())
+                by_config[fp] = stats
+            stats.record(success, seconds, issues)
+            self._dirty = True
+
+    def flush_if_due(self):
+        """ Flush if anything was recorded and flush_interval has passed """
+        with self._lock:
+            due = self._dirty and time() - self._flushed >= self.flush_interval
+        if due:
+            self.flush()
+
+    def order(self, domain: str, configs: Iterator[Config]) -> List[Config]:
+        """
+        Configs with enough attempts and some successes come first, best score
+        first; then configs without enough attempts; then configs that have
+        never succeeded. Otherwise the given order is kept. With probability
+        exploration_rate, a random config is moved to the front instead.
+        """
+        configs = list(configs)
+        if len(configs) < 2:
+            return configs
+
+        if random() < self.exploration_rate:
+            i = randrange(len(configs))
+            return [configs[i]] + configs[:i] + configs[i + 1 :]
+
+        with self._lock:
+            by_config = self._stats.get(domain, {})
+            keys = [
+                self._order_key(by_config.get(config.fingerprint(), None), i)
+                for (i, config) in enumerate(configs)
+            ]
+        return [
+            config for (_, config) in sorted(zip(keys, configs), key=lambda p: p[0])
+        ]
+
+    def _order_key(self, stats: Optional[ConfigStats], i: int):
+        if stats is None or stats.attempts < self.min_attempts:
+            return (1, 0.0, i)
+        if stats.successes == 0:
+            return (2, 0.0, i)
+        return (0, stats.score(), i)
+
+    def report(self, domain: Optional[str] = None) -> dict:
+        with self._lock:
+            return {
+                d: {fp: s.report() for (fp, s) in by_config.items()}
+                for (d, by_config) in self._stats.items()
+                if domain is None or d == domain
+            }
+
+
+def flush_stats(store: StrategyStats):
+    """ Decorate a function entry point to flush the stats, if due, after each call """
+
+    def _flush_stats(fn):
+        @wraps(fn)
+        def __flush_stats(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                store.flush_if_due()
+
+        return __flush_stats
+
+    return _flush_stats
+
+
+def percentile(values: Iterator[float], p: float) -> Optional[float]:
+    """ Nearest-rank percentile; None if there are no values """
+    ordered = sorted(values)
+    if len(ordered) == 0:
+        return None
+    return ordered[max(0, ceil(p / 100 * len(ordered)) - 1)]
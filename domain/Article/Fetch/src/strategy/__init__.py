@@ -1,15 +1,47 @@
+from dataclasses import dataclass
+from typing import Optional, Union
+
 from shared.model.article import FetchedArticle
+import charset
+from deadline import Deadline
 
 """
 ABCs for strategy classes
 """
 
 
+@dataclass
+class FetchContext:
+    """
+    State shared by the strategies used in a single fetch attempt (one
+    config). The encoding is resolved once, on first use, and cached. The
+    final url (after redirects) and canonical url are set by strategies that
+    find them. The deadline is that of the stage running.
+    """
+
+    url: str
+    content_type: Optional[str] = None
+    encoding: Optional[str] = None
+    final_url: Optional[str] = None
+    canonical_url: Optional[str] = None
+    deadline: Optional[Deadline] = None
+
+    def resolve_encoding(self, html: Union[str, bytes]) -> str:
+        if self.encoding is None:
+            self.encoding = charset.resolve_encoding(html, self.content_type)
+        return self.encoding
+
+    def check_deadline(self, stage: str):
+        """ Raises deadline.StageTimeout if the stage is out of time """
+        if self.deadline is not None:
+            self.deadline.check(stage)
+
+
 class Downloader:
     def __init__(self, options: dict = {}):
         self.options = options
 
-    def __call__(self, url: str) -> str:
+    def __call__(self, url: str, context: Optional[FetchContext] = None) -> str:
         raise NotImplementedError()
 
 
@@ -17,7 +49,9 @@ class MetadataParser:
     def __init__(self, options: dict = {}):
         self.options = options
 
-    def __call__(self, url: str, html: str) -> FetchedArticle:
+    def __call__(
+        self, url: str, html: str, context: Optional[FetchContext] = None
+    ) -> FetchedArticle:
         raise NotImplementedError()
 
 
@@ -25,7 +59,13 @@ class BodyParser:
     def __init__(self, options: dict = {}):
         self.options = options
 
-    def __call__(self, url: str, html: str, article: FetchedArticle) -> str:
+    def __call__(
+        self,
+        url: str,
+        html: str,
+        article: FetchedArticle,
+        context: Optional[FetchContext] = None,
+    ) -> str:
         raise NotImplementedError()
 
 
@@ -33,6 +73,36 @@ class DownloadError(Exception):
     pass
 
 
+class DownloadRejected(DownloadError):
+    """
+    The download was abandoned because of what the url serves, rather than
+    because of a failure to connect. Trying other strategies won't help.
+    """
+
+    def __init__(self, url: str, reason: str):
+        self.url = url
+        self.reason = reason
+
+    def __str__(self):
+        return "Download rejected from %s: %s" % (self.url, self.reason)
+
+
+class UnsupportedContentType(DownloadRejected):
+    def __init__(self, url: str, content_type: str):
+        self.content_type = content_type
+        super(UnsupportedContentType, self).__init__(
+            url, "unsupported content type '%s'" % (content_type,)
+        )
+
+
+class ContentTooLarge(DownloadRejected):
+    def __init__(self, url: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        super(ContentTooLarge, self).__init__(
+            url, "content larger than %d bytes" % (max_bytes,)
+        )
+
+
 class ParseMetadataError(Exception):
     pass
 
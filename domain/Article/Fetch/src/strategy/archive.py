@@ -0,0 +1,148 @@
+import json
+import mmap
+import struct
+from threading import Lock
+from time import sleep
+from typing import Dict, Iterator, Optional, Tuple
+import zlib
+
+import strategy
+
+"""
+Archive of downloaded pages, for replaying downloads without the network
+(e.g. to benchmark parsing strategies on a fixed corpus).
+
+The archive is a single file: zlib-compressed pages, one after another,
+followed by a zlib-compressed JSON index of url -> (offset, length, content
+type, encoding), followed by a footer giving the offset of the index. Pages
+are stored as recorded by the downloader, i.e. decoded, then encoded as utf8.
+
+Readers memory-map the file and decompress a page only when it is requested.
+"""
+
+MAGIC = b"NBARCHV1"
+FOOTER = struct.Struct(">Q8s")
+
+
+class ArchiveWriter:
+    def __init__(self, fname: str):
+        self.fname = fname
+        self._file = open(fname, "wb")
+        self._index = {}
+        self._offset = 0
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(
+        self,
+        url: str,
+        html: str,
+        content_type: Optional[str] = None,
+        encoding: Optional[str] = None,
+    ):
+        data = zlib.compress(html.encode("utf8"))
+        self._file.write(data)
+        self._index[url] = {
+            "offset": self._offset,
+            "length": len(data),
+            "content_type": content_type,
+            "encoding": encoding,
+        }
+        self._offset = self._offset + len(data)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.write(zlib.compress(json.dumps(self._index).encode("utf8")))
+        self._file.write(FOOTER.pack(self._offset, MAGIC))
+        self._file.close()
+
+
+class ArchiveReader:
+    def __init__(self, fname: str):
+        self.fname = fname
+        with open(fname, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        index_offset, magic = FOOTER.unpack(self._mmap[-FOOTER.size :])
+        if magic != MAGIC:
+            raise ValueError("Not a page archive: %s" % (fname,))
+        self._index = json.loads(
+            zlib.decompress(self._mmap[index_offset : -FOOTER.size]).decode("utf8")
+        )
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def urls(self) -> Iterator[str]:
+        return iter(self._index.keys())
+
+    def get(self, url: str) -> Tuple[str, Optional[str], Optional[str]]:
+        """ Returns (html, content_type, encoding); raises KeyError if missing """
+        entry = self._index[url]
+        start = entry["offset"]
+        data = zlib.decompress(self._mmap[start : start + entry["length"]])
+        return (data.decode("utf8"), entry["content_type"], entry["encoding"])
+
+
+_readers: Dict[str, ArchiveReader] = {}
+_readers_lock = Lock()
+
+
+def reader(fname: str) -> ArchiveReader:
+    """ Archive readers are opened once per file and shared """
+    with _readers_lock:
+        if fname not in _readers:
+            _readers[fname] = ArchiveReader(fname)
+        return _readers[fname]
+
+
+class Downloader(strategy.Downloader):
+    """
+    Replays downloads from the archive file given in the `archive_file` option.
+    """
+
+    def __init__(self, options: dict = {}):
+        if "archive_file" not in options:
+            raise ValueError("Expected archive_file option")
+        super(Downloader, self).__init__(options)
+
+    def __call__(
+        self, url: str, context: Optional[strategy.FetchContext] = None
+    ) -> str:
+        try:
+            html, content_type, encoding = reader(self.options["archive_file"]).get(url)
+        except KeyError:
+            raise strategy.DownloadError("Not in archive: %s" % (url,))
+        if context is not None:
+            context.content_type = content_type
+            context.encoding = encoding
+        return html
+
+
+def record(
+    fname: str, urls: Iterator[str], downloader: strategy.Downloader, pause=5
+) -> Dict[str, Exception]:
+    """
+    Download urls with the given downloader and record them in a new archive.
+    Returns errors by url, for those that could not be downloaded.
+    """
+    errors = {}
+    with ArchiveWriter(fname) as writer:
+        for (i, url) in enumerate(urls):
+            if i > 0:
+                sleep(pause)
+            context = strategy.FetchContext(url=url)
+            try:
+                html = downloader(url, context=context)
+            except Exception as e:
+                errors[url] = e
+                continue
+            writer.add(url, html, context.content_type, context.encoding)
+    return errors
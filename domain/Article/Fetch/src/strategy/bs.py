@@ -1,3 +1,5 @@
+from typing import Optional
+
 from bs4 import BeautifulSoup
 
 from shared.model.article import FetchedArticle
@@ -17,10 +19,18 @@ class BodyParser(strategy.BodyParser):
             raise ValueError("Expected one or more css_selectors to be specified")
         super(BodyParser, self).__init__(options)
 
-    def __call__(self, url: str, html: str, article: FetchedArticle) -> str:
+    def __call__(
+        self,
+        url: str,
+        html: str,
+        article: FetchedArticle,
+        context: Optional[strategy.FetchContext] = None,
+    ) -> str:
         def _select():
             for html_parser in self.html_parsers:
                 for css in self.css_selectors:
+                    if context is not None:
+                        context.check_deadline("body_parse")
                     try:
                         el = BeautifulSoup(html, html_parser)
                         rs = el.select(css)
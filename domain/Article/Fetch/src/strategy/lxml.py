@@ -1,3 +1,5 @@
+from typing import Optional
+
 from lxml.cssselect import CSSSelector
 import lxml.etree
 
@@ -18,7 +20,13 @@ class BodyParser(strategy.BodyParser):
             raise ValueError("Expected either css_selectors or xpath_selectors options")
         super(BodyParser, self).__init__(options)
 
-    def __call__(self, url: str, html: str, article: FetchedArticle) -> str:
+    def __call__(
+        self,
+        url: str,
+        html: str,
+        article: FetchedArticle,
+        context: Optional[strategy.FetchContext] = None,
+    ) -> str:
         def _select(el):
             for xpath in self.xpath_selectors:
                 rs = el.xpath(xpath)
@@ -38,4 +46,7 @@ class BodyParser(strategy.BodyParser):
         except StopIteration:
             raise strategy.ParseBodyError("Article body not found")
 
-        return lxml.etree.tostring(el).decode(article.encoding)
+        encoding = (
+            article.encoding if context is None else context.resolve_encoding(html)
+        )
+        return lxml.etree.tostring(el).decode(encoding)
@@ -1,10 +1,14 @@
-from typing import Optional
+from typing import List, Optional
+from urllib.parse import urljoin
 
 import lxml.etree
-from bs4 import UnicodeDammit
 import newspaper
+import newspaper.network
+from newspaper.utils import extract_meta_refresh
+import requests
 
 from shared.model.article import FetchedArticle
+import charset
 import strategy
 
 GOOGLEBOT_OPTIONS = {
@@ -13,6 +17,10 @@ GOOGLEBOT_OPTIONS = {
     "follow_meta_refresh": True,
 }
 
+MAX_BYTES = 5 * 1024 * 1024
+HTML_CONTENT_TYPES = ["text/html", "application/xhtml+xml"]
+CHUNK_SIZE = 64 * 1024
+
 
 class Downloader(strategy.Downloader):
     def __init__(self, options: dict = {}):
@@ -23,46 +31,140 @@ class Downloader(strategy.Downloader):
         else:
             super(Downloader, self).__init__(options)
 
-    def __call__(self, url: str) -> str:
-        article = newspaper.Article(url, **self.options)
-        article.download()
+    def __call__(
+        self, url: str, context: Optional[strategy.FetchContext] = None
+    ) -> str:
+        """
+        Note: a meta refresh is followed (once) if follow_meta_refresh, with
+        download_html like the page itself, not by newspaper.
+        """
+        context = strategy.FetchContext(url=url) if context is None else context
+        article = newspaper.Article(
+            url, **{**self.options, "follow_meta_refresh": False}
+        )
+        html = self.download(url, article.config, context)
+        refresh_url = (
+            extract_meta_refresh(html)
+            if self.options.get("follow_meta_refresh", False)
+            else None
+        )
+        if refresh_url:
+            html = self.download(
+                urljoin(context.final_url or url, refresh_url), article.config, context
+            )
+        article.download(input_html=html)
         html = article.html
         if html is None or len(html) == 0:
             raise strategy.DownloadError("Nothing downloaded")
         return html
 
+    def download(
+        self, url: str, config: newspaper.Config, context: strategy.FetchContext
+    ) -> str:
+        return download_html(
+            url,
+            config,
+            max_bytes=self.options.get("max_bytes", MAX_BYTES),
+            content_types=self.options.get("content_types", HTML_CONTENT_TYPES),
+            context=context,
+        )
+
 
 class MetadataParser(strategy.MetadataParser):
-    def __call__(self, url: str, html: str) -> FetchedArticle:
+    def __call__(
+        self, url: str, html: str, context: Optional[strategy.FetchContext] = None
+    ) -> FetchedArticle:
         article = newspaper.Article(url, **self.options)
         article.set_html(html)
         article.parse()
-        return parse_np(article)
+        if context is not None and article.canonical_link:
+            context.canonical_url = article.canonical_link
+        return parse_np(
+            article, None if context is None else context.resolve_encoding(html)
+        )
 
 
 class BodyParser(strategy.BodyParser):
-    def __call__(self, url: str, html: str, article: FetchedArticle) -> str:
-        if article.html is None:
+    def __call__(
+        self,
+        url: str,
+        html: str,
+        article: FetchedArticle,
+        context: Optional[strategy.FetchContext] = None,
+    ) -> str:
+        if article.body is None:
             article = newspaper.Article(url, **self.options)
             article.download(input_html=html)
             article.parse()
-            return parse_np_html(article)
+            return parse_np_html(
+                article, None if context is None else context.resolve_encoding(html)
+            )
         else:
-            return article.html
-
-
-def parse_np(np_article: newspaper.Article) -> FetchedArticle:
-    encoding = parse_np_encoding(np_article)
-    html = parse_np_html(np_article, encoding)
+            return article.body
+
+
+def download_html(
+    url: str,
+    config: newspaper.Config,
+    max_bytes: int = MAX_BYTES,
+    content_types: List[str] = HTML_CONTENT_TYPES,
+    context: Optional[strategy.FetchContext] = None,
+) -> str:
+    """
+    Download using newspaper's request settings, but check the response headers
+    before reading the body, and stream the body up to max_bytes. Raises
+    UnsupportedContentType if the content type is not one of content_types (a
+    missing content type is let through), and ContentTooLarge if the declared or
+    actual length exceeds max_bytes.
+
+    The body is decoded with the encoding resolved on the context (see the
+    charset module), so newspaper doesn't have to detect it again. If the
+    context has a deadline, the request times out by then.
+    """
+    context = strategy.FetchContext(url=url) if context is None else context
+    timeout = config.request_timeout
+    if context.deadline is not None:
+        timeout = min(timeout, context.deadline.remaining())
+    kwargs = newspaper.network.get_request_kwargs(
+        timeout, config.browser_user_agent, config.proxies, config.headers
+    )
+    with requests.get(url, stream=True, **kwargs) as resp:
+        if config.http_success_only:
+            resp.raise_for_status()
+
+        context.final_url = resp.url
+        content_type = resp.headers.get("content-type", "")
+        context.content_type = content_type
+        mime_type = content_type.split(";")[0].strip().lower()
+        if len(mime_type) > 0 and mime_type not in content_types:
+            raise strategy.UnsupportedContentType(url, content_type)
+
+        length = resp.headers.get("content-length", "")
+        if length.isdigit() and int(length) > max_bytes:
+            raise strategy.ContentTooLarge(url, max_bytes)
+
+        content = bytearray()
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            context.check_deadline("download")
+            content.extend(chunk)
+            if len(content) > max_bytes:
+                raise strategy.ContentTooLarge(url, max_bytes)
+
+        return content.decode(
+            context.resolve_encoding(bytes(content)), errors="replace"
+        )
+
+
+def parse_np(np_article: newspaper.Article, encoding=None) -> FetchedArticle:
+    if encoding is None:
+        encoding = parse_np_encoding(np_article)
     return FetchedArticle(
         site_name=parse_np_site_name(np_article.meta_data),
         title=np_article.title,
         authors=np_article.authors,
         summary=parse_np_summary(np_article.meta_data),
         encoding=encoding,
-        raw_html=html,
-        text=np_article.text,
-        html=html,
+        body=parse_np_html(np_article, encoding),
         publish_date=(
             None if np_article.publish_date is None else np_article.publish_date.date()
         ),
@@ -70,8 +172,7 @@ def parse_np(np_article: newspaper.Article) -> FetchedArticle:
 
 
 def parse_np_encoding(np_article: newspaper.Article) -> str:
-    attempt = UnicodeDammit(np_article.html).original_encoding
-    return "utf8" if attempt is None else attempt
+    return charset.resolve_encoding(np_article.html)
 
 
 def parse_np_html(np_article: newspaper.Article, encoding=None) -> str:
@@ -0,0 +1,85 @@
+from importlib import import_module
+from threading import Lock
+from typing import Dict, Tuple
+
+from config import Config, Downloader, MetadataParser, BodyParser
+import strategy
+
+"""
+Registry of strategy classes, keyed by the config enums.
+
+Each strategy is registered by the name of its module and class, and the
+module is only imported when the strategy is first used, so that importing
+Fetch does not load newspaper, bs4 or lxml for strategies a url never uses
+(cold starts). Strategy instances keep nothing but their options, so they are
+cached by config (fingerprint) and shared between fetches.
+"""
+
+STRATEGIES = {
+    Downloader.Newspaper: ("strategy.newspaper", "Downloader"),
+    Downloader.Replay: ("strategy.archive", "Downloader"),
+    MetadataParser.Newspaper: ("strategy.newspaper", "MetadataParser"),
+    BodyParser.Newspaper: ("strategy.newspaper", "BodyParser"),
+    BodyParser.BeautifulSoup: ("strategy.bs", "BodyParser"),
+    BodyParser.LXML: ("strategy.lxml", "BodyParser"),
+}
+
+KINDS = {
+    Downloader: "downloader",
+    MetadataParser: "metadata parser",
+    BodyParser: "body parser",
+}
+
+
+class StrategyRegistry:
+    def __init__(self, strategies: Dict[object, Tuple[str, str]] = STRATEGIES):
+        self._strategies = dict(strategies)
+        self._classes: Dict[object, type] = {}
+        self._instances: Dict[Tuple[object, str], object] = {}
+        self._lock = Lock()
+
+    def register(self, key, module: str, name: str):
+        """ Note: key is a config enum value, e.g. BodyParser.LXML """
+        with self._lock:
+            self._strategies[key] = (module, name)
+            self._classes.pop(key, None)
+            for instance_key in [k for k in self._instances if k[0] == key]:
+                del self._instances[instance_key]
+
+    def strategy_class(self, key) -> type:
+        if key not in self._classes:
+            if key not in self._strategies:
+                raise ValueError(
+                    "Unknown %s: %s" % (KINDS.get(type(key), "strategy"), key)
+                )
+            module, name = self._strategies[key]
+            self._classes[key] = getattr(import_module(module), name)
+        return self._classes[key]
+
+    def load_all(self):
+        """ Import every strategy now, e.g. to warm a worker process """
+        for key in list(self._strategies):
+            self.strategy_class(key)
+
+    def get(self, key, options: dict, config: Config):
+        instance_key = (key, config.fingerprint())
+        instance = self._instances.get(instance_key, None)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(instance_key, None)
+                if instance is None:
+                    instance = self.strategy_class(key)(options)
+                    self._instances[instance_key] = instance
+        return instance
+
+    def downloader(self, config: Config) -> strategy.Downloader:
+        return self.get(config.downloader, config.downloader_options, config)
+
+    def metadata_parser(self, config: Config) -> strategy.MetadataParser:
+        return self.get(config.metadata_parser, config.metadata_parser_options, config)
+
+    def body_parser(self, config: Config) -> strategy.BodyParser:
+        return self.get(config.body_parser, config.body_parser_options, config)
+
+
+strategies = StrategyRegistry()
@@ -1,10 +1,16 @@
+from dataclasses import replace
+import os
+import os.path
 from time import time, sleep
+from typing import List
 from urllib.parse import urlparse
 
 import pytest
 
 import browser
-from config import Config, BodyParser
+from config import Config, BodyParser, Downloader
+import strategy.archive
+from test.util import tournament
 # from test.util.fetch import SAMPLE_URLS
 
 SAMPLE_URLS = [
@@ -29,19 +35,48 @@ WASHPOST_TEST_CONFIGS = [
 CONFIGS_0 = [Config()]
 CONFIGS_1 = WASHPOST_TEST_CONFIGS
 
+"""
+Set FETCH_ARCHIVE to compare on recorded pages instead of live sites: if the
+archive file does not exist, SAMPLE_URLS are recorded to it first.
+"""
+ARCHIVE_FILE = os.environ.get("FETCH_ARCHIVE", None)
+
+
+def replayed(configs: List[Config], archive_file: str) -> List[Config]:
+    return [
+        replace(
+            config,
+            downloader=Downloader.Replay,
+            downloader_options={"archive_file": archive_file},
+        )
+        for config in configs
+    ]
+
 
 @pytest.mark.skip(reason="temporary")
 def test_compare():
+    configs_0 = CONFIGS_0
+    configs_1 = CONFIGS_1
+    pause = 5
+    if ARCHIVE_FILE is not None:
+        if not os.path.exists(ARCHIVE_FILE):
+            strategy.archive.record(
+                ARCHIVE_FILE, SAMPLE_URLS, browser.get_downloader(Config())
+            )
+        configs_0 = replayed(CONFIGS_0, ARCHIVE_FILE)
+        configs_1 = replayed(CONFIGS_1, ARCHIVE_FILE)
+        pause = 0
+
     results = {url: [[None, None, None], [None, None, None]] for url in SAMPLE_URLS}
     tries = 0
     for url in SAMPLE_URLS:
         tries = tries + 1
         if tries > 1:
-            sleep(5)
+            sleep(pause)
 
         try:
             tstart0 = time()
-            art0 = browser.fetch(url, CONFIGS_0)
+            art0 = browser.fetch(url, configs_0)
             tend0 = time()
             results[url][0][0] = art0.text
             results[url][0][1] = len(art0.html)
@@ -50,11 +85,11 @@ def test_compare():
             results[url][0][0] = e
             continue
 
-        sleep(5)
+        sleep(pause)
 
         try:
             tstart1 = time()
-            art1 = browser.fetch(url, CONFIGS_1)
+            art1 = browser.fetch(url, configs_1)
             tend1 = time()
             results[url][1][0] = art1.text
             results[url][1][1] = len(art1.html)
@@ -87,3 +122,23 @@ def test_compare():
 
     if len(errs) > 0:
         raise ValueError("%d errors fetching" % (len(errs),))
+
+
+TOURNAMENT_FILE = os.environ.get("FETCH_TOURNAMENT_OUTPUT", "tournament-sites.yaml")
+REFERENCES_FILE = os.environ.get("FETCH_REFERENCES", None)
+
+
+@pytest.mark.skipif(
+    ARCHIVE_FILE is None or REFERENCES_FILE is None,
+    reason="FETCH_ARCHIVE or FETCH_REFERENCES not set",
+)
+def test_tournament():
+    """ Note: FETCH_REFERENCES is a yaml file of reference texts by url """
+    ranked = tournament.run(ARCHIVE_FILE, tournament.load_references(REFERENCES_FILE))
+    for (domain, scores) in ranked.items():
+        print("\n%s" % (domain,))
+        for s in scores[: tournament.TOP]:
+            print(
+                "    %.2f | %.3f | %s" % (s["quality"], s["p50"], s["config"].to_json())
+            )
+    tournament.save_site_configs(ranked, TOURNAMENT_FILE)
@@ -0,0 +1,141 @@
+from datetime import datetime
+import json
+import logging as base_logging
+from time import gmtime, perf_counter
+from uuid import uuid4
+
+import pytest
+
+from shared.adapter import logging
+
+"""
+Cost of formatting log records, with LogFormatter and LocalLogFormatter,
+against the formatter they replace (kept here as the baseline). Run with
+-m slow -s to see the report: timings are reported, not asserted, as they
+vary with the load on the machine.
+"""
+
+RECORDS = 100000
+MESSAGES = [
+    ("Fetched {url} in {seconds} sec", {"url": "https://example.com/", "seconds": 1}),
+    ("Received command {command}", {"command": "RequestArticle(url=...)"}),
+    ("Parsed article", {"log_type": "TimeElapsed", "seconds": 0.25}),
+]
+TIMES = ("insertId", "receiveTimestamp", "timestamp")
+
+
+class BaselineLogFormatter(base_logging.Formatter):
+    def format(self, record):
+        record.asctime = self.formatTime(record, self.datefmt)
+        record_data = {
+            "log_name": record.name,
+            "log_level": record.levelname,
+            "log_levelno": record.levelno,
+            "log_asctime": record.asctime,
+            "log_created": record.created,
+            "log_pathname": record.pathname,
+            "log_filename": record.filename,
+            "log_module": record.module,
+            "log_funcName": record.funcName,
+            "log_lineno": record.lineno,
+        }
+        if isinstance(record.args, dict):
+            data = record.args.copy()
+        elif isinstance(record.args, tuple) and len(record.args) > 0:
+            if isinstance(record.args[0], dict):
+                data = record.args[0].copy()
+            else:
+                data = {"log_args": list(record.args)}
+        else:
+            data = {}
+        data.update(record_data)
+        data["message"] = record.msg.format(**data)
+        return data
+
+
+class BaselineLocalLogFormatter(BaselineLogFormatter):
+    def format(self, record):
+        data = super(BaselineLocalLogFormatter, self).format(record)
+        return json.dumps(baseline_stackdriver_log_entry(data, labels={}))
+
+
+def baseline_stackdriver_log_entry(data, message=None, labels=None, resource=None):
+    rectime = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    logtime = data.get("log_created", None)
+    timestamp = (
+        rectime
+        if logtime is None
+        else datetime(*gmtime(logtime)[:6]).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    )
+    return {
+        "insertId": str(uuid4()),
+        "jsonPayload": {"message": data, "python_logger": data.get("log_name", "")},
+        "logName": "local",
+        "receiveTimestamp": rectime,
+        "resource": {"type": "global", "labels": {}} if resource is None else resource,
+        "labels": {} if labels is None else labels,
+        "severity": data.get("log_level", ""),
+        "timestamp": timestamp,
+    }
+
+
+def records(n=RECORDS):
+    logger = base_logging.getLogger("perf")
+    return [
+        logger.makeRecord(
+            "perf", base_logging.INFO, __file__, i, msg, (args,), None, "fetch"
+        )
+        for i in range(n)
+        for (msg, args) in [MESSAGES[i % len(MESSAGES)]]
+    ]
+
+
+def measure(formatter, records_):
+    t0 = perf_counter()
+    for record in records_:
+        formatter.format(record)
+    return perf_counter() - t0
+
+
+@pytest.mark.slow
+def test_format_100k_records():
+    records_ = records()
+    for (formatter, baseline) in [
+        (
+            logging.LogFormatter(*logging.FORMATTER_ARGS),
+            BaselineLogFormatter(*logging.FORMATTER_ARGS),
+        ),
+        (
+            logging.LocalLogFormatter({}, *logging.FORMATTER_ARGS),
+            BaselineLocalLogFormatter(*logging.FORMATTER_ARGS),
+        ),
+    ]:
+        seconds = measure(formatter, records_)
+        baseline_seconds = measure(baseline, records_)
+        print(
+            "\n%s x %d: %.0f ms (baseline %.0f ms)"
+            % (
+                formatter.__class__.__name__,
+                RECORDS,
+                seconds * 1000,
+                baseline_seconds * 1000,
+            )
+        )
+
+
+def test_format_as_baseline():
+    formatter = logging.LogFormatter(*logging.FORMATTER_ARGS)
+    baseline = BaselineLogFormatter(*logging.FORMATTER_ARGS)
+    for record in records(len(MESSAGES)):
+        assert formatter.format(record) == baseline.format(record)
+
+
+def test_stackdriver_log_entry_as_baseline():
+    data = logging.LogFormatter(*logging.FORMATTER_ARGS).format(records(1)[0])
+    entry = logging.stackdriver_log_entry(data, labels={})
+    baseline = baseline_stackdriver_log_entry(data, labels={})
+    assert entry["timestamp"][:19] == baseline["timestamp"][:19]
+    assert entry["insertId"] != logging.stackdriver_log_entry(data)["insertId"]
+    assert {k: v for (k, v) in entry.items() if k not in TIMES} == {
+        k: v for (k, v) in baseline.items() if k not in TIMES
+    }
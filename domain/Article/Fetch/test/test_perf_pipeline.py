@@ -0,0 +1,35 @@
+import os
+import os.path
+
+import pytest
+
+from test.util import bench
+
+"""
+Run with FETCH_ARCHIVE set to an archive of recorded pages (see
+test_perf_browser_fetch.py to record one). The first run saves its report as
+the baseline (FETCH_BASELINE); later runs fail if any stage regresses by more
+than FETCH_REGRESSION_THRESHOLD. Set FETCH_SAVE_BASELINE=1 to replace the
+baseline with the current run.
+"""
+ARCHIVE_FILE = os.environ.get("FETCH_ARCHIVE", None)
+BASELINE_FILE = os.environ.get("FETCH_BASELINE", "pipeline-baseline.json")
+THRESHOLD = float(
+    os.environ.get("FETCH_REGRESSION_THRESHOLD", bench.REGRESSION_THRESHOLD)
+)
+SAVE_BASELINE = os.environ.get("FETCH_SAVE_BASELINE", "0") == "1"
+
+
+@pytest.mark.skipif(ARCHIVE_FILE is None, reason="FETCH_ARCHIVE not set")
+def test_pipeline_stages():
+    report = bench.Benchmark(ARCHIVE_FILE).run()
+    print("\n" + bench.format_report(report))
+
+    if SAVE_BASELINE or not os.path.exists(BASELINE_FILE):
+        bench.save_baseline(report, BASELINE_FILE)
+        return
+
+    found = bench.regressions(report, bench.load_baseline(BASELINE_FILE), THRESHOLD)
+    for r in found:
+        print("Regression in %(stage)s %(metric)s: %(baseline)s -> %(value)s" % r)
+    assert found == []
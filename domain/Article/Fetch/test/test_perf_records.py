@@ -0,0 +1,88 @@
+from dataclasses import dataclass
+from time import perf_counter
+import tracemalloc
+from typing import Optional
+
+from shared.event.core import SavedFetchedArticle
+from shared.command.core import RequestArticle
+
+"""
+Allocation and decode cost of batches of events, as records (slotted, with
+generated from_json) against the same events as plain dataclasses (with a
+per-instance __dict__). Run with -s to see the report.
+"""
+
+BATCH = 10000
+
+
+@dataclass
+class DictSavedFetchedArticle:
+    id: str
+    url: str
+    duplicate_of: Optional[str] = None
+
+    @classmethod
+    def from_json(cls, d: dict):
+        return cls(id=d["id"], url=d["url"], duplicate_of=d.get("duplicate_of", None))
+
+
+@dataclass
+class DictRequestArticle:
+    url: str
+    note: Optional[str] = None
+
+    @classmethod
+    def from_json(cls, d: dict):
+        return cls(url=d["url"], note=d.get("note", None))
+
+
+def batch(typ: str):
+    return [
+        {
+            "$type": typ,
+            "id": "%d" % (i,),
+            "url": "https://example.com/%d" % (i,),
+            "note": None,
+            "duplicate_of": None,
+        }
+        for i in range(BATCH)
+    ]
+
+
+def measure(cls, data, repeat=3):
+    """ Best decode time of repeat runs, then bytes allocated (traced apart) """
+    seconds = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        decoded = [cls.from_json(d) for d in data]
+        seconds.append(perf_counter() - t0)
+    del decoded
+    tracemalloc.start()
+    decoded = [cls.from_json(d) for d in data]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(decoded) == len(data)
+    return {"seconds": min(seconds), "bytes": allocated}
+
+
+def test_batch_decode():
+    for (record_cls, dict_cls) in [
+        (SavedFetchedArticle, DictSavedFetchedArticle),
+        (RequestArticle, DictRequestArticle),
+    ]:
+        data = batch(record_cls.__name__)
+        record_cost = measure(record_cls, data)
+        dict_cost = measure(dict_cls, data)
+        print(
+            "\n%s x %d: record %.1f ms, %d KiB; dataclass %.1f ms, %d KiB"
+            % (
+                record_cls.__name__,
+                BATCH,
+                record_cost["seconds"] * 1000,
+                record_cost["bytes"] // 1024,
+                dict_cost["seconds"] * 1000,
+                dict_cost["bytes"] // 1024,
+            )
+        )
+        assert record_cost["bytes"] < dict_cost["bytes"]
+        assert record_cost["seconds"] < dict_cost["seconds"] * 1.5  # noisy
@@ -0,0 +1,69 @@
+from dataclasses import replace
+
+import pytest
+
+import browser
+from config import Config, Downloader
+import strategy
+import strategy.archive
+
+PAGES = {
+    "https://example.com/a": ("<html><body><p>Café</p></body></html>", "text/html"),
+    "https://example.com/b": ("<html><body><p>B</p></body></html>", None),
+}
+
+
+class StubDownloader(strategy.Downloader):
+    def __call__(self, url, context=None):
+        if url not in PAGES:
+            raise strategy.DownloadError("Not found: %s" % (url,))
+        html, content_type = PAGES[url]
+        context.content_type = content_type
+        context.encoding = "utf-8"
+        return html
+
+
+@pytest.fixture
+def archive_file(tmp_path):
+    fname = str(tmp_path / "pages.archive")
+    errors = strategy.archive.record(
+        fname, list(PAGES.keys()) + ["https://example.com/c"], StubDownloader(), 0
+    )
+    assert list(errors.keys()) == ["https://example.com/c"]
+    return fname
+
+
+def test_archive_round_trip(archive_file):
+    reader = strategy.archive.ArchiveReader(archive_file)
+    assert len(reader) == 2
+    assert sorted(reader.urls()) == sorted(PAGES.keys())
+    for (url, (html, content_type)) in PAGES.items():
+        assert reader.get(url) == (html, content_type, "utf-8")
+    with pytest.raises(KeyError):
+        reader.get("https://example.com/c")
+
+
+def test_archive_rejects_other_files(tmp_path):
+    fname = str(tmp_path / "other")
+    with open(fname, "wb") as f:
+        f.write(b"not an archive, but long enough to have a footer")
+    with pytest.raises(ValueError):
+        strategy.archive.ArchiveReader(fname)
+
+
+def test_replay_downloader(archive_file):
+    config = replace(
+        Config(),
+        downloader=Downloader.Replay,
+        downloader_options={"archive_file": archive_file},
+    )
+    download = browser.get_downloader(config)
+    context = strategy.FetchContext(url="https://example.com/a")
+    assert download("https://example.com/a", context=context) == PAGES[
+        "https://example.com/a"
+    ][0]
+    assert context.content_type == "text/html"
+    assert context.encoding == "utf-8"
+
+    with pytest.raises(strategy.DownloadError):
+        download("https://example.com/c")
@@ -1,8 +1,19 @@
 from datetime import date
 
 from hypothesis import given
+import pytest
 
-from shared.model.article import FetchedArticle
+from shared.model.article import (
+    ArticleIssue,
+    ArticleIssueMissing,
+    ArticleIssueShort,
+    ArticleIssues,
+    ArticleRejected,
+    BODY,
+    FetchedArticle,
+    METADATA,
+    ValidatorRegistry,
+)
 from test.util.fetch import article_data_examples
 
 TODAY = date.today()
@@ -15,3 +26,102 @@ def test_decode_encode(data):
     for (k, v) in data.items():
         assert encoded[k] == v
     assert encoded["$type"] == "FetchedArticle"
+
+
+def test_text_and_html_derived_once_from_body():
+    calls = []
+
+    def normalize(body):
+        calls.append(body)
+        return (body.upper(), "<p>%s</p>" % (body,))
+
+    article = FetchedArticle(title="Title", authors=[], encoding="utf8")
+    article.set_body("body", normalize)
+    assert calls == []
+    assert article.text == "BODY"
+    assert article.html == "<p>body</p>"
+    assert calls == ["body"]
+    assert article.body is None
+
+
+def test_body_checked_without_deriving():
+    calls = []
+
+    def normalize(body):
+        calls.append(body)
+        return (body, body)
+
+    article = FetchedArticle(title="Title", authors=[], encoding="utf8")
+    article.set_body("body", normalize)
+    article.check(BODY)
+    assert [i.__class__ for i in article.issues] == [ArticleIssueShort]
+    assert calls == []
+    assert article.body == "body"
+
+
+def test_page_only_serialized_if_kept():
+    article = FetchedArticle(
+        title="Title", authors=[], encoding="utf8", text="Text", html="<p>Text</p>"
+    )
+    assert "page" not in article.to_json(full=True)
+    assert "body" not in article.to_json(full=True)
+
+    article.page = "<html>...</html>"
+    assert FetchedArticle.from_json(article.to_json(full=True)) == article
+
+
+def test_validators_run_once_and_issues_are_carried():
+    article = FetchedArticle(
+        title="Title", authors=[], encoding="utf8", text="Text", html="<p>Text</p>"
+    )
+    assert article.to_json()["issues"] is None
+    assert [type(i) for i in article.check(METADATA)] == [ArticleIssueMissing]
+    with pytest.raises(ArticleIssues) as e:
+        article.validate()
+    assert [type(i) for i in e.value.issues] == [
+        ArticleIssueMissing,
+        ArticleIssueShort,
+    ]
+
+    decoded = FetchedArticle.from_json(article.to_json())
+    assert decoded.validated()
+    decoded.html = "<p>%s</p>" % ("Long text " * 200,)  # not re-validated
+    with pytest.raises(ArticleIssues) as e:
+        decoded.validate()
+    assert e.value.issues == article.issues
+
+
+def test_registry_runs_cheap_validators_first_and_fatal_ones_reject():
+    registry = ValidatorRegistry()
+    calls = []
+
+    @registry.validator(stage=BODY, cost=5)
+    def costly(article):
+        calls.append("costly")
+        yield ArticleIssueMissing("something")
+
+    @registry.validator(stage=BODY, cost=1, fatal=True)
+    def cheap(article):
+        calls.append("cheap")
+        return iter([])
+
+    article = FetchedArticle(title="Title", authors=[], encoding="utf8")
+    assert registry.run(article, BODY) == [ArticleIssueMissing("something")]
+    assert calls == ["cheap", "costly"]
+    assert registry.run(article, METADATA) == []
+
+    @registry.validator(stage=BODY, cost=0, fatal=True)
+    def untitled(article):
+        yield ArticleIssueMissing("title")
+
+    with pytest.raises(ArticleRejected):
+        registry.run(article, BODY)
+    with pytest.raises(ValueError):
+        registry.validator(stage="unknown")
+
+
+def test_issue_types_decoded_by_registry():
+    issue = ArticleIssueShort(size=10)
+    assert ArticleIssue.from_json(issue.to_json()) == issue
+    with pytest.raises(ValueError):
+        ArticleIssue.from_json({"$type": "ArticleIssueUnknown"})
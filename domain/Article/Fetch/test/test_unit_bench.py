@@ -0,0 +1,63 @@
+import pytest
+
+from config import BodyParser, MetadataParser
+import strategy.archive
+from test.util import bench
+
+URL = "https://example.com/2019/08/28/story.html"
+HTML = """<html><head><title>A story</title></head><body><article>
+<h1>A story</h1>
+<p>The council met on Tuesday to discuss the new budget for the city parks,
+which has been delayed for several months because of disagreements about how
+the money should be spent.</p>
+<p>Residents who spoke at the meeting asked for more trees and for the
+playgrounds to be repaired before the summer, when most families visit.</p>
+</article></body></html>"""
+
+
+@pytest.fixture
+def archive_file(tmp_path):
+    fname = str(tmp_path / "corpus.archive")
+    with strategy.archive.ArchiveWriter(fname) as writer:
+        writer.add(URL, HTML, "text/html", "utf-8")
+    return fname
+
+
+def test_benchmark_covers_every_strategy(archive_file):
+    report = bench.Benchmark(archive_file, repeat=2).run()
+
+    assert report["download"]["runs"] == 2
+    assert report["download"]["peak_memory"] > 0
+    for metadata_parser in MetadataParser:
+        assert "metadata_parse:%s" % (metadata_parser.name,) in report
+    for body_parser in BodyParser:
+        r = report["body_parse:%s" % (body_parser.name,)]
+        assert r["runs"] + r["errors"] == 2
+    r = report["markdown:%s" % (BodyParser.BeautifulSoup.name,)]
+    assert r["runs"] == 2
+    assert r["p50"] <= r["p95"] <= r["p99"]
+    assert r["throughput"] > 0
+
+
+def test_regressions():
+    baseline = {
+        "a": {"p50": 0.010, "p95": 0.020, "peak_memory": 1000000},
+        "b": {"p50": 0.010, "p95": 0.020, "peak_memory": None},
+    }
+    report = {
+        "a": {"p50": 0.020, "p95": 0.021, "peak_memory": 1500000},
+        "b": {"p50": 0.0105, "p95": 0.020, "peak_memory": 2000000},
+        "c": {"p50": 1.0, "p95": 1.0, "peak_memory": 1},
+    }
+    found = bench.regressions(report, baseline, threshold=0.2)
+    assert sorted((r["stage"], r["metric"]) for r in found) == [
+        ("a", "p50"),
+        ("a", "peak_memory"),
+    ]
+
+
+def test_baseline_round_trip(tmp_path):
+    fname = str(tmp_path / "baseline.json")
+    report = {"a": {"runs": 1, "p50": 0.01}}
+    bench.save_baseline(report, fname)
+    assert bench.load_baseline(fname) == report
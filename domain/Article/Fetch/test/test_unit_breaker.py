@@ -0,0 +1,73 @@
+from unittest.mock import patch
+
+import pytest
+
+import breaker
+
+
+class Failure(Exception):
+    pass
+
+
+def fail():
+    raise Failure()
+
+
+def succeed():
+    return "ok"
+
+
+def test_opens_after_threshold_and_fails_fast():
+    cb = breaker.CircuitBreaker(threshold=3, reset_timeout=60, failure_class=(Failure,))
+    for _ in range(3):
+        with pytest.raises(Failure):
+            cb.call("a.com", fail)
+    assert cb.state("a.com")["state"] == breaker.OPEN
+
+    calls = []
+    with pytest.raises(breaker.CircuitOpen):
+        cb.call("a.com", calls.append, 1)
+    assert calls == []
+    assert cb.call("b.com", succeed) == "ok"
+
+
+def test_success_resets_failures_and_other_errors_do_not_count():
+    cb = breaker.CircuitBreaker(threshold=2, failure_class=(Failure,))
+    with pytest.raises(Failure):
+        cb.call("a.com", fail)
+    cb.call("a.com", succeed)
+    with pytest.raises(ValueError):
+        cb.call("a.com", int, "x")
+    with pytest.raises(Failure):
+        cb.call("a.com", fail)
+    assert cb.state("a.com") == {
+        "state": breaker.CLOSED,
+        "failures": 1,
+        "opened_at": None,
+    }
+
+
+def test_half_open_trial_closes_or_reopens():
+    store = breaker.MemoryBreakerStore()
+    cb = breaker.CircuitBreaker(
+        store=store, threshold=1, reset_timeout=60, failure_class=(Failure,)
+    )
+    with patch("breaker.time", return_value=1000):
+        with pytest.raises(Failure):
+            cb.call("a.com", fail)
+
+    with patch("breaker.time", return_value=1061):
+        with pytest.raises(Failure):
+            cb.call("a.com", fail)
+        assert store.get("a.com")["state"] == breaker.OPEN
+        with pytest.raises(breaker.CircuitOpen):
+            cb.call("a.com", succeed)
+
+    with patch("breaker.time", return_value=1122):
+        cb.before_call("a.com")
+        assert store.get("a.com")["state"] == breaker.HALF_OPEN
+        with pytest.raises(breaker.CircuitOpen):
+            cb.call("a.com", succeed)  # trial already in progress
+        cb.record_success("a.com")
+        assert cb.call("a.com", succeed) == "ok"
+        assert store.get("a.com")["state"] == breaker.CLOSED
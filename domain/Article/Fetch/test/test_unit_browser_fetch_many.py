@@ -0,0 +1,99 @@
+from threading import Lock
+from time import sleep
+from unittest.mock import patch
+
+from hypothesis import given, settings
+import hypothesis.strategies as hyp
+
+import browser
+
+
+class FakeFetch:
+    def __init__(self, delay=0.01, fail=()):
+        self.delay = delay
+        self.fail = fail
+        self.lock = Lock()
+        self.running = {}
+        self.max_running = 0
+        self.max_running_by_site = {}
+        self.configs = {}
+
+    def __call__(self, url, configs, pause=2, deadline=None):
+        site, _ = browser.url_site_and_domain(url)
+        with self.lock:
+            self.configs[url] = configs
+            self.running[site] = self.running.get(site, 0) + 1
+            self.max_running = max(self.max_running, sum(self.running.values()))
+            self.max_running_by_site[site] = max(
+                self.max_running_by_site.get(site, 0), self.running[site]
+            )
+        sleep(self.delay)
+        with self.lock:
+            self.running[site] = self.running[site] - 1
+        if url in self.fail:
+            raise browser.FetchError("Failed %s" % (url,))
+        return url
+
+
+def url_batch_examples():
+    sites = hyp.sampled_from(["a.com", "www.b.com", "c.co.uk", "d.org"])
+    return hyp.lists(
+        hyp.tuples(sites, hyp.integers(min_value=0, max_value=1000)).map(
+            lambda p: "https://%s/%d" % p
+        ),
+        min_size=1,
+        max_size=30,
+        unique=True,
+    )
+
+
+@given(
+    urls=url_batch_examples(),
+    max_workers=hyp.integers(min_value=1, max_value=6),
+    max_per_host=hyp.integers(min_value=1, max_value=3),
+)
+@settings(deadline=None, max_examples=20)
+def test_fetch_many_respects_concurrency_limits(urls, max_workers, max_per_host):
+    fake = FakeFetch()
+    with patch("browser.fetch", fake):
+        results = list(
+            browser.fetch_many(urls, max_workers=max_workers, max_per_host=max_per_host)
+        )
+
+    assert sorted(r.url for r in results) == sorted(urls)
+    assert fake.max_running <= max_workers
+    for n in fake.max_running_by_site.values():
+        assert n <= max_per_host
+
+
+def test_fetch_many_returns_errors_and_uses_configs_per_url():
+    urls = ["https://a.com/1", "https://a.com/2", "https://b.com/1"]
+    fake = FakeFetch(fail=["https://a.com/2"])
+    with patch("browser.fetch", fake):
+        results = {
+            r.url: r for r in browser.fetch_many(urls, configs_for=lambda u: [u])
+        }
+
+    assert results["https://a.com/1"].article == "https://a.com/1"
+    assert results["https://a.com/1"].error is None
+    assert results["https://a.com/2"].article is None
+    assert isinstance(results["https://a.com/2"].error, browser.FetchError)
+    assert fake.configs == {url: [url] for url in urls}
+
+
+def test_fetch_many_returns_config_errors_and_looks_up_configs_when_called():
+    urls = ["https://a.com/1", "https://b.com/1"]
+    fake = FakeFetch()
+
+    def configs_for(url):
+        if url == "https://b.com/1":
+            raise ValueError("No configs")
+        return [url]
+
+    with patch("browser.fetch", fake), patch("browser.configs_for_url", configs_for):
+        results = {r.url: r for r in browser.fetch_many(urls)}
+
+    assert results["https://a.com/1"].article == "https://a.com/1"
+    assert results["https://b.com/1"].article is None
+    assert isinstance(results["https://b.com/1"].error, ValueError)
+    assert list(fake.configs) == ["https://a.com/1"]
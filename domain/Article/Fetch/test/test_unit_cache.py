@@ -0,0 +1,90 @@
+from datetime import date
+from unittest.mock import patch
+
+from shared.model.article import FetchedArticle
+from config import Config, BodyParser
+import cache
+
+ARTICLE = FetchedArticle(
+    title="Title",
+    authors=["A. Author"],
+    encoding="utf-8",
+    text="Body",
+    html="<p>Body</p>",
+    publish_date=date(2019, 8, 1),
+)
+
+
+class Fetcher:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls = self.calls + 1
+        return ARTICLE
+
+
+def test_cache_key_depends_on_standardized_url_and_configs():
+    lxml = Config(body_parser=BodyParser.LXML)
+    key = cache.cache_key("https://A.com/x", [Config(), lxml])
+    assert key == cache.cache_key("https://a.com/x", [lxml, Config()])
+    assert key != cache.cache_key("https://a.com/x", [Config()])
+    assert key != cache.cache_key("https://a.com/y", [Config(), lxml])
+
+
+def test_hits_misses_and_bypass():
+    results = cache.ResultCache()
+    fetch = Fetcher()
+    assert results.get_or_fetch("k", fetch) == ARTICLE
+    assert results.get_or_fetch("k", fetch) == ARTICLE
+    assert fetch.calls == 1
+    assert results.get_or_fetch("k", fetch, bypass=True) == ARTICLE
+    assert fetch.calls == 2
+    assert (results.hits, results.misses) == (1, 2)
+
+
+def test_entries_expire_after_ttl():
+    results = cache.ResultCache(ttl=60)
+    fetch = Fetcher()
+    with patch("cache.time", return_value=1000):
+        results.get_or_fetch("k", fetch)
+    with patch("cache.time", return_value=1060):
+        results.get_or_fetch("k", fetch)
+    assert fetch.calls == 1
+    with patch("cache.time", return_value=1061):
+        results.get_or_fetch("k", fetch)
+    assert fetch.calls == 2
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = cache.MemoryCacheBackend(max_entries=2)
+    backend.set("a", {"n": 1})
+    backend.set("b", {"n": 2})
+    backend.get("a")
+    backend.set("c", {"n": 3})
+    assert backend.get("b") is None
+    assert backend.get("a") == {"n": 1}
+    assert backend.get("c") == {"n": 3}
+
+
+def test_disk_backend_round_trip_and_size_bound(tmp_path):
+    results = cache.ResultCache(cache.DiskCacheBackend(str(tmp_path), max_entries=2))
+    fetch = Fetcher()
+    for key in ("a", "b", "c"):
+        results.get_or_fetch(key, fetch)
+    assert len(list(tmp_path.glob("*.json"))) == 2
+    assert results.get("c") == ARTICLE
+
+
+def test_fetch_article_uses_cache_unless_refetch():
+    import main
+
+    with patch("browser.fetch_coalesced", return_value=ARTICLE) as fetch, patch(
+        "main.fetch_cache", cache.ResultCache()
+    ):
+        url = "https://example.com/cached"
+        assert main._fetch_article(url) == ARTICLE
+        assert main._fetch_article(url) == ARTICLE
+        assert fetch.call_count == 1
+        main._fetch_article(url, refetch=True)
+        assert fetch.call_count == 2
@@ -0,0 +1,30 @@
+import charset
+
+HEAD = '<html><head><meta http-equiv="Content-Type" content="text/html; charset=%s">'
+
+
+def test_content_type_charset_comes_first():
+    html = (HEAD % ("iso-8859-1",)).encode("ascii")
+    assert charset.resolve_encoding(html, "text/html; charset=UTF-8") == "utf-8"
+
+
+def test_meta_charset_is_found_in_head_only():
+    assert charset.resolve_encoding(HEAD % ("latin-1",)) == "iso8859-1"
+    assert charset.resolve_encoding('<meta charset="koi8-r">'.encode()) == "koi8-r"
+    late = " " * charset.HEAD_SIZE + '<meta charset="koi8-r">'
+    assert charset.encoding_from_meta(late) is None
+
+
+def test_unknown_charsets_are_skipped():
+    html = '<meta charset="not-a-charset">'
+    assert charset.resolve_encoding(html, "text/html; charset=bogus") == "utf8"
+
+
+def test_undeclared_bytes_are_detected():
+    html = "<p>Ceci est un texte en français, déjà très accentué.</p>" * 10
+    assert charset.resolve_encoding(html.encode("utf-8")) == "utf-8"
+
+
+def test_undeclared_non_utf8_bytes_are_detected():
+    html = "<p>Ceci est un texte en français, déjà très accentué.</p>" * 10
+    assert charset.resolve_encoding(html.encode("windows-1252")) != "utf-8"
@@ -0,0 +1,83 @@
+from dataclasses import replace
+import json
+import os
+import pickle
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from config import Config, BodyParser, Downloader
+from strategy.registry import StrategyRegistry
+import strategy
+
+"""
+Import-time checks of the Fetch function's cold start: importing main must
+not load the strategy libraries (see strategy.registry), and must finish
+within FETCH_COLD_START_BUDGET seconds.
+"""
+
+COLD_START_BUDGET = float(os.environ.get("FETCH_COLD_START_BUDGET", "1.5"))
+LAZY_MODULES = ["newspaper", "bs4", "lxml", "html2text", "markdown2", "tldextract"]
+
+IMPORT_MAIN = """
+import json, sys, time
+t0 = time.perf_counter()
+import main
+seconds = time.perf_counter() - t0
+print(json.dumps({"seconds": seconds, "modules": sorted(sys.modules)}))
+"""
+
+
+def cold_import() -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p or "." for p in sys.path))
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_MAIN],
+        env=env,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def test_import_main_within_budget_without_strategy_libraries():
+    result = cold_import()
+    loaded = [m for m in LAZY_MODULES if m in result["modules"]]
+    assert loaded == []
+    assert result["seconds"] < COLD_START_BUDGET
+
+
+class Stub(strategy.BodyParser):
+    instances = 0
+
+    def __init__(self, options={}):
+        Stub.instances = Stub.instances + 1
+        self.options = options
+
+
+def test_registry_loads_on_first_use_and_caches_by_config():
+    registry = StrategyRegistry({BodyParser.LXML: (__name__, "Stub")})
+    config = Config(body_parser=BodyParser.LXML, body_parser_options={"a": 1})
+    parser = registry.body_parser(config)
+    assert isinstance(parser, Stub)
+    assert parser.options == {"a": 1}
+    assert registry.body_parser(Config.from_json(config.to_json())) is parser
+    assert registry.body_parser(Config(body_parser=BodyParser.LXML)) is not parser
+    assert Stub.instances == 2
+
+    with pytest.raises(ValueError) as e:
+        registry.downloader(Config(downloader=Downloader.Replay))
+    assert "Unknown downloader" in str(e.value)
+
+
+def test_fingerprint_is_computed_once_per_config():
+    config = Config(body_parser=BodyParser.LXML, body_parser_options={"a": 1})
+    with patch("config.sha1") as sha1:
+        assert config.fingerprint() == config.fingerprint()
+    assert not sha1.called
+    assert pickle.loads(pickle.dumps(config)).fingerprint() == config.fingerprint()
+    changed = replace(config, body_parser_options={"a": 2})
+    assert changed.fingerprint() != config.fingerprint()
+    assert changed.fingerprint() == Config.from_json(changed.to_json()).fingerprint()
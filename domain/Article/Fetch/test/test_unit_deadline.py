@@ -0,0 +1,105 @@
+from time import sleep, time
+from unittest.mock import patch
+
+import pytest
+
+from config import Config, BodyParser
+from deadline import Deadline, StageTimeout, call_with_timeout, stage_budget
+import browser
+import parsing
+import strategy
+
+HTML = "<html><body><article><p>Text</p></article></body></html>"
+
+
+class StubDownloader(strategy.Downloader):
+    def __call__(self, url, context=None):
+        return HTML
+
+
+class StubMetadataParser(strategy.MetadataParser):
+    def __call__(self, url, html, context=None):
+        return browser.FetchedArticle(
+            title="", authors=[], encoding="utf8", body=html
+        )
+
+
+class SlowBodyParser(strategy.BodyParser):
+    def __call__(self, url, html, article, context=None):
+        while True:
+            context.check_deadline("body_parse")
+            sleep(0.01)
+
+
+class FastBodyParser(strategy.BodyParser):
+    def __call__(self, url, html, article, context=None):
+        return "<p>Text</p>"
+
+
+SLOW = Config(body_parser=BodyParser.LXML, stage_budgets={"body_parse": 0.1})
+FAST = Config(body_parser=BodyParser.BeautifulSoup)
+
+
+def get_body_parser(config):
+    return (
+        SlowBodyParser() if config.body_parser == BodyParser.LXML else FastBodyParser()
+    )
+
+
+@pytest.fixture
+def stub_strategies():
+    with patch("browser.get_downloader", lambda c: StubDownloader()), patch(
+        "browser.get_metadata_parser", lambda c: StubMetadataParser()
+    ), patch("browser.get_body_parser", get_body_parser), patch(
+        "browser.parse_engine", parsing.ParseEngine(inline=True)
+    ):
+        yield
+
+
+def test_stage_budget():
+    assert stage_budget("download") == 15.0
+    assert stage_budget("download", {"download": 3}) == 3
+    assert stage_budget("download", {}, Deadline.after(1)) <= 1
+    assert stage_budget("download", {}, Deadline(time() - 1)) == 0
+
+
+def test_call_with_timeout():
+    assert call_with_timeout("stage", 1, lambda x: x + 1, 1) == 2
+    with pytest.raises(ValueError):
+        call_with_timeout("stage", 1, int, "x")
+    t0 = time()
+    with pytest.raises(StageTimeout):
+        call_with_timeout("stage", 0.05, sleep, 1)
+    assert time() - t0 < 0.5
+
+
+def test_fetch_falls_back_when_over_budget(stub_strategies):
+    t0 = time()
+    article = browser.fetch("https://a.com/1", [SLOW, FAST], pause=0)
+    assert article.html is not None
+    assert time() - t0 < 1
+
+
+def test_fetch_stops_at_deadline(stub_strategies):
+    with pytest.raises(browser.FetchError) as e:
+        browser.fetch("https://a.com/1", [FAST], pause=0, deadline=Deadline(time() - 1))
+    assert "Deadline" in str(e.value)
+
+    t0 = time()
+    with pytest.raises(browser.FetchError):
+        browser.fetch(
+            "https://a.com/1",
+            [SLOW, SLOW, SLOW],
+            pause=10,
+            deadline=Deadline.after(0.3),
+        )
+    assert time() - t0 < 1
+
+
+def test_config_stage_budgets():
+    assert "stage_budgets" not in Config().to_json()
+    config = Config.from_json({"stage_budgets": {"download": 5}})
+    assert config.stage_budgets == {"download": 5.0}
+    assert Config.from_json(config.to_json()) == config
+    with pytest.raises(ValueError):
+        Config.from_json({"stage_budgets": {"render": 5}})
@@ -0,0 +1,71 @@
+import json
+
+from hypothesis import given
+import hypothesis.strategies as hyp
+
+from shared.event import fetch as fetch_event
+from shared.model.article import BODY, FetchedArticle
+from shared.util import lazy_json
+from shared.util.string_ import ellipsis
+
+TEXT = 'Quoted "words", a \\ backslash, café and \U0001f600. ' + "Words. " * 250
+QUOTED = '<p class="a">"x"</p>' * 100
+
+
+def test_large_strings_of_lazy_keys_are_not_decoded():
+    data = lazy_json.loads(
+        json.dumps({"text": TEXT, "title": TEXT, "authors": [TEXT], "html": "<p/>"})
+    )
+    assert isinstance(data["text"], lazy_json.LazyString)
+    assert data["text"].decode() == TEXT
+    assert data["title"] == TEXT
+    assert data["authors"] == [TEXT]
+    assert data["html"] == "<p/>"
+
+
+def test_strings_with_many_escaped_quotes_and_nested_lists_are_decoded():
+    doc = {"html": QUOTED, "text": [TEXT], "a": [[{"text": TEXT}], [TEXT]]}
+    data = lazy_json.loads(json.dumps(doc))
+    assert data["html"] == QUOTED
+    assert data["text"] == [TEXT]
+    assert isinstance(data["a"][0][0]["text"], lazy_json.LazyString)
+    assert lazy_json.resolved(data["a"][0][0]["text"]) == TEXT
+    assert data["a"][1] == [TEXT]
+
+
+def test_keys_within_strings_are_not_lazy():
+    doc = {"title": '"text": "%s"' % (TEXT,), "text": "x" * 2000}
+    data = lazy_json.loads(json.dumps(doc, indent=2))
+    assert data["title"] == doc["title"]
+    assert str(data["text"]) == doc["text"]
+
+
+@given(text=hyp.text(min_size=1, max_size=300), length=hyp.integers(1, 100))
+def test_ellipsis_and_prefix_match_decoded(text, length):
+    encoded = json.dumps(text)
+    lazy = lazy_json.LazyString(encoded, 1, len(encoded) - 1)
+    assert lazy.ellipsis(length) == ellipsis(text, length)
+    assert ellipsis(lazy, length, "end") == ellipsis(text, length, "end")
+    assert lazy.prefix(length).startswith(text[:length])
+    assert lazy_json.at_least(lazy, length) == (len(text) >= length)
+
+
+def test_article_decoded_lazily():
+    article = FetchedArticle(
+        title="Title", authors=[], encoding="utf8", text=TEXT, html="<p>%s</p>" % TEXT
+    )
+    event = fetch_event.SucceededFetchingArticle(id="1", url="u", article=article)
+    decoded = fetch_event.from_json(lazy_json.loads(json.dumps(event.to_json())))
+
+    assert isinstance(decoded.article._html, lazy_json.LazyString)
+    assert decoded.article.to_json() == article.to_json()
+    decoded.article.check(BODY)
+    assert isinstance(decoded.article._html, lazy_json.LazyString)
+    assert decoded.article.text == TEXT
+    assert decoded == event
+
+
+@given(text=hyp.text(alphabet='"\\ab', max_size=300))
+def test_string_end_skips_escaped_quotes(text):
+    encoded = json.dumps(text)
+    assert lazy_json.string_end(encoded + ', "x"', 1) == len(encoded) - 1
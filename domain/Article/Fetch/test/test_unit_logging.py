@@ -0,0 +1,219 @@
+import json
+import logging as base_logging
+from threading import Event
+
+import pytest
+
+from shared.adapter import logging
+
+"""
+Deferred logging initialization: records are buffered until the remote
+handler connects (in the background), or logging falls back to local. And
+queued logging: records are handled in batches by a listener thread.
+"""
+
+
+class ListHandler(base_logging.Handler):
+    def __init__(self):
+        super(ListHandler, self).__init__()
+        self.records = []
+        self.closed = False
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def close(self):
+        self.closed = True
+        super(ListHandler, self).close()
+
+
+class BatchListHandler(ListHandler):
+    def __init__(self):
+        super(BatchListHandler, self).__init__()
+        self.batches = []
+
+    def emit_batch(self, records):
+        self.batches.append([r.msg for r in records])
+        self.records.extend(records)
+
+
+@pytest.fixture
+def root_logger(monkeypatch):
+    """ Note: logging as initialized on import of main is set aside """
+    monkeypatch.setattr(logging, "_queued", None)
+    root = base_logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    root.handlers = []
+    yield root
+    logging.stop_logging()
+    root.handlers = handlers
+    root.setLevel(level)
+
+
+@pytest.fixture
+def local(monkeypatch):
+    handler = ListHandler()
+    monkeypatch.setattr(logging, "local_handler", lambda labels=None: handler)
+    return handler
+
+
+def wait_for_target(handler, timeout=5.0):
+    for _ in range(int(timeout * 100)):
+        if handler.target is not None:
+            return handler.target
+        Event().wait(0.01)
+    raise AssertionError("Not attached within %s sec" % (timeout,))
+
+
+def test_buffers_until_connected_then_flushes_in_order(root_logger, local):
+    connected = Event()
+    remote = ListHandler()
+
+    def connect():
+        connected.wait(5.0)
+        return remote
+
+    handler = logging.init_deferred_logging(connect, timeout=10.0)
+    logger = logging.get_logger("test")
+    logger.info("one", {"n": 1})
+    logger.info("two", {"n": 1})
+    assert logging.flush_logging()
+    assert len(handler.buffer) == 2
+    connected.set()
+    assert wait_for_target(handler) is remote
+    logger.info("three", {"n": 1})
+    assert logging.flush_logging()
+    assert [r.msg for r in remote.records] == ["one", "two", "three"]
+    assert local.records == []
+
+
+def test_falls_back_to_local_if_connect_fails(root_logger, local):
+    def connect():
+        raise RuntimeError("no credentials")
+
+    handler = logging.init_deferred_logging(connect, timeout=10.0)
+    assert wait_for_target(handler) is local
+    assert logging.flush_logging()
+    assert "no credentials" in local.records[-1].args["error"]
+
+
+def test_falls_back_to_local_on_timeout_and_closes_late_remote(root_logger, local):
+    connected = Event()
+    remote = ListHandler()
+
+    def connect():
+        connected.wait(5.0)
+        return remote
+
+    handler = logging.init_deferred_logging(connect, timeout=0.05)
+    logging.get_logger("test").info("before", {"n": 1})
+    assert wait_for_target(handler) is local
+    connected.set()
+    for _ in range(500):
+        if remote.closed:
+            break
+        Event().wait(0.01)
+    assert remote.closed
+    assert logging.flush_logging()
+    assert remote.records == []
+    assert [r.msg for r in local.records][0] == "before"
+
+
+def test_buffer_drops_oldest_records_when_full():
+    handler = logging.DeferredHandler(capacity=2)
+    for i in range(5):
+        handler.handle(base_logging.makeLogRecord({"msg": str(i)}))
+    target = ListHandler()
+    assert handler.attach(target)
+    assert not handler.attach(ListHandler())
+    assert [r.msg for r in target.records] == ["3", "4"]
+    assert handler.dropped == 3
+
+
+def test_queue_drops_oldest_and_counts_when_full():
+    queue = logging.LogQueue(maxsize=3)
+    for i in range(5):
+        queue.put_nowait(i)
+    assert [queue.get_nowait() for _ in range(3)] == [2, 3, 4]
+    assert queue.dropped == 2
+    for _ in range(3):
+        queue.task_done()
+    assert queue.wait_done(timeout=0)
+
+
+def test_listener_hands_records_in_batches_and_reports_drops():
+    queue = logging.LogQueue(maxsize=4)
+    for i in range(6):
+        queue.put_nowait(base_logging.makeLogRecord({"msg": str(i), "levelno": 20}))
+    handler = BatchListHandler()
+    listener = logging.BatchQueueListener(queue, handler, batch_size=3)
+    listener.start()
+    listener.stop()
+    assert handler.batches == [
+        ["Dropped {dropped} log records: the log queue was full", "2", "3", "4"],
+        ["5"],
+    ]
+    assert handler.records[0].args["dropped"] == 2
+
+
+def test_flush_logs_after_each_call(root_logger, local):
+    logging.init_local_logging()
+
+    @logging.flush_logs()
+    def handle(n):
+        logging.get_logger("test").info("handled {n}", {"n": n})
+        return n
+
+    assert handle(1) == 1
+    assert [r.args["n"] for r in local.records] == [1]
+
+
+def test_format_message_with_and_without_fields():
+    formatter = logging.LogFormatter(*logging.FORMATTER_ARGS)
+    for (msg, expected) in [("Fetched {n}", "Fetched 2"), ("{{literal}}", "{literal}")]:
+        for _ in range(2):  # cached template
+            record = base_logging.makeLogRecord({"msg": msg, "args": {"n": 2}})
+            assert formatter.format(record)["message"] == expected
+    record = base_logging.makeLogRecord({"msg": "No fields", "args": {"n": 2}})
+    assert formatter.format(record)["message"] == "No fields"
+
+
+@pytest.mark.parametrize(
+    "msg",
+    [
+        "Got {x!r} in {seconds:.2f} sec, {n:>3}",
+        "a}}b{{c{n}",
+        "{n.real} and {x[0]}",
+        "{n:{width}}",
+        "{0}",
+        "{n",
+        "{missing}",
+    ],
+)
+def test_compiled_template_formats_as_format_map(msg):
+    data = {"x": "a b", "seconds": 1.2345, "n": 2, "width": 4}
+    try:
+        expected = msg.format_map(data)
+    except Exception as e:
+        with pytest.raises(e.__class__):
+            logging.compile_template(msg)(data)
+    else:
+        assert logging.compile_template(msg)(data) == expected
+
+
+def test_json_exception_leaves_exception_as_is():
+    error = ValueError("bad")
+    error.url = "https://example.com/"
+    assert logging._json_exception(error) == {
+        "url": "https://example.com/",
+        "$type": "ValueError",
+    }
+    assert error.__dict__ == {"url": "https://example.com/"}
+
+
+def test_local_log_entry_falls_back_to_message_if_not_serializable():
+    formatter = logging.LocalLogFormatter({}, *logging.FORMATTER_ARGS)
+    record = base_logging.makeLogRecord({"msg": "Got {x}", "args": {"x": object()}})
+    with pytest.warns(UserWarning):
+        entry = json.loads(formatter.format(record))
+    assert entry["jsonPayload"]["message"].startswith("Got <object")
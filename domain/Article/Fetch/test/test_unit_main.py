@@ -23,6 +23,7 @@ from shared.event.fetch import (
 from shared.util.test import assert_serialized_event
 
 from main import fetch
+from breaker import CircuitOpen
 from browser import FetchError
 
 from test.util.fetch import UNBLOCKED_URLS, WARNING_URLS, BLOCKED_URLS, UNKNOWN_URLS
@@ -91,3 +92,16 @@ def test_fetch_blocked_unknown_urls_publishes_failed_fetching_article_and_throws
     assert ret is None
     publish.assert_called_once()
     assert_serialized_event(FailedFetchingArticle, publish.call_args[0][0])
+
+
+def test_fetch_with_circuit_open_publishes_failure_without_retry():
+    event = SavedNewRequestedArticle(id=str(uuid4()), url="https://example.com/a")
+    message, ctx = gcf_encoding(event.to_json(), {})
+
+    with patch("env.publish") as publish, patch(
+        "main._fetch_article", side_effect=CircuitOpen("example.com", 60)
+    ):
+        assert fetch(message, ctx) == ""
+
+    publish.assert_called_once()
+    assert_serialized_event(FailedFetchingArticle, publish.call_args[0][0])
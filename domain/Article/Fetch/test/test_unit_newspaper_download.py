@@ -0,0 +1,100 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from threading import Thread
+
+import newspaper
+import pytest
+
+import strategy
+from strategy import FetchContext
+from strategy.newspaper import Downloader, download_html
+
+HTML = "<html><head><title>Café</title></head><body><p>Hello</p></body></html>"
+META_HTML = (
+    '<html><head><meta charset="windows-1252"><title>Café</title></head>'
+    "<body><p>Hello</p></body></html>"
+)
+
+
+def refresh_to(path):
+    return (
+        "text/html",
+        (
+            "<html><head><meta http-equiv='refresh' content=\"0;URL='%s'\"></head>"
+            "<body></body></html>" % (path,)
+        ).encode("utf-8"),
+    )
+
+
+RESPONSES = {
+    "/refresh": refresh_to("/article"),
+    "/refresh-large": refresh_to("/large"),
+    "/refresh-pdf": refresh_to("/report.pdf"),
+    "/article": ("text/html; charset=utf-8", HTML.encode("utf-8")),
+    "/no-charset": ("text/html", HTML.encode("utf-8")),
+    "/meta-charset": ("text/html", META_HTML.encode("windows-1252")),
+    "/report.pdf": ("application/pdf", b"%PDF-1.4"),
+    "/large": ("text/html; charset=utf-8", b"<p>" + b"x" * 10000 + b"</p>"),
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        content_type, body = RESPONSES[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if self.path != "/large":
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%d" % (httpd.server_port,)
+    httpd.shutdown()
+
+
+def test_download_html_decodes_with_header_charset(server):
+    context = FetchContext(url=server + "/article")
+    assert download_html(context.url, newspaper.Config(), context=context) == HTML
+    assert context.content_type == "text/html; charset=utf-8"
+    assert context.encoding == "utf-8"
+
+
+def test_download_html_decodes_with_meta_charset(server):
+    context = FetchContext(url=server + "/meta-charset")
+    html = download_html(context.url, newspaper.Config(), context=context)
+    assert html == META_HTML
+    assert context.encoding == "cp1252"
+
+
+def test_download_html_detects_undeclared_charset(server):
+    html = download_html(server + "/no-charset", newspaper.Config())
+    assert html == HTML
+
+
+def test_download_html_rejects_non_html(server):
+    with pytest.raises(strategy.UnsupportedContentType):
+        download_html(server + "/report.pdf", newspaper.Config())
+
+
+def test_download_html_stops_reading_at_cap(server):
+    with pytest.raises(strategy.ContentTooLarge):
+        download_html(server + "/large", newspaper.Config(), max_bytes=1000)
+
+
+def test_meta_refresh_is_followed_within_the_cap(server):
+    download = Downloader({"as_googlebot": True, "max_bytes": 1000})
+    context = FetchContext(url=server + "/refresh")
+    assert download(context.url, context=context) == HTML
+    assert context.final_url == server + "/article"
+    with pytest.raises(strategy.ContentTooLarge):
+        download(server + "/refresh-large")
+    with pytest.raises(strategy.UnsupportedContentType):
+        download(server + "/refresh-pdf")
@@ -0,0 +1,38 @@
+from html2text import HTML2Text
+from markdown2 import markdown
+
+import normalize
+
+CORPUS = [
+    "<div><p>A simple paragraph.</p></div>",
+    "<article><h1>Title</h1><h2>Sub &amp; title</h2><p>Some <em>emphasis</em>, "
+    "<strong>strong</strong> and <code>code</code> * with _special_ chars.</p></article>",
+    "<div><p>Links to <a href='https://example.com/a'>one</a> and "
+    "<a href='https://example.com/b'>two</a>.</p><p>And <a href='/c'>three</a></p></div>",
+    "<div><ul><li>First</li><li>Second <b>bold</b></li></ul>"
+    "<ol><li>One</li><li>Two</li></ol></div>",
+    "<div><blockquote><p>A quote, with a <a href='https://q.com'>link</a>.</p>"
+    "</blockquote><pre>pre\n  formatted</pre><hr/><img src='x.png' alt='X'/></div>",
+    "<div><table><tr><th>A</th><th>B</th></tr><tr><td>1</td><td>2</td></tr></table></div>",
+    "<div><p>Café — “quoted” text …</p><p>1. Not a list</p></div>",
+]
+
+
+def reference_text_and_html(body):
+    md_maker = HTML2Text()
+    md_maker.escape_snob = True
+    md_maker.inline_links = False
+    text = md_maker.handle(body)
+    return (text, markdown(text))
+
+
+def test_text_and_html_matches_reference():
+    for body in CORPUS:
+        assert normalize.text_and_html(body) == reference_text_and_html(body)
+
+
+def test_text_and_html_reuse_does_not_leak_state():
+    expected = [reference_text_and_html(body) for body in CORPUS]
+    for _ in range(2):
+        for body in reversed(CORPUS):
+            assert normalize.text_and_html(body) == expected[CORPUS.index(body)]
@@ -0,0 +1,124 @@
+from time import time
+from unittest.mock import patch
+
+import pytest
+
+from config import Config, BodyParser
+import browser
+from deadline import StageTimeout
+import parsing
+import strategy
+
+PARAGRAPHS = """
+<p>The council met on Tuesday to discuss the new budget for the city parks,
+which has been delayed for several months because of disagreements about how
+the money should be spent.</p>
+<p>Residents who spoke at the meeting asked for more trees and for the
+playgrounds to be repaired before the summer, when most families visit.</p>
+"""
+HTML = (
+    "<html><head><title>Parks</title>"
+    "<link rel='canonical' href='https://example.com/parks'/></head>"
+    "<body><article>%s</article></body></html>" % (PARAGRAPHS,)
+)
+URL = "https://example.com/parks?utm_source=x"
+CONFIGS = [
+    Config(),
+    Config(
+        body_parser=BodyParser.BeautifulSoup,
+        body_parser_options={"css_selectors": ["article"]},
+    ),
+]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = parsing.ParseEngine(max_workers=2)
+    yield engine
+    engine.shutdown()
+
+
+def test_workers_unless_inline():
+    with patch("os.cpu_count", lambda: 3):
+        assert parsing.ParseEngine().max_workers == 3
+    assert not parsing.ParseEngine(max_workers=1).inline()
+    assert parsing.ParseEngine(max_workers=1, inline=True).inline()
+
+
+@pytest.mark.parametrize("config", CONFIGS)
+def test_workers_parse_as_inline(engine, config):
+    html = HTML.encode("utf8")
+    expected = parsing.ParseEngine(inline=True).parse(URL, html, config)
+    context = strategy.FetchContext(url=URL, content_type="text/html")
+    article = engine.parse(URL, html, config, context=context)
+    assert article == expected
+    assert "council met on Tuesday" in article.text
+    assert context.canonical_url == "https://example.com/parks"
+
+
+def test_worker_errors_are_raised(engine):
+    config = Config(
+        body_parser=BodyParser.LXML, body_parser_options={"css_selectors": ["nav"]}
+    )
+    with pytest.raises(parsing.WorkerError) as e:
+        engine.parse(URL, HTML[: -len("</html>")], config)
+    assert "XMLSyntaxError" in str(e.value)
+    with pytest.raises(strategy.ParseBodyError):
+        engine.parse(URL, HTML, config)
+
+
+def test_fetch_parses_in_workers(engine):
+    class StubDownloader(strategy.Downloader):
+        def __call__(self, url, context=None):
+            return HTML
+
+    with patch("browser.parse_engine", engine), patch(
+        "browser.get_downloader", lambda c: StubDownloader()
+    ):
+        article = browser.fetch(URL, CONFIGS[1:], pause=0)
+    assert article.html == parsing.parse(URL, HTML, CONFIGS[1])[0].html
+
+
+def test_workers_are_killed_and_replaced_on_timeout():
+    engine = parsing.ParseEngine(max_workers=2)
+    try:
+        assert "council met" in engine.parse(URL, HTML, CONFIGS[1], timeout=30).text
+        worker = engine._idle.queue[0]
+        t0 = time()
+        with pytest.raises(StageTimeout):
+            engine.parse(URL, HTML * 2000, CONFIGS[0], timeout=0.01)
+        assert time() - t0 < 5
+        assert not worker.process.is_alive()
+        assert engine._started == 0
+        assert "council met" in engine.parse(URL, HTML, CONFIGS[1], timeout=30).text
+        assert engine._started == 1
+    finally:
+        engine.shutdown()
+
+
+def test_dead_workers_are_replaced():
+    engine = parsing.ParseEngine(max_workers=2)
+    try:
+        engine.parse(URL, HTML, CONFIGS[1], timeout=30)
+        worker = engine._idle.queue[0]
+        worker.process.kill()
+        worker.process.join()
+        assert "council met" in engine.parse(URL, HTML, CONFIGS[1], timeout=30).text
+        assert engine._idle.queue[0] is not worker
+    finally:
+        engine.shutdown()
+
+
+def test_fetch_moves_on_from_an_over_budget_parse(engine):
+    class StubDownloader(strategy.Downloader):
+        def __call__(self, url, context=None):
+            return HTML * 2000
+
+    tight = Config(stage_budgets={"metadata_parse": 0.005, "body_parse": 0.005})
+    with patch("browser.parse_engine", engine), patch(
+        "browser.get_downloader", lambda c: StubDownloader()
+    ):
+        t0 = time()
+        article = browser.fetch(URL, [tight, CONFIGS[1]], pause=0)
+    assert time() - t0 < 10
+    assert "council met" in article.text
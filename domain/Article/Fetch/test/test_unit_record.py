@@ -0,0 +1,103 @@
+from dataclasses import FrozenInstanceError
+import pickle
+
+import pytest
+
+from shared.command.core import SaveFetchedArticle
+from shared.event.core import SavedFetchedArticle, SavedNewRequestedArticle
+from shared.event import fetch as fetch_event
+from shared.model.article import ArticleIssue, ArticleIssueShort, FetchedArticle
+from shared.util.record import json_field, record
+
+
+@record
+class Point:
+    x: int
+    y: int = 0
+
+
+@record
+class Segment:
+    start: Point = json_field(decode=Point.from_json)
+    end: Point = json_field(decode=Point.from_json)
+
+
+def test_generated_json():
+    segment = Segment(Point(1, 2), Point(3))
+    data = segment.to_json()
+    assert data == {
+        "$type": "Segment",
+        "start": {"$type": "Point", "x": 1, "y": 2},
+        "end": {"$type": "Point", "x": 3, "y": 0},
+    }
+    assert Segment.from_json(data) == segment
+    assert Point.from_json({"x": 1}) == Point(1)
+    with pytest.raises(KeyError):
+        Point.from_json({"y": 1})
+
+
+@record
+class Range:
+    low: int
+    high: int
+
+    def __post_init__(self):
+        if self.low > self.high:
+            raise ValueError("low > high")
+
+
+def test_from_json_runs_post_init():
+    assert Range.from_json({"low": 1, "high": 2}) == Range(1, 2)
+    with pytest.raises(ValueError):
+        Range.from_json({"low": 2, "high": 1})
+    assert Point.from_json({"x": 1, "y": 2}).__slots__ == ("x", "y")
+
+
+def test_slotted_and_frozen():
+    point = Point(1, 2)
+    assert not hasattr(point, "__dict__")
+    with pytest.raises(FrozenInstanceError):
+        point.x = 2
+
+    event = SavedNewRequestedArticle(id="1", url="https://a.com/1")
+    assert not hasattr(event, "__dict__")
+    assert event.to_json() == {
+        "$type": "SavedNewRequestedArticle",
+        "id": "1",
+        "url": "https://a.com/1",
+    }
+
+
+def test_pickle_frozen():
+    """ Note: records cross process boundaries (see parsing) """
+    for value in [Segment(Point(1, 2), Point(3)), ArticleIssueShort(10)]:
+        assert pickle.loads(pickle.dumps(value)) == value
+
+
+def test_subclass_fields():
+    data = SavedFetchedArticle(id="1", url="u", duplicate_of="2").to_json()
+    assert data["$type"] == "SavedFetchedArticle"
+    assert SavedFetchedArticle.from_json(data).duplicate_of == "2"
+    assert SavedFetchedArticle.from_json({"id": "1", "url": "u"}).duplicate_of is None
+
+
+def test_issue_to_json_does_not_mutate():
+    issue = ArticleIssueShort(size=10)
+    data = issue.to_json()
+    assert data["$type"] == "ArticleIssueShort"
+    assert data["message"] == str(issue)
+    assert data["size"] == 10
+    assert issue.to_json() == data
+    assert ArticleIssue.from_json(data) == issue
+
+
+def test_nested_article():
+    article = FetchedArticle(
+        title="Title", authors=[], encoding="utf8", text="Text " * 100, html="<p/>"
+    )
+    command = SaveFetchedArticle(id="1", url="u", article=article)
+    assert command.to_json()["article"]["text"] == article.text
+    assert SaveFetchedArticle.from_json(command.to_json()) == command
+
+    event = fetch_event.SucceededFetchingArticle(id="1", url="u", article=article)
+    assert fetch_event.from_json(event.to_json()) == event
@@ -0,0 +1,84 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import sleep, time
+
+import pytest
+
+from shared.util.singleflight import SingleFlight
+
+
+class BlockingCall:
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.started = Event()
+        self.release = Event()
+        self.calls = 0
+
+    def __call__(self):
+        self.calls = self.calls + 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def wait_until(condition, timeout=5):
+    """ Note: fails the test if condition is not met within timeout seconds """
+    deadline = time() + timeout
+    while not condition():
+        assert time() < deadline, "Timed out waiting"
+        sleep(0.001)
+
+
+def test_concurrent_threads_share_one_call():
+    coalesced_keys = []
+    flight = SingleFlight(on_coalesced=coalesced_keys.append)
+    call = BlockingCall(result="article")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        first = executor.submit(flight.do, "key", call)
+        call.started.wait(5)
+        others = [executor.submit(flight.do, "key", call) for _ in range(3)]
+        wait_until(lambda: flight.coalesced >= 3)
+        call.release.set()
+        results = [first.result()] + [f.result() for f in others]
+
+    assert results == ["article"] * 4
+    assert call.calls == 1
+    assert flight.coalesced == 3
+    assert coalesced_keys == ["key"] * 3
+
+
+def test_errors_are_shared_and_key_is_forgotten():
+    flight = SingleFlight()
+    call = BlockingCall(error=ValueError("failed"))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first = executor.submit(flight.do, "key", call)
+        call.started.wait(5)
+        second = executor.submit(flight.do, "key", call)
+        wait_until(lambda: flight.coalesced >= 1)
+        call.release.set()
+        for future in (first, second):
+            with pytest.raises(ValueError):
+                future.result()
+
+    assert flight.do("key", lambda: "again") == "again"
+
+
+def test_async_callers_share_one_call():
+    flight = SingleFlight()
+    call = BlockingCall(result="article")
+
+    async def _run():
+        tasks = [asyncio.ensure_future(flight.do_async("key", call)) for _ in range(3)]
+        await asyncio.sleep(0)
+        call.release.set()
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(_run()) == ["article"] * 3
+    assert call.calls == 1
+    assert flight.coalesced == 2
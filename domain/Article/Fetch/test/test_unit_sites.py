@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+from config import Config, BodyParser
+import breaker
+import browser
+import sites
+
+SITES_YAML = """
+example.com:
+  - body_parser: LXML
+    body_parser_options:
+      css_selectors: ["article"]
+  - {}
+news.example.com:
+  - body_parser: BeautifulSoup
+    body_parser_options:
+      css_selectors: [".story"]
+bbc.co.uk:
+  - downloader_options:
+      as_googlebot: true
+"""
+
+
+@pytest.fixture
+def sites_file(tmp_path):
+    fname = tmp_path / "sites.yaml"
+    fname.write_text(SITES_YAML)
+    return str(fname)
+
+
+def test_longest_suffix_match(sites_file):
+    index = sites.SiteConfigs(sites_file)
+
+    configs = index.configs_for_host("www.example.com")
+    assert [c.body_parser for c in configs] == [BodyParser.LXML, BodyParser.Newspaper]
+    assert index.configs_for_host("example.com") is configs
+
+    configs = index.configs_for_host("NEWS.Example.com:443")
+    assert [c.body_parser for c in configs] == [BodyParser.BeautifulSoup]
+
+    configs = index.configs_for_host("www.bbc.co.uk")
+    assert configs[0].downloader_options == {"as_googlebot": True}
+
+    assert index.configs_for_host("co.uk") == [Config()]
+    assert index.configs_for_host("example.org") == [Config()]
+
+
+def test_site_key_is_configured_or_registrable_domain(sites_file):
+    index = sites.SiteConfigs(sites_file)
+    assert index.site_key("NEWS.Example.com:443") == "news.example.com"
+    assert index.site_key("www.example.com") == "example.com"
+    assert index.site_key("www.bbc.co.uk") == "bbc.co.uk"
+    assert index.site_key("www.guardian.co.uk") == "guardian.co.uk"
+    assert index.site_key("cooking.nytimes.com") == "nytimes.com"
+    assert index.site_key("localhost:8080") == "localhost"
+    assert index.site_key("127.0.0.1") == "127.0.0.1"
+
+
+def test_reload_on_change_and_keep_previous_on_error(sites_file):
+    index = sites.SiteConfigs(sites_file, check_interval=0)
+    assert index.configs_for_host("other.com") == [Config()]
+
+    with open(sites_file, "w") as f:
+        f.write("other.com:\n  - body_parser: Newspaper\n")
+    os.utime(sites_file, (1, 1))
+    assert index.configs_for_host("other.com") == [Config()]
+    assert index.configs_for_host("example.com") == [Config()]
+
+    with open(sites_file, "w") as f:
+        f.write("other.com:\n  - body_parser: NotAParser\n")
+    os.utime(sites_file, (2, 2))
+    assert index.configs_for_host("other.com") == [Config()]
+
+
+def test_invalid_configs_are_rejected():
+    with pytest.raises(ValueError):
+        sites.compile_site_configs({"a.com": [{"body_parser": "Unknown"}]})
+    with pytest.raises(ValueError):
+        sites.compile_site_configs({"a.com": [{"body_parsr": "LXML"}]})
+    with pytest.raises(ValueError):
+        sites.compile_site_configs({"a.com": []})
+
+
+def test_shipped_site_configs_load():
+    configs = browser.configs_for_url("https://www.nytimes.com/2019/08/20/us/a.html")
+    assert configs[0].body_parser == BodyParser.BeautifulSoup
+
+
+def test_sites_under_a_public_suffix_have_separate_circuits(monkeypatch):
+    def fail(url, *args):
+        raise browser.FetchError(url)
+
+    monkeypatch.setattr(browser, "fetch", fail)
+    monkeypatch.setattr(browser, "circuit_breaker", breaker.CircuitBreaker(threshold=1))
+    with pytest.raises(browser.FetchError):
+        browser.fetch_guarded("https://www.failing.co.uk/a", [Config()])
+    with pytest.raises(breaker.CircuitOpen):
+        browser.fetch_guarded("https://news.failing.co.uk/b", [Config()])
+    with pytest.raises(browser.FetchError):
+        browser.fetch_guarded("https://www.other.co.uk/c", [Config()])
@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+
+from shared.util import startup
+
+"""
+Startup profiling (see shared.util.startup): off unless APP_PROFILE_STARTUP=1,
+then import times of main's modules, and cold and warm invocations, logged.
+"""
+
+PROFILE_MAIN = """
+import json, time
+import main
+from shared.util import startup
+print(json.dumps(startup.profile.cold_start_record(time.time())))
+"""
+
+
+class ListLogger:
+    def __init__(self):
+        self.records = []
+
+    def info(self, msg, data):
+        self.records.append(data)
+
+
+def handler(x):
+    return x + 1
+
+
+def test_profiled_returns_handler_unless_enabled(monkeypatch):
+    monkeypatch.delenv(startup.ENV_VAR, raising=False)
+    assert startup.profiled(handler, ListLogger()) is handler
+
+
+def test_profiled_logs_cold_start_once_then_warm_invocations(monkeypatch):
+    monkeypatch.setenv(startup.ENV_VAR, "1")
+    monkeypatch.setattr(startup, "profile", startup.StartupProfile())
+    with startup.phase("init_logging"):
+        pass
+    logger = ListLogger()
+    profiled = startup.profiled(handler, logger)
+    assert [profiled(1), profiled(2)] == [2, 3]
+
+    cold_start, first, second = logger.records
+    assert cold_start["log_type"] == "ColdStart"
+    assert cold_start["begin_to_first_call"] is None  # begin() was not called
+    assert list(cold_start["phases"]) == ["init_logging"]
+    assert (first["log_type"], first["cold"]) == ("Invocation", True)
+    assert (second["cold"], second["invocations"]) == (False, 2)
+
+
+def test_import_times_of_main():
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(p or "." for p in sys.path),
+        **{startup.ENV_VAR: "1"}
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", PROFILE_MAIN],
+        env=env,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    record = json.loads(out.strip().splitlines()[-1])
+    imports = {i["module"]: i for i in record["imports"]}
+    assert "browser" in imports
+    assert 0 <= imports["browser"]["self_seconds"] <= imports["browser"]["seconds"]
+    assert record["begin_to_first_call"] > 0
+    assert "init_logging" in record["phases"]
+    if record["process_start_to_begin"] is not None:  # Linux only
+        assert record["process_start_to_begin"] >= 0
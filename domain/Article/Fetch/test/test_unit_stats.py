@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+from time import time
+
+from config import Config, BodyParser
+import browser
+import stats
+
+FAST = Config(body_parser=BodyParser.LXML, body_parser_options={"css_selectors": ["a"]})
+SLOW = Config()
+BROKEN = Config(body_parser=BodyParser.BeautifulSoup)
+
+
+def record_n(store, domain, config, n, success=True, seconds=1.0, issues=False):
+    for _ in range(n):
+        store.record(domain, config, success=success, seconds=seconds, issues=issues)
+
+
+def test_order_prefers_fastest_working_config():
+    store = stats.StrategyStats(exploration_rate=0)
+    record_n(store, "a.com", BROKEN, 5, success=False, seconds=0.1)
+    record_n(store, "a.com", SLOW, 5, seconds=3.0)
+    record_n(store, "a.com", FAST, 5, seconds=0.5)
+
+    assert store.order("a.com", [BROKEN, SLOW, FAST]) == [FAST, SLOW, BROKEN]
+    assert store.order("b.com", [BROKEN, SLOW, FAST]) == [BROKEN, SLOW, FAST]
+
+
+def test_order_penalizes_issues_and_keeps_untried_configs_before_failing():
+    store = stats.StrategyStats(exploration_rate=0)
+    record_n(store, "a.com", FAST, 5, seconds=0.5, issues=True)
+    record_n(store, "a.com", SLOW, 5, seconds=3.0)
+    record_n(store, "a.com", BROKEN, 5, success=False)
+    untried = Config(body_parser_options={"x": 1})
+
+    assert store.order("a.com", [BROKEN, untried, FAST, SLOW]) == [
+        SLOW,
+        FAST,
+        untried,
+        BROKEN,
+    ]
+
+
+def test_exploration_moves_a_config_to_the_front():
+    store = stats.StrategyStats(exploration_rate=1)
+    record_n(store, "a.com", FAST, 5)
+    ordered = store.order("a.com", [SLOW, FAST, BROKEN])
+    assert sorted(c.fingerprint() for c in ordered) == sorted(
+        c.fingerprint() for c in [SLOW, FAST, BROKEN]
+    )
+
+
+def test_report_and_persistence(tmp_path):
+    backend = stats.FileStatsBackend(str(tmp_path / "stats.json"))
+    store = stats.StrategyStats(backend=backend, exploration_rate=0)
+    for seconds in range(1, 101):
+        store.record("a.com", FAST, success=seconds % 4 != 0, seconds=float(seconds))
+    store.flush()
+
+    report = stats.StrategyStats(backend=backend).report("a.com")
+    r = report["a.com"][FAST.fingerprint()]
+    assert r["config"] == FAST.to_json()
+    assert r["attempts"] == 100
+    assert r["success_rate"] == 0.75
+    assert r["p50"] == 57.0  # window of the last 64 successful latencies: 15..99
+    assert r["p99"] == 99.0
+    assert Config.from_json(r["config"]) == FAST
+
+
+def test_failed_attempts_do_not_lower_latency():
+    store = stats.StrategyStats(exploration_rate=0)
+    record_n(store, "a.com", FAST, 5, success=False, seconds=0.1)
+    record_n(store, "a.com", FAST, 5, seconds=2.0)
+    r = store.report("a.com")["a.com"][FAST.fingerprint()]
+    assert r["success_rate"] == 0.5
+    assert r["p50"] == 2.0
+
+
+def test_stats_are_flushed_after_the_call_not_while_recording():
+    backend = stats.MemoryStatsBackend()
+    store = stats.StrategyStats(backend=backend, flush_interval=0)
+
+    @stats.flush_stats(store)
+    def invocation():
+        store.record("a.com", FAST, success=True, seconds=1.0)
+        assert backend.data == {}
+
+    invocation()
+    assert list(backend.data) == ["a.com"]
+
+
+def test_concurrent_saves_do_not_share_a_temporary_file(tmp_path):
+    backend = stats.FileStatsBackend(str(tmp_path / "stats.json"))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda n: backend.save({"n": n}), range(64)))
+    assert backend.load()["n"] in range(64)
+    assert os.listdir(str(tmp_path)) == ["stats.json"]
+
+
+def test_attempts_are_recorded_per_site_under_a_public_suffix(monkeypatch):
+    store = stats.StrategyStats(exploration_rate=0)
+    monkeypatch.setattr(browser, "strategy_stats", store)
+    browser.record_attempt("https://www.failing.co.uk/a", FAST, time())
+    report = store.report()
+    assert list(report) == ["failing.co.uk"]
+    assert report["failing.co.uk"][FAST.fingerprint()]["success_rate"] == 0.0
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from shared.util.env import load_yaml
+from config import BodyParser, Config
+from sites import compile_site_configs
+import strategy.archive
+from test.util import tournament
+
+PARAGRAPHS = """
+<p>The council met on Tuesday to discuss the new budget for the city parks,
+which has been delayed for several months because of disagreements about how
+the money should be spent.</p>
+<p>Residents who spoke at the meeting asked for more trees and for the
+playgrounds to be repaired before the summer, when most families visit.</p>
+"""
+
+PAGES = {
+    "https://www.example.com/2019/08/28/parks.html": (
+        "<html><head><title>Parks</title></head><body>"
+        "<nav>Home | News | Sports</nav><div class='story-body'>%s</div>"
+        "</body></html>" % (PARAGRAPHS,)
+    ),
+    "https://other.org/2019/08/28/parks.html": (
+        "<html><head><title>Parks</title></head><body>"
+        "<article>%s</article></body></html>" % (PARAGRAPHS,)
+    ),
+}
+
+
+@pytest.fixture
+def archive_file(tmp_path):
+    fname = str(tmp_path / "corpus.archive")
+    with strategy.archive.ArchiveWriter(fname) as writer:
+        for (url, html) in PAGES.items():
+            writer.add(url, html, "text/html", "utf-8")
+    return fname
+
+
+def test_candidates():
+    configs = tournament.candidates(["article", "main"])
+    newspaper = [c for c in configs if c.body_parser == BodyParser.Newspaper]
+    assert newspaper == [Config()]
+    soup = [c for c in configs if c.body_parser == BodyParser.BeautifulSoup]
+    assert [c.body_parser_options["css_selectors"] for c in soup] == [
+        ["article"],
+        ["main"],
+    ]
+
+
+def test_overlap():
+    assert tournament.overlap("a b c", "a b c") == 1.0
+    assert tournament.overlap("x y", "a b c") == 0.0
+    assert tournament.overlap("a b", "a b c d") == pytest.approx(2 / 3)
+    assert tournament.overlap("", "a b c") == 0.0
+
+
+def test_tournament(archive_file, tmp_path):
+    references = {url: PARAGRAPHS for url in PAGES.keys()}
+    ranked = tournament.run(
+        archive_file, references, selectors=["article", ".story-body"]
+    )
+    assert sorted(ranked.keys()) == ["example.com", "other.org"]
+    for scores in ranked.values():
+        qualities = [s["quality"] for s in scores]
+        assert qualities == sorted(qualities, reverse=True)
+
+    best = ranked["example.com"][0]["config"]
+    assert best.body_parser_options.get("css_selectors", None) != ["article"]
+
+    fname = str(tmp_path / "sites.yaml")
+    tournament.save_site_configs(ranked, fname, top=2)
+    trie = compile_site_configs(load_yaml(fname))
+    configs = trie.lookup("www.example.com")
+    assert len(configs) <= 2
+    assert configs[0] == ranked["example.com"][0]["config"]
+
+
+def test_pages_without_reference_are_not_scored(archive_file, tmp_path):
+    fname = tmp_path / "references.yaml"
+    url = "https://other.org/2019/08/28/parks.html"
+    fname.write_text(json.dumps({url: PARAGRAPHS}))
+    references = tournament.load_references(str(fname))
+    assert references == {url: PARAGRAPHS}
+    ranked = tournament.run(archive_file, references, selectors=["article"])
+    assert list(ranked.keys()) == ["other.org"]
@@ -0,0 +1,139 @@
+from hypothesis import given
+import hypothesis.strategies as hyp
+import pytest
+
+from shared.util.url import (
+    AMP_RULE,
+    Canonicalizer,
+    param_rule,
+    standardized_url,
+    url_key,
+)
+from test.util.fetch import url_examples
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        ("https://Example.COM/story", "https://example.com/story"),
+        ("HTTPS://www.example.com:443/story/", "https://example.com/story"),
+        ("http://example.com:80/story#comments", "http://example.com/story"),
+        ("http://example.com:8080/story", "http://example.com:8080/story"),
+        (
+            "https://example.com/story?utm_source=tw&utm_campaign=shareaholic",
+            "https://example.com/story",
+        ),
+        (
+            "https://example.com/story?b=2&fbclid=x&a=1",
+            "https://example.com/story?a=1&b=2",
+        ),
+        ("https://example.com/story/amp", "https://example.com/story/amp"),
+        ("https://example.com/story?ref=home", "https://example.com/story?ref=home"),
+        (
+            "https://example.com/story?outputType=amp",
+            "https://example.com/story?outputType=amp",
+        ),
+        ("https://example.com/", "https://example.com/"),
+        ("https://example.com/campus/story", "https://example.com/campus/story"),
+    ],
+)
+def test_canonical(url, expected):
+    assert Canonicalizer().canonical(url) == expected
+
+
+def test_canonical_options():
+    c = Canonicalizer(strip_www=False, strip_trailing_slash=False)
+    url = "https://www.example.com/story/amp/"
+    assert c.canonical(url) == url
+    c = Canonicalizer(strip_amp=True)
+    assert c.canonical(url) == "https://example.com/story"
+
+
+def test_domain_rules():
+    c = Canonicalizer(
+        rules={"example.com": [(r"^(https://[^/]+)/m/", r"\1/")]},
+    )
+    assert c.canonical("https://news.example.com/m/story") == (
+        "https://news.example.com/story"
+    )
+    assert c.canonical("https://other.com/m/story") == "https://other.com/m/story"
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        ("https://example.com/story/amp", "https://example.com/story"),
+        ("https://example.com/amp/story?a=1", "https://example.com/story?a=1"),
+        ("https://example.com/story.amp.html", "https://example.com/story.html"),
+        ("https://example.com/story?outputType=amp", "https://example.com/story"),
+        ("https://example.com/story?ref=home&a=1", "https://example.com/story?a=1"),
+        ("https://example.com/s?a=1&ref=x&b=2", "https://example.com/s?a=1&b=2"),
+        ("https://example.com/s?a=1&ref=x", "https://example.com/s?a=1"),
+        ("https://example.com/s?pref=x", "https://example.com/s?pref=x"),
+        ("https://other.com/story/amp?ref=x", "https://other.com/story/amp?ref=x"),
+    ],
+)
+def test_amp_and_param_rules_apply_to_their_domain_only(url, expected):
+    c = Canonicalizer(
+        rules={"example.com": [AMP_RULE, param_rule("ref"), param_rule("outputType")]}
+    )
+    assert c.canonical(url) == expected
+
+
+def test_learned_aliases():
+    c = Canonicalizer(max_aliases=2)
+    c.learn("https://example.com/s/123", "https://example.com/2019/08/story/")
+    assert c.canonical("https://example.com/s/123?utm_source=x") == (
+        "https://example.com/2019/08/story"
+    )
+
+    c.learn("https://example.com/a", "not a url")
+    assert c.canonical("https://example.com/a") == "https://example.com/a"
+
+    c.learn("https://example.com/b", "https://example.com/bb")
+    c.learn("https://example.com/c", "https://example.com/cc")
+    assert c.canonical("https://example.com/s/123") == "https://example.com/s/123"
+    assert c.canonical("https://example.com/c") == "https://example.com/cc"
+
+
+@pytest.mark.parametrize(
+    "canonical_url,verified",
+    [
+        ("https://example.com/", False),
+        ("https://example.com/", True),
+        ("https://example.com/news/", False),
+        ("https://other.com/2019/08/story", False),
+    ],
+)
+def test_implausible_aliases_are_not_learned(canonical_url, verified):
+    c = Canonicalizer()
+    url = "https://example.com/news/2019/08/story"
+    c.learn(url, canonical_url, verified=verified)
+    assert c.canonical(url) == url
+
+
+def test_verified_aliases_may_be_on_another_host():
+    c = Canonicalizer()
+    c.learn("https://t.co/abc", "https://example.com/2019/08/story", verified=True)
+    assert c.canonical("https://t.co/abc") == "https://example.com/2019/08/story"
+
+
+def test_standardized_url_is_lossless():
+    url = "https://www.Example.com/story/amp/?ref=home&share=1"
+    assert (
+        standardized_url(url) == "https://www.example.com/story/amp/?ref=home&share=1"
+    )
+
+
+@given(url=url_examples())
+def test_standardized_url_idempotent(url):
+    assert standardized_url(standardized_url(url)) == standardized_url(url)
+
+
+@given(
+    url=url_examples(),
+    params=hyp.lists(hyp.sampled_from(["utm_source=a", "fbclid=b", "gclid=c"])),
+)
+def test_url_key_ignores_tracking(url, params):
+    tracked = url + ("?" + "&".join(params) if len(params) > 0 else "")
+    assert url_key(tracked) == url_key(url)
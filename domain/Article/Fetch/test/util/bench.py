@@ -0,0 +1,257 @@
+import json
+from time import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from shared.adapter.logging import log_elapsed
+import browser
+from config import Config, Downloader, MetadataParser, BodyParser
+from normalize import markdown_from_html, html_from_markdown
+import strategy
+import strategy.archive
+from stats import percentile
+
+"""
+Stage-level benchmark of the fetch pipeline over a corpus of recorded pages
+(see strategy.archive). Each page is downloaded (replayed from the archive),
+then parsed with every metadata parser and every body parser, and each body is
+converted to markdown and back to html, as in browser.fetch. Strategies are
+enumerated from the config enums, so new strategies are benchmarked without
+changes here; body parsers that need selectors are given `selectors`.
+
+Stages are timed with log_elapsed, and optionally run once more under
+tracemalloc to measure their peak memory (separately, so tracing does not
+skew the timings).
+
+Reports are dicts of stage name to metrics, and can be saved as JSON
+baselines to compare later runs against (see regressions).
+"""
+
+DEFAULT_SELECTORS = ["article", "main", "body"]
+REGRESSION_THRESHOLD = 0.2
+LATENCY_METRICS = ("p50", "p95")
+MEMORY_METRICS = ("peak_memory",)
+LATENCY_NOISE = 0.001
+MEMORY_NOISE = 64 * 1024
+
+
+class ElapsedRecorder:
+    """ Stands in for the logger in log_elapsed, to keep the elapsed time """
+
+    def __init__(self):
+        self.seconds = None
+        self.failure = None
+
+    def info(self, msg, context):
+        self.seconds = context["seconds"]
+
+    def error(self, msg, context):
+        self.seconds = context["seconds"]
+        self.failure = context["error"]
+
+
+class Benchmark:
+    def __init__(
+        self,
+        archive_file: str,
+        selectors: List[str] = DEFAULT_SELECTORS,
+        repeat: int = 3,
+        measure_memory: bool = True,
+    ):
+        self.archive_file = archive_file
+        self.selectors = selectors
+        self.repeat = repeat
+        self.measure_memory = measure_memory
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.peak_memory: Dict[str, int] = {}
+        self._tracing = False
+
+    def run(self) -> dict:
+        for url in strategy.archive.reader(self.archive_file).urls():
+            for _ in range(self.repeat):
+                self.run_page(url)
+            if self.measure_memory:
+                self._tracing = True
+                try:
+                    self.run_page(url)
+                finally:
+                    self._tracing = False
+        return self.report()
+
+    def run_page(self, url: str):
+        context = strategy.FetchContext(url=url)
+        html = self.stage(
+            "download", browser.get_downloader(self.config()), url, context=context
+        )
+        if html is None:
+            return
+
+        article = None
+        for metadata_parser in MetadataParser:
+            parsed = self.stage(
+                "metadata_parse:%s" % (metadata_parser.name,),
+                browser.get_metadata_parser(self.config(metadata_parser)),
+                url,
+                html,
+                context=context,
+            )
+            article = parsed if article is None else article
+        if article is None:
+            return
+
+        for body_parser in BodyParser:
+            body = self.stage(
+                "body_parse:%s" % (body_parser.name,),
+                browser.get_body_parser(self.config(body_parser=body_parser)),
+                url,
+                html,
+                article,
+                context=context,
+            )
+            if body is None:
+                continue
+            text = self.stage(
+                "markdown_from_html:%s" % (body_parser.name,), markdown_from_html, body
+            )
+            if text is None:
+                continue
+            self.stage("markdown:%s" % (body_parser.name,), html_from_markdown, text)
+
+    def config(
+        self,
+        metadata_parser: MetadataParser = MetadataParser.Newspaper,
+        body_parser: BodyParser = BodyParser.Newspaper,
+    ) -> Config:
+        return Config(
+            downloader=Downloader.Replay,
+            downloader_options={"archive_file": self.archive_file},
+            metadata_parser=metadata_parser,
+            body_parser=body_parser,
+            body_parser_options={"css_selectors": self.selectors},
+        )
+
+    def stage(self, name: str, fn: Callable, *args, **kwargs):
+        """ Run fn, recording its latency (or peak memory); None on error """
+        result = None
+        recorder = ElapsedRecorder()
+        if self._tracing:
+            tracemalloc.start()
+        try:
+            with log_elapsed(name, recorder, context={"log_type": "BenchmarkStage"}):
+                result = fn(*args, **kwargs)
+            if self._tracing:
+                _, peak = tracemalloc.get_traced_memory()
+                self.peak_memory[name] = max(self.peak_memory.get(name, 0), peak)
+        finally:
+            if self._tracing:
+                tracemalloc.stop()
+
+        if self._tracing:
+            return result
+        if recorder.failure is not None:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return None
+        self.latencies.setdefault(name, []).append(recorder.seconds)
+        return result
+
+    def report(self) -> dict:
+        names = sorted(set(self.latencies.keys()) | set(self.errors.keys()))
+        return {name: self.stage_report(name) for name in names}
+
+    def stage_report(self, name: str) -> dict:
+        latencies = self.latencies.get(name, [])
+        total = sum(latencies)
+        return {
+            "runs": len(latencies),
+            "errors": self.errors.get(name, 0),
+            "throughput": None if total == 0 else len(latencies) / total,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "peak_memory": self.peak_memory.get(name, None),
+        }
+
+
+def save_baseline(report: dict, fname: str):
+    with open(fname, "w") as f:
+        json.dump({"created": time(), "stages": report}, f, indent=2, sort_keys=True)
+
+
+def load_baseline(fname: str) -> dict:
+    with open(fname, "r") as f:
+        return json.load(f)["stages"]
+
+
+def regressions(
+    report: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD
+) -> List[dict]:
+    """
+    Stage metrics that are worse than the baseline by more than threshold
+    (a fraction of the baseline value). Small absolute differences are
+    ignored as noise, as are stages or metrics missing from either side.
+    """
+    found = []
+    for (name, current) in report.items():
+        previous = baseline.get(name, None)
+        if previous is None:
+            continue
+        for (metrics, noise) in (
+            (LATENCY_METRICS, LATENCY_NOISE),
+            (MEMORY_METRICS, MEMORY_NOISE),
+        ):
+            for metric in metrics:
+                found.extend(
+                    _regression(
+                        name,
+                        metric,
+                        previous.get(metric, None),
+                        current.get(metric, None),
+                        threshold,
+                        noise,
+                    )
+                )
+    return found
+
+
+def _regression(
+    name: str,
+    metric: str,
+    previous: Optional[float],
+    current: Optional[float],
+    threshold: float,
+    noise: float,
+) -> List[dict]:
+    if previous is None or current is None:
+        return []
+    if current <= previous * (1 + threshold) + noise:
+        return []
+    return [{"stage": name, "metric": metric, "baseline": previous, "value": current}]
+
+
+def format_report(report: dict) -> str:
+    def _ms(secs):
+        return "-" if secs is None else "%.1f" % (secs * 1000,)
+
+    def _kb(size):
+        return "-" if size is None else "%d" % (size / 1024,)
+
+    lines = [
+        "%-36s %6s %6s %9s %9s %9s %9s %9s"
+        % ("stage", "runs", "errors", "per sec", "p50 ms", "p95 ms", "p99 ms", "peak kB")
+    ]
+    for (name, r) in report.items():
+        lines.append(
+            "%-36s %6d %6d %9s %9s %9s %9s %9s"
+            % (
+                name[:36],
+                r["runs"],
+                r["errors"],
+                "-" if r["throughput"] is None else "%.1f" % (r["throughput"],),
+                _ms(r["p50"]),
+                _ms(r["p95"]),
+                _ms(r["p99"]),
+                _kb(r["peak_memory"]),
+            )
+        )
+    return "\n".join(lines)
@@ -0,0 +1,191 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from itertools import product
+import re
+from time import time
+from typing import Dict, List, Optional
+
+from ruamel.yaml import YAML
+
+from shared.model.article import ArticleIssues
+from shared.util.env import load_yaml
+import browser
+import parsing
+from config import Config, Downloader, MetadataParser, BodyParser
+import strategy.archive
+from stats import percentile
+
+"""
+Config tournament: for each site in a corpus of recorded pages (see
+strategy.archive), by site key as the site configs resolve hosts (see
+sites.SiteConfigs.site_key), fetch its pages with every combination of
+metadata parser, body parser and selector, and rank the combinations by
+extraction quality, then latency. The result maps each site to its best
+configs, in the form of sites.yaml, so it can be merged into the site configs
+directly.
+
+Quality per page is the overlap of the extracted text with a reference text
+for the page (F1 over words), halved for each validation issue, and zero if
+the fetch failed. References must be independent of the candidates (archived
+or hand-labelled texts, see load_references): a reference extracted by one of
+the configs would rank that config first. Pages without a reference are not
+scored, nor are sites with none. Configs are ranked by mean quality (to two
+places, so that near-ties go to the faster config), then median latency.
+
+Pages are replayed from the archive, so the downloader is not part of the
+tournament; ranked configs use the default downloader. Body parsers that
+cannot be built without options are tried with each of `selectors`.
+Candidates are scored in parallel worker processes, each parsing inline.
+"""
+
+DEFAULT_SELECTORS = [
+    "article",
+    "main",
+    "[itemprop=articleBody]",
+    ".article-body",
+    ".story-body",
+    ".entry-content",
+]
+ISSUE_PENALTY = 0.5
+TOP = 3
+
+WORD = re.compile(r"\w+")
+
+
+def candidates(selectors: List[str] = DEFAULT_SELECTORS) -> List[Config]:
+    configs = []
+    for (metadata_parser, body_parser) in product(MetadataParser, BodyParser):
+        config = Config(metadata_parser=metadata_parser, body_parser=body_parser)
+        try:
+            browser.get_body_parser(config)
+            configs.append(config)
+        except ValueError:
+            configs.extend(
+                replace(config, body_parser_options={"css_selectors": [selector]})
+                for selector in selectors
+            )
+    return configs
+
+
+def replayed(config: Config, archive_file: str) -> Config:
+    return replace(
+        config,
+        downloader=Downloader.Replay,
+        downloader_options={"archive_file": archive_file},
+    )
+
+
+def domains(archive_file: str, references: Dict[str, str]) -> Dict[str, List[str]]:
+    """ The urls with a reference, by site key """
+    by_domain = {}
+    for url in strategy.archive.reader(archive_file).urls():
+        if url in references:
+            _, domain = browser.url_site_and_domain(url)
+            by_domain.setdefault(domain, []).append(url)
+    return by_domain
+
+
+def parse_inline():
+    """ Note: scoring processes parse inline, as they run in parallel already """
+    browser.parse_engine = parsing.ParseEngine(inline=True)
+
+
+def fetch_text(url: str, config: Config) -> dict:
+    """ Fetch url with config alone: its text, latency, and issue count """
+    t0 = time()
+    try:
+        article = browser.fetch(url, [config], pause=0)
+    except Exception:
+        return {"text": None, "seconds": time() - t0, "issues": 0}
+    seconds = time() - t0
+    try:
+        article.validate()
+        issues = 0
+    except ArticleIssues as e:
+        issues = len(e.issues)
+    return {"text": article.text, "seconds": seconds, "issues": issues}
+
+
+def overlap(text: str, reference: str) -> float:
+    """ F1 of the words in text against those in reference """
+    words = Counter(w.lower() for w in WORD.findall(text))
+    expected = Counter(w.lower() for w in WORD.findall(reference))
+    common = sum((words & expected).values())
+    if common == 0:
+        return 0.0
+    precision = common / sum(words.values())
+    recall = common / sum(expected.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def score(
+    archive_file: str, urls: List[str], config: Config, references: Dict[str, str]
+) -> dict:
+    qualities = []
+    latencies = []
+    for url in urls:
+        result = fetch_text(url, replayed(config, archive_file))
+        latencies.append(result["seconds"])
+        if result["text"] is None:
+            qualities.append(0.0)
+            continue
+        qualities.append(
+            overlap(result["text"], references[url]) * ISSUE_PENALTY ** result["issues"]
+        )
+    return {
+        "config": config,
+        "quality": sum(qualities) / len(qualities),
+        "p50": percentile(latencies, 50),
+    }
+
+
+def load_references(fname: str) -> Dict[str, str]:
+    """ Reference texts by url, from a yaml (or json) file mapping url to text """
+    data = load_yaml(fname)
+    return {} if data is None else {str(k): str(v) for (k, v) in data.items()}
+
+
+def run(
+    archive_file: str,
+    references: Dict[str, str],
+    selectors: List[str] = DEFAULT_SELECTORS,
+    max_workers: Optional[int] = None,
+) -> Dict[str, List[dict]]:
+    """ Returns scores by domain, best first """
+    by_domain = domains(archive_file, references)
+    configs = candidates(selectors)
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=parse_inline
+    ) as executor:
+        futures = {
+            domain: [
+                executor.submit(score, archive_file, urls, config, references)
+                for config in configs
+            ]
+            for (domain, urls) in by_domain.items()
+        }
+        return {
+            domain: sorted(
+                (f.result() for f in fs),
+                key=lambda s: (-round(s["quality"], 2), s["p50"]),
+            )
+            for (domain, fs) in futures.items()
+        }
+
+
+def site_configs(ranked: Dict[str, List[dict]], top: int = TOP) -> dict:
+    """ The best `top` configs by domain, as in sites.yaml """
+    return {
+        domain: [s["config"].to_json() for s in scores[:top] if s["quality"] > 0]
+        for (domain, scores) in ranked.items()
+        if len(scores) > 0 and scores[0]["quality"] > 0
+    }
+
+
+def save_site_configs(ranked: Dict[str, List[dict]], fname: str, top: int = TOP):
+    yaml = YAML(typ="safe")
+    yaml.default_flow_style = False
+    with open(fname, "w") as f:
+        yaml.dump(site_configs(ranked, top), f)
@@ -1,17 +1,21 @@
+import atexit
+from collections import deque
 from contextlib import contextmanager
 from datetime import datetime
 from functools import wraps
+from itertools import count
 import json
 import logging
+from string import Formatter
+from logging.handlers import QueueHandler, QueueListener
+from queue import Empty, Queue
 import sys
-from time import time, gmtime
+from threading import Thread, Timer
+from time import gmtime, strftime, time
 import traceback
 from uuid import uuid4
 from warnings import warn
 
-import google.cloud.logging
-from google.cloud.logging.resource import Resource
-
 # import google.cloud.error_reporting
 
 SCOPES = [
@@ -21,8 +25,21 @@ SCOPES = [
 
 FORMATTER_ARGS = [None, None, "{"]
 
+DEFERRED_BUFFER_SIZE = 10000
+DEFERRED_CONNECT_TIMEOUT = 2.0
+
+LOG_QUEUE_SIZE = 10000
+LOG_BATCH_SIZE = 100
+LOG_FLUSH_TIMEOUT = 5.0
+REMOTE_LOG_NAME = "python"  # as the Stackdriver default handler
+TEMPLATE_CACHE_SIZE = 1024
+CONVERSIONS = {None: None, "s": str, "r": repr, "a": ascii}
+
 
 def client(credentials=None):
+    """ Note: google.cloud.logging is imported here, as it is slow to import """
+    import google.cloud.logging
+
     return google.cloud.logging.Client(credentials=credentials)
 
 
@@ -39,32 +56,352 @@ def init_logging(
 ):
     """
     Call this once at the top of your main program to log via Stackdriver. 
+    Note this connects before returning: see init_deferred_logging.
+    """
+    handler = remote_handler(client, resource_type, resource_labels, labels)
+    _init_queued_logging(handler, level)
+
+
+def init_local_logging(level=logging.INFO, labels=None):
+    """
+    Call this once at the top of your main program to log locally. 
+    """
+    _init_queued_logging(local_handler(labels), level)
+
+
+def init_deferred_logging(
+    connect, level=logging.INFO, labels=None, timeout=DEFERRED_CONNECT_TIMEOUT
+):
+    """
+    Call this once at the top of your main program to log via Stackdriver,
+    without waiting to connect. connect is called in the background to create
+    the remote handler (e.g. with remote_handler); until it returns, records
+    are buffered in memory, then flushed to it. If it fails, or does not
+    return within timeout seconds (or before exit), logging switches to local
+    logging instead, and the buffered records are flushed there.
     """
-    if isinstance(level, str):
-        level = getattr(logging, level)
+    handler = DeferredHandler()
+    _init_queued_logging(handler, level)
+
+    def _fall_back(error):
+        if handler.attach(local_handler(labels)):
+            get_logger(__name__).warning(
+                "Note: unable to connect to Stackdriver logging, logging locally. "
+                "(Error: {error})",
+                {"error": error},
+            )
+
+    def _connect():
+        try:
+            remote = connect()
+        except Exception as e:
+            _fall_back(str(e))
+            return
+        timer.cancel()
+        if not handler.attach(remote):
+            remote.close()  # too late, already logging locally
+
+    timer = Timer(timeout, _fall_back, ["Timed out after %s sec" % (timeout,)])
+    timer.daemon = True
+    timer.start()
+    Thread(target=_connect, name="logging-connect", daemon=True).start()
+    atexit.register(_fall_back, "Exited before connecting")
+    return handler
+
+
+def remote_handler(client, resource_type=None, resource_labels=None, labels={}):
+    from google.cloud.logging.resource import Resource
+
     resource = (
         Resource(type=resource_type, labels=resource_labels)
         if resource_type is not None
-        else None
+        else Resource(type="global", labels={})
     )
-    handler = client.get_default_handler(resource=resource, labels=labels)
+    handler = StackdriverBatchHandler(client, resource=resource, labels=labels)
     handler.setFormatter(LogFormatter(*FORMATTER_ARGS))
+    return handler
+
+
+def local_handler(labels=None):
+    handler = BatchStreamHandler()
+    handler.setFormatter(LocalLogFormatter(labels, *FORMATTER_ARGS))
+    return handler
+
+
+def _level(level):
+    return getattr(logging, level) if isinstance(level, str) else level
+
+
+# ------------------------------------------------------------------------------
+# Queued logging
+# ------------------------------------------------------------------------------
+
+""" 
+Note: loggers only put records on a queue (LogQueue); a listener thread
+(BatchQueueListener) takes them off in batches, and formats and ships them.
+So no formatting, serializing or I/O happens in the function itself, and
+remote writes are one API call per batch. Call flush_logging (or decorate
+with flush_logs) at the end of each invocation, as the function may be frozen
+once it returns.
+"""
+
+_queued = None  # (LogQueueHandler, BatchQueueListener)
+
+
+def _init_queued_logging(handler, level):
+    global _queued
+    stop_logging()
+    queue = LogQueue()
+    listener = BatchQueueListener(queue, handler)
+    listener.start()
+    queue_handler = LogQueueHandler(queue)
+    _queued = (queue_handler, listener)
     root_logger = logging.getLogger()
-    root_logger.addHandler(handler)
-    root_logger.setLevel(level)
+    root_logger.addHandler(queue_handler)
+    root_logger.setLevel(_level(level))
 
 
-def init_local_logging(level=logging.INFO, labels=None):
+def flush_logging(timeout=LOG_FLUSH_TIMEOUT) -> bool:
     """
-    Call this once at the top of your main program to log locally. 
+    Wait (up to timeout seconds) until all queued records are handled, then
+    flush the handlers. Returns whether all were handled in time.
     """
-    if isinstance(level, str):
-        level = getattr(logging, level)
-    handler = logging.StreamHandler()
-    handler.setFormatter(LocalLogFormatter(labels, *FORMATTER_ARGS))
-    root_logger = logging.getLogger()
-    root_logger.addHandler(handler)
-    root_logger.setLevel(level)
+    if _queued is None:
+        return True
+    _, listener = _queued
+    done = listener.queue.wait_done(timeout)
+    for handler in listener.handlers:
+        handler.flush()
+    return done
+
+
+def flush_logs(timeout=LOG_FLUSH_TIMEOUT):
+    """ Decorate a function entry point to flush logging after each call """
+
+    def _flush_logs(fn):
+        @wraps(fn)
+        def __flush_logs(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                flush_logging(timeout)
+
+        return __flush_logs
+
+    return _flush_logs
+
+
+def stop_logging():
+    """ Handle all queued records, then stop the listener thread """
+    global _queued
+    if _queued is None:
+        return
+    queue_handler, listener = _queued
+    _queued = None
+    logging.getLogger().removeHandler(queue_handler)
+    listener.stop()
+    for handler in listener.handlers:
+        try:
+            handler.flush()
+        except (OSError, ValueError):  # as in logging.shutdown: stream closed
+            pass
+
+
+atexit.register(stop_logging)
+
+
+def handle_batch(handler, records):
+    """ Hand records to a handler, in one call if it has an emit_batch """
+    if not hasattr(handler, "emit_batch"):
+        for record in records:
+            handler.handle(record)
+        return
+    records = [r for r in records if r.levelno >= handler.level and handler.filter(r)]
+    if len(records) == 0:
+        return
+    handler.acquire()
+    try:
+        handler.emit_batch(records)
+    finally:
+        handler.release()
+
+
+class LogQueue(Queue):
+    """
+    A bounded queue of log records that never blocks: when full, the oldest
+    record is dropped for each new one (and counted as dropped).
+    """
+
+    def __init__(self, maxsize=LOG_QUEUE_SIZE):
+        super(LogQueue, self).__init__(maxsize)
+        self.dropped = 0
+
+    def put(self, item, block=True, timeout=None):
+        with self.not_full:
+            if 0 < self.maxsize <= self._qsize():
+                self._get()  # its task is taken over by the new item
+                self.dropped = self.dropped + 1
+            else:
+                self.unfinished_tasks = self.unfinished_tasks + 1
+            self._put(item)
+            self.not_empty.notify()
+
+    def wait_done(self, timeout=None) -> bool:
+        """ Like join, but with a timeout; whether all items were done """
+        with self.all_tasks_done:
+            return self.all_tasks_done.wait_for(
+                lambda: self.unfinished_tasks == 0, timeout
+            )
+
+
+class LogQueueHandler(QueueHandler):
+    def prepare(self, record):
+        """ Note: records are queued as they are, to be formatted by the listener """
+        return record
+
+
+class BatchQueueListener(QueueListener):
+    """
+    Takes records off the queue up to batch_size at a time, and hands each
+    batch to the handlers (see handle_batch). Records dropped from the queue
+    since the last batch are reported by a warning record ahead of it.
+    """
+
+    def __init__(self, queue, *handlers, batch_size=LOG_BATCH_SIZE):
+        super(BatchQueueListener, self).__init__(
+            queue, *handlers, respect_handler_level=True
+        )
+        self.batch_size = batch_size
+        self.reported_dropped = 0
+
+    def _monitor(self):
+        while True:
+            records = [self.queue.get()]
+            while len(records) < self.batch_size:
+                try:
+                    records.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            stopped = self._sentinel in records
+            try:
+                self.handle_batch([r for r in records if r is not self._sentinel])
+            finally:
+                for _ in records:
+                    self.queue.task_done()
+            if stopped:
+                return
+
+    def handle_batch(self, records):
+        dropped = self.queue.dropped - self.reported_dropped
+        if dropped > 0:
+            self.reported_dropped = self.reported_dropped + dropped
+            records.insert(0, dropped_records_warning(dropped))
+        for handler in self.handlers:
+            handle_batch(handler, records)
+
+
+def dropped_records_warning(dropped):
+    return logging.makeLogRecord(
+        {
+            "name": __name__,
+            "levelno": logging.WARNING,
+            "levelname": "WARNING",
+            "msg": "Dropped {dropped} log records: the log queue was full",
+            "args": {"log_type": "DroppedLogRecords", "dropped": dropped},
+        }
+    )
+
+
+class BatchStreamHandler(logging.StreamHandler):
+    """ Writes (and flushes) a batch of records at a time """
+
+    def emit_batch(self, records):
+        try:
+            self.stream.write(
+                "".join(self.format(record) + self.terminator for record in records)
+            )
+            self.flush()
+        except Exception:
+            self.handleError(records[-1])
+
+
+class StackdriverBatchHandler(logging.Handler):
+    """
+    Writes records to Stackdriver, a batch at a time (one API call), as the
+    Stackdriver default handler would write them one at a time.
+    """
+
+    def __init__(self, client, name=REMOTE_LOG_NAME, resource=None, labels=None):
+        super(StackdriverBatchHandler, self).__init__()
+        self.logger = client.logger(name)
+        self.resource = resource
+        self.labels = labels
+
+    def emit(self, record):
+        self.emit_batch([record])
+
+    def emit_batch(self, records):
+        try:
+            batch = self.logger.batch()
+            for record in records:
+                batch.log_struct(
+                    {"message": self.format(record), "python_logger": record.name},
+                    severity=record.levelname,
+                    resource=self.resource,
+                    labels=self.labels,
+                    timestamp=datetime.utcfromtimestamp(record.created),
+                )
+            batch.commit()
+        except Exception:
+            self.handleError(records[-1])
+
+
+class DeferredHandler(logging.Handler):
+    """
+    Buffers records until a target handler is attached, then hands them (and
+    all later records) to it. Note only the first handler attached is used.
+    If more than capacity records are buffered, the oldest are dropped (and
+    counted).
+    """
+
+    def __init__(self, capacity=DEFERRED_BUFFER_SIZE):
+        super(DeferredHandler, self).__init__()
+        self.target = None
+        self.buffer = deque()
+        self.capacity = capacity
+        self.dropped = 0
+
+    def emit(self, record):
+        self.emit_batch([record])
+
+    def emit_batch(self, records):
+        """ Note: called with the handler lock held (see handle_batch) """
+        if self.target is not None:
+            handle_batch(self.target, records)
+            return
+        for record in records:
+            if len(self.buffer) >= self.capacity:
+                self.buffer.popleft()
+                self.dropped = self.dropped + 1
+            self.buffer.append(record)
+
+    def attach(self, target) -> bool:
+        """ Attach the target and flush the buffer to it, unless already attached """
+        self.acquire()
+        try:
+            if self.target is not None:
+                return False
+            self.target = target
+            records = list(self.buffer)
+            self.buffer.clear()
+            handle_batch(target, records)
+            return True
+        finally:
+            self.release()
+
+    def flush(self):
+        if self.target is not None:
+            self.target.flush()
 
 
 def get_logger(name=None):
@@ -86,6 +423,11 @@ class LogFormatter(logging.Formatter):
     https://medium.com/google-cloud/python-and-stackdriver-logging-2ade460c90e3
     """
 
+    def __init__(self, *args, **kwargs):
+        super(LogFormatter, self).__init__(*args, **kwargs)
+        self._templates = {}
+        self._asctime = (None, None)  # (second, formatted)
+
     def format(self, record):
         """ 
         Note: the log formatting string and "format style" is ignored here.
@@ -103,7 +445,17 @@ class LogFormatter(logging.Formatter):
         record.asctime = self.formatTime(record, self.datefmt)
         # message = self.formatMessage(record)
 
-        record_data = {
+        """ OMG logging are you serious ? """
+        args = record.args
+        if isinstance(args, dict):
+            pass
+        elif isinstance(args, tuple) and len(args) > 0:
+            args = args[0] if isinstance(args[0], dict) else {"log_args": list(args)}
+        else:
+            args = {}
+
+        data = {
+            **args,
             "log_name": record.name,
             "log_level": record.levelname,
             "log_levelno": record.levelno,
@@ -115,21 +467,71 @@ class LogFormatter(logging.Formatter):
             "log_funcName": record.funcName,
             "log_lineno": record.lineno,
         }
+        data["message"] = self.template(record.msg)(data)
+        return data
 
-        """ OMG logging are you serious ? """
-        if isinstance(record.args, dict):
-            data = record.args.copy()
-        elif isinstance(record.args, tuple) and len(record.args) > 0:
-            if isinstance(record.args[0], dict):
-                data = record.args[0].copy()
-            else:
-                data = {"log_args": list(record.args)}
-        else:
-            data = {}
+    def template(self, msg):
+        """
+        A function of the data giving the message, cached per message string
+        (see compile_template).
+        """
+        if not isinstance(msg, str):
+            return lambda data: msg.format(**data)
+        template = self._templates.get(msg, None)
+        if template is None:
+            if len(self._templates) >= TEMPLATE_CACHE_SIZE:
+                self._templates.clear()
+            template = compile_template(msg)
+            self._templates[msg] = template
+        return template
+
+    def formatTime(self, record, datefmt=None):
+        """ Note: in the default format, the time to the second is cached """
+        if datefmt or not self.default_msec_format:
+            return super(LogFormatter, self).formatTime(record, datefmt)
+        second = int(record.created)
+        cached, formatted = self._asctime
+        if cached != second:
+            formatted = strftime(self.default_time_format, self.converter(second))
+            self._asctime = (second, formatted)
+        return self.default_msec_format % (formatted, record.msecs)
+
+
+def compile_template(msg):
+    """
+    Note: the message is parsed once, into its literal text and fields, and
+    formatted from those. Messages without fields are returned as they are.
+    Messages with fields other than plain names (positional, attribute or
+    index fields, or nested in format specs) are left to str.format_map.
+    """
+    try:
+        parsed = list(Formatter().parse(msg))
+    except ValueError:  # unbalanced braces: raise as formatting would
+        return msg.format_map
+    if all(field is None for (_, field, _, _) in parsed):
+        text = "".join(literal for (literal, _, _, _) in parsed)
+        return lambda data: text
+    if any(
+        field is not None
+        and (not field.isidentifier() or "{" in spec or conversion not in CONVERSIONS)
+        for (_, field, spec, conversion) in parsed
+    ):
+        return msg.format_map
+    steps = [
+        (literal, field, spec, CONVERSIONS[conversion])
+        for (literal, field, spec, conversion) in parsed
+    ]
 
-        data.update(record_data)
-        data["message"] = record.msg.format(**data)
-        return data
+    def template(data):
+        parts = []
+        for (literal, field, spec, convert) in steps:
+            parts.append(literal)
+            if field is not None:
+                value = data[field]
+                parts.append(format(value if convert is None else convert(value), spec))
+        return "".join(parts)
+
+    return template
 
 
 class LocalLogFormatter(LogFormatter):
@@ -157,17 +559,13 @@ class LocalLogFormatter(LogFormatter):
 
 
 def stackdriver_log_entry(data, message=None, labels=None, resource=None):
-    rectime = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    rectime = iso_timestamp(time())
     logtime = data.get("log_created", None)
-    timestamp = (
-        rectime
-        if logtime is None
-        else datetime(*gmtime(logtime)[:6]).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-    )
+    timestamp = rectime if logtime is None else iso_timestamp(logtime)
     message = data if message is None else message
     return {
-        "insertId": str(uuid4()),
-        "jsonPayload": {"message": data, "python_logger": data.get("log_name", "")},
+        "insertId": insert_id(),
+        "jsonPayload": {"message": message, "python_logger": data.get("log_name", "")},
         "logName": "local",
         "receiveTimestamp": rectime,
         "resource": {"type": "global", "labels": {}} if resource is None else resource,
@@ -177,6 +575,27 @@ def stackdriver_log_entry(data, message=None, labels=None, resource=None):
     }
 
 
+_INSERT_ID_PREFIX = uuid4().hex
+_insert_ids = count()
+_timestamp_second = (None, None)  # (second, formatted)
+
+
+def insert_id():
+    """ Note: unique as a uuid4 is (random per process), but cheaper """
+    return "%s-%d" % (_INSERT_ID_PREFIX, next(_insert_ids))
+
+
+def iso_timestamp(t):
+    """ The UTC time t in RFC 3339 format, with the time to the second cached """
+    global _timestamp_second
+    second = int(t)
+    cached, formatted = _timestamp_second
+    if cached != second:
+        formatted = strftime("%Y-%m-%dT%H:%M:%S", gmtime(second))
+        _timestamp_second = (second, formatted)
+    return "%s.%06dZ" % (formatted, int((t - second) * 1000000))
+
+
 # ------------------------------------------------------------------------------
 # Instrumentation
 # ------------------------------------------------------------------------------
@@ -283,7 +702,7 @@ def _json_exception(exc, type_key="$type"):
     if hasattr(exc, "to_json"):
         return exc.to_json()
     else:
-        data = exc.__dict__
+        data = dict(exc.__dict__)
         data[type_key] = exc.__class__.__name__
         return data
 
@@ -46,12 +46,14 @@ class DecodeFailure(Exception):
         )
 
 
-def gcf_adapter(decoder, metadata_decoder=None, encoding="utf-8"):
+def gcf_adapter(decoder, metadata_decoder=None, encoding="utf-8", loads=json.loads):
+    """ Note: loads may be e.g. lazy_json.loads, for large payloads """
+
     def _decoded_base64(fn):
         @wraps(fn)
         def __decoded_base64(msg, *args, **kwargs):
             s = b64decode(msg["data"]).decode(encoding)
-            value = json.loads(s)
+            value = loads(s)
             metadata = msg.get("attributes", {})
             return decoded(decoder, metadata_decoder)(fn)(
                 value, metadata, *args, **kwargs
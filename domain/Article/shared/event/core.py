@@ -1,51 +1,39 @@
-from dataclasses import dataclass
-from typing import Union, Iterator
+from typing import Union, Iterator, Optional
 
+from shared.util.record import record
 
-@dataclass
+
+@record
 class SavedArticle:
     id: str
     url: str
 
-    @classmethod
-    def from_json(cls, d: dict):
-        return cls(id=d["id"], url=d["url"])
-
-    def to_json(self) -> dict:
-        return {"$type": self.__class__.__name__, "id": self.id, "url": self.url}
-
     def __str__(self):
         return '%s(id="%s", url="%s")' % (self.__class__.__name__, self.id, self.url)
 
 
+@record
 class SavedNewRequestedArticle(SavedArticle):
     pass
 
 
+@record
 class SavedFetchedArticle(SavedArticle):
-    pass
+    """ Note: duplicate_of is the id of the article this is a near duplicate of """
 
+    duplicate_of: Optional[str] = None
 
+
+@record
 class SavedFetchArticleError(SavedArticle):
     pass
 
 
-@dataclass
+@record
 class SavedArticleIssues:
     article_id: str
     issue_ids: Iterator[str]
 
-    @classmethod
-    def from_json(cls, d: dict) -> "SavedArticleIssues":
-        return cls(article_id=d["article_id"], issue_ids=d["issue_ids"])
-
-    def to_json(self) -> dict:
-        return {
-            "$type": self.__class__.__name__,
-            "article_id": self.article_id,
-            "issue_ids": self.issue_ids,
-        }
-
     def __str__(self):
         return '%s(article_id="%s")' % (self.__class__.__name__, self.article_id)
 
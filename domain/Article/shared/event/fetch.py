@@ -1,62 +1,38 @@
-from dataclasses import dataclass
 from typing import Union
 
 from shared.model import article
+from shared.util.record import json_field, record
 
 
-@dataclass
+@record
 class SucceededFetchingArticle:
     id: str
     url: str
-    article: article.Article
-
-    @classmethod
-    def from_json(cls, d: dict) -> "SucceededFetchingArticle":
-        return cls(id=d["id"], url=d["url"], article=article.from_json(d["article"]))
-
-    def to_json(self) -> dict:
-        return {
-            "$type": self.__class__.__name__,
-            "id": self.id,
-            "url": self.url,
-            "article": self.article.to_json(full=True),
-        }
+    article: "article.Article" = json_field(
+        encode=lambda a: a.to_json(full=True), decode=article.from_json
+    )
 
     def __str__(self):
         return '%s(id="%s", url="%s")' % (self.__class__.__name__, self.id, self.url)
 
 
-@dataclass
+@record
 class SucceededFetchingArticleWithIssues(SucceededFetchingArticle):
     pass
 
 
-@dataclass
+@record
 class FailedFetchingArticle:
     id: str
     url: str
-    error: article.FetchArticleError
+    error: article.FetchArticleError = json_field(
+        decode=article.FetchArticleError.from_json
+    )
 
     @classmethod
     def from_error(cls, id: str, url: str, error: Exception) -> "FailedFetchingArticle":
         return cls(id=id, url=url, error=article.FetchArticleError.from_error(error))
 
-    @classmethod
-    def from_json(cls, d: dict) -> "FailedFetchingArticle":
-        return cls(
-            id=d["id"],
-            url=d["url"],
-            error=article.FetchArticleError.from_json(d["error"]),
-        )
-
-    def to_json(self) -> dict:
-        return {
-            "$type": self.__class__.__name__,
-            "id": self.id,
-            "url": self.url,
-            "error": self.error.to_json(),
-        }
-
     def __str__(self):
         return '%s(id="%s", url="%s")' % (self.__class__.__name__, self.id, self.url)
 
@@ -1,8 +1,9 @@
 from datetime import date
-from typing import List, Optional, Iterator, Union
-from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Iterator, Tuple, Union
 
 import shared.util.date_ as date_
+from shared.util.lazy_json import at_least, resolved
+from shared.util.record import record
 from shared.util.string_ import ellipsis
 
 # ------------------------------------------------------------------------------
@@ -10,17 +11,10 @@ from shared.util.string_ import ellipsis
 # ------------------------------------------------------------------------------
 
 
-@dataclass
+@record
 class RequestedArticle:
     url: str
 
-    @classmethod
-    def from_json(cls, d: dict) -> "RequestedArticle":
-        return cls(url=d["url"])
-
-    def to_json(self) -> dict:
-        return {"$type": self.__class__.__name__, "url": self.url}
-
 
 # ------------------------------------------------------------------------------
 # FETCHED ARTICLE
@@ -28,18 +22,66 @@ class RequestedArticle:
 
 MIN_EXPECTED_SIZE = 1500
 
+Normalizer = Callable[[str], Tuple[str, str]]
+
 
-@dataclass
 class FetchedArticle:
-    title: str
-    authors: List[str]
-    encoding: str
-    raw_html: str
-    text: str
-    html: str
-    publish_date: Optional[date] = None
-    summary: Optional[str] = None
-    site_name: Optional[str] = None
+    """
+    Note: body is the article body extracted from the page (html). The text
+    (markdown) and html (rendered from the text) are derived from it with the
+    normalize function given, on first use; the body is then released, so only
+    one copy of the article is held at a time. The original downloaded page is
+    only held (as page) if it was asked for.
+
+    If decoded with lazy_json, text and html may be held undecoded until they
+    are read (to_json without full only decodes their start).
+    """
+
+    __slots__ = (
+        "title",
+        "authors",
+        "encoding",
+        "body",
+        "_text",
+        "_html",
+        "publish_date",
+        "summary",
+        "site_name",
+        "page",
+        "normalize",
+        "issues",
+        "checked",
+    )
+
+    def __init__(
+        self,
+        title: str,
+        authors: List[str],
+        encoding: str,
+        body: Optional[str] = None,
+        text: Optional[str] = None,
+        html: Optional[str] = None,
+        publish_date: Optional[date] = None,
+        summary: Optional[str] = None,
+        site_name: Optional[str] = None,
+        page: Optional[str] = None,
+        normalize: Optional[Normalizer] = None,
+        issues: Optional[List["ArticleIssue"]] = None,
+    ):
+        """ Note: issues, if given, are trusted as the result of validation """
+        self.title = title
+        self.authors = authors
+        self.encoding = encoding
+        self.body = body
+        self._text = text
+        self._html = html
+        self.publish_date = publish_date
+        self.summary = summary
+        self.site_name = site_name
+        self.page = page
+        self.normalize = normalize
+        self.issues = [] if issues is None else list(issues)
+        self.checked = frozenset() if issues is None else frozenset(STAGES)
 
     @classmethod
     def from_json(cls, d: dict) -> "FetchedArticle":
@@ -49,9 +91,14 @@ class FetchedArticle:
             authors=list(d["authors"]),
             summary=d.get("summary", None),
             encoding=d["encoding"],
-            raw_html=d["raw_html"],
             text=d["text"],
             html=d["html"],
+            page=d.get("page", None),
+            issues=(
+                None
+                if d.get("issues", None) is None
+                else [ArticleIssue.from_json(issue) for issue in d["issues"]]
+            ),
             publish_date=(
                 None
                 if d.get("publish_date", None) is None
@@ -60,7 +107,7 @@ class FetchedArticle:
         )
 
     def to_json(self, full=False) -> dict:
-        return {
+        data = {
             "$type": self.__class__.__name__,
             "site_name": self.site_name,
             "title": self.title,
@@ -71,38 +118,94 @@ class FetchedArticle:
                 else self.summary
             ),
             "encoding": self.encoding,
-            "raw_html": ellipsis(self.raw_html) if not full else self.raw_html,
-            "text": ellipsis(self.text) if not full else self.text,
-            "html": ellipsis(self.html) if not full else self.html,
+            "text": ellipsis(self._derived()[0]) if not full else self.text,
+            "html": ellipsis(self._derived()[1]) if not full else self.html,
             "publish_date": (
                 None if self.publish_date is None else date_.encode(self.publish_date)
             ),
+            "issues": (
+                [issue.to_json() for issue in self.issues] if self.validated() else None
+            ),
         }
+        if self.page is not None:
+            data["page"] = ellipsis(self.page) if not full else self.page
+        return data
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, FetchedArticle):
+            return NotImplemented
+        return self.to_json(full=True) == other.to_json(full=True)
+
+    def __repr__(self) -> str:
+        return "%s(title=%r, site_name=%r, publish_date=%r)" % (
+            self.__class__.__name__,
+            self.title,
+            self.site_name,
+            self.publish_date,
+        )
+
+    @property
+    def text(self) -> Optional[str]:
+        self.derive()
+        self._text = resolved(self._text)
+        return self._text
+
+    @text.setter
+    def text(self, text: Optional[str]):
+        self._text = text
+
+    @property
+    def html(self) -> Optional[str]:
+        self.derive()
+        self._html = resolved(self._html)
+        return self._html
+
+    @html.setter
+    def html(self, html: Optional[str]):
+        self._html = html
+
+    def set_body(self, body: str, normalize: Normalizer):
+        """ Note: text and html derived from any previous body are dropped """
+        self.body = body
+        self.normalize = normalize
+        self._text = None
+        self._html = None
+
+    def derive(self):
+        """ Derive text and html from the body, if not yet done """
+        if self.body is None or self.normalize is None:
+            return
+        self._text, self._html = self.normalize(self.body)
+        self.body = None
+
+    def _derived(self) -> Tuple[Optional[str], Optional[str]]:
+        """ The text and html, which may still be lazy (see from_json) """
+        self.derive()
+        return (self._text, self._html)
 
     def first_author(self) -> Optional[str]:
         return None if len(self.authors) == 0 else self.authors[0]
 
-    def validate(self):
-        issues = []
-        issues.extend(self.validate_length())
-        issues.extend(self.validate_publish_date())
-        # potentially more checks...
-
-        if len(issues) > 0:
-            raise ArticleIssues(issues=issues, article=self)
+    def check(self, stage: str) -> List["ArticleIssue"]:
+        """
+        Run the validators for a stage of parsing (see ValidatorRegistry), if
+        not yet run, and return the issues found so far. Note the body must be
+        set before the body stage is checked.
+        """
+        if stage not in self.checked:
+            self.issues.extend(validation.run(self, stage))
+            self.checked = self.checked | {stage}
+        return self.issues
 
-    def validate_length(self):
-        issues = []
-        size = len(self.html)
-        if size < MIN_EXPECTED_SIZE:
-            issues.append(ArticleIssueShort(size))
-        return issues
+    def validated(self) -> bool:
+        return self.checked.issuperset(STAGES)
 
-    def validate_publish_date(self):
-        issues = []
-        if self.publish_date is None:
-            issues.append(ArticleIssueMissing("publish date"))
-        return issues
+    def validate(self):
+        """ Note: validators only run for stages not already checked """
+        for stage in STAGES:
+            self.check(stage)
+        if len(self.issues) > 0:
+            raise ArticleIssues(issues=list(self.issues), article=self)
 
 
 class ArticleIssues(Warning):
@@ -129,32 +232,112 @@ class ArticleIssues(Warning):
 
 
 class ArticleIssue:
+    __slots__ = ()
+
     @classmethod
     def from_json(cls, d: dict) -> "ArticleIssue":
+        return validation.issue_from_json(d)
+
+    @property
+    def message(self) -> str:
+        return str(self)
+
+
+class ArticleRejected(Exception):
+    """ Raised when a fatal validator finds an issue: the article is unusable """
+
+    def __init__(self, issue: ArticleIssue, article: FetchedArticle):
+        self.issue = issue
+        self.article = article
+
+    def __str__(self) -> str:
+        return "Article '%s' rejected: %s" % (
+            ellipsis(self.article.title, 40),
+            self.issue,
+        )
+
+
+# ------------------------------------------------------------------------------
+# VALIDATION
+# ------------------------------------------------------------------------------
+
+METADATA = "metadata"
+BODY = "body"
+STAGES = (METADATA, BODY)
+
+Check = Callable[[FetchedArticle], Iterator[ArticleIssue]]
+
+
+@record
+class Validator:
+    name: str
+    check: Check
+    stage: str = BODY
+    cost: int = 1
+    fatal: bool = False
+
+
+class ValidatorRegistry:
+    """
+    Validators of fetched articles, and the issue types they find.
+
+    A validator is a function of an article that yields issues. It is
+    registered for the stage of parsing after which it can run (METADATA, once
+    the metadata is parsed, or BODY, once the body is), with its relative cost;
+    within a stage, cheaper validators run first. Validators run during
+    parsing (so a fatal one can end a fetch attempt early, see
+    ArticleRejected), and the issues found are carried on the article.
+
+    Issue types are registered by name, so issues can be decoded by "$type".
+    """
+
+    def __init__(self):
+        self.issue_types: Dict[str, type] = {}
+        self._validators: Dict[str, List[Validator]] = {stage: [] for stage in STAGES}
+
+    def issue_type(self, cls: type) -> type:
+        self.issue_types[cls.__name__] = cls
+        return cls
+
+    def validator(self, stage: str = BODY, cost: int = 1, fatal: bool = False):
+        if stage not in self._validators:
+            raise ValueError("Unknown validation stage %s" % (stage,))
+
+        def register(check: Check) -> Check:
+            validators = self._validators[stage]
+            validators.append(Validator(check.__name__, check, stage, cost, fatal))
+            validators.sort(key=lambda v: v.cost)
+            return check
+
+        return register
+
+    def validators(self, stage: str) -> List[Validator]:
+        return list(self._validators[stage])
+
+    def run(self, article: FetchedArticle, stage: str) -> List[ArticleIssue]:
+        issues = []
+        for validator in self._validators[stage]:
+            for issue in validator.check(article):
+                if validator.fatal:
+                    raise ArticleRejected(issue, article)
+                issues.append(issue)
+        return issues
+
+    def issue_from_json(self, d: dict) -> ArticleIssue:
         typ = d.get("$type", None)
-        if typ == "ArticleIssueShort":
-            return ArticleIssueShort.from_json(d)
-        elif typ == "ArticleIssueMissing":
-            return ArticleIssueMissing.from_json(d)
-        else:
+        if typ not in self.issue_types:
             raise ValueError("Unknown ArticleIssue subclass %s" % (typ,))
+        return self.issue_types[typ].from_json(d)
 
-    def to_json(self) -> dict:
-        typ = self.__class__.__name__
-        msg = str(self)
-        data = self.__dict__
-        data.update({"$type": typ, "message": msg})
-        return data
 
+validation = ValidatorRegistry()
 
-class ArticleIssueShort(ArticleIssue):
-    @classmethod
-    def from_json(cls, d: dict) -> "ArticleIssueShort":
-        return cls(size=d["size"])
 
-    def __init__(self, size: int, ignored: bool = False):
-        self.size = size
-        self.ignored = ignored
+@validation.issue_type
+@record(computed=["message"])
+class ArticleIssueShort(ArticleIssue):
+    size: int
+    ignored: bool = False
 
     def __str__(self) -> str:
         return (
@@ -164,14 +347,11 @@ class ArticleIssueShort(ArticleIssue):
         ).format(size=self.size)
 
 
+@validation.issue_type
+@record(computed=["message"])
 class ArticleIssueMissing(ArticleIssue):
-    @classmethod
-    def from_json(cls, d: dict) -> "ArticleIssueMissing":
-        return cls(field=d["field"])
-
-    def __init__(self, field: str, ignored: bool = False):
-        self.field = field
-        self.ignored = ignored
+    field: str
+    ignored: bool = False
 
     def __str__(self) -> str:
         return (
@@ -180,12 +360,30 @@ class ArticleIssueMissing(ArticleIssue):
         ).format(field=self.field)
 
 
+@validation.validator(stage=METADATA, cost=1)
+def missing_publish_date(article: FetchedArticle) -> Iterator[ArticleIssue]:
+    if article.publish_date is None:
+        yield ArticleIssueMissing("publish date")
+
+
+@validation.validator(stage=BODY, cost=10)
+def short_article(article: FetchedArticle) -> Iterator[ArticleIssue]:
+    """
+    Note: checks the body if text and html are not yet derived from it, so
+    they are not derived here; only decodes lazy html (see lazy_json) if it is
+    short.
+    """
+    content = article.body if article.body is not None else article._html
+    if not at_least(content, MIN_EXPECTED_SIZE):
+        yield ArticleIssueShort(len(resolved(content)))
+
+
 # ------------------------------------------------------------------------------
 # FETCH ARTICLE ERROR
 # ------------------------------------------------------------------------------
 
 
-@dataclass
+@record
 class FetchArticleError:
     error_type: str
     error_message: str
@@ -194,17 +392,6 @@ class FetchArticleError:
     def from_error(cls, error: Exception) -> "FetchArticleError":
         return cls(error_type=error.__class__.__name__, error_message=str(error))
 
-    @classmethod
-    def from_json(cls, d: dict) -> "FetchArticleError":
-        return cls(error_type=d["error_type"], error_message=d["error_message"])
-
-    def to_json(self) -> dict:
-        return {
-            "$type": self.__class__.__name__,
-            "error_type": self.error_type,
-            "error_message": self.error_message,
-        }
-
 
 Article = Union[RequestedArticle, FetchedArticle, FetchArticleError]
 
@@ -2,7 +2,7 @@ import os
 import os.path
 import json
 from functools import wraps
-import ruamel.yaml as yaml
+from ruamel.yaml import YAML
 
 
 def assert_environ(keys):
@@ -30,7 +30,7 @@ def load_json(fname):
 def load_yaml(fname):
     data = None
     with open(fname, "r") as f:
-        data = yaml.safe_load(f)
+        data = YAML(typ="safe").load(f)
     return data
 
 
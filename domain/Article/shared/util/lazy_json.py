@@ -0,0 +1,185 @@
+from functools import lru_cache
+import json
+from json.decoder import scanstring
+import os
+import re
+from typing import Any, FrozenSet, Iterable, Iterator, Optional, Pattern, Tuple, Union
+
+from shared.util.string_ import ellipsis
+
+"""
+JSON decoding that leaves large strings undecoded until they are read.
+
+With lazy_json.loads, string values of the given keys (by default "text"
+and "html", the article payloads) that are at least min_size
+characters long are returned as LazyStrings (unless they have many escaped
+quotes, see lazy_strings): slices of the JSON document, still escaped. Reading one (decode, or str) decodes it; ellipsis decodes just
+enough of the start. The rest of the document is decoded with json.loads as
+usual: the large strings are found by scanning the text for their keys (see
+lazy_strings), and replaced by placeholders before decoding.
+
+Note the document is kept in memory while any LazyString from it is.
+"""
+
+LAZY_KEYS = ("text", "html")
+MIN_SIZE = 1024
+
+MAX_ESCAPE = 12  # a surrogate pair, \uXXXX\uXXXX
+MAX_ESCAPED_QUOTES = 8
+
+
+class LazyString:
+    __slots__ = ("buffer", "start", "end")
+
+    def __init__(self, buffer: str, start: int, end: int):
+        """ Note: start and end are of the escaped string, within its quotes """
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+
+    def decode(self) -> str:
+        return scanstring(self.buffer, self.start)[0]
+
+    def prefix(self, length: int) -> str:
+        """ At least the first length characters (or all, if fewer) """
+        stop = self.start + (length + 1) * MAX_ESCAPE
+        if stop >= self.end:
+            return self.decode()
+        chunk = self.buffer[self.start : stop]
+        for cut in range(len(chunk), len(chunk) - MAX_ESCAPE, -1):
+            try:
+                return scanstring(chunk[:cut] + '"', 0)[0]
+            except ValueError:  # cut within an escape
+                continue
+        return self.decode()
+
+    def ellipsis(self, length: int = 80, take_from: str = "start") -> str:
+        if take_from != "start":
+            return ellipsis(self.decode(), length, take_from)
+        return ellipsis(self.prefix(length + 1), length, take_from)
+
+    def __str__(self) -> str:
+        return self.decode()
+
+    def __repr__(self) -> str:
+        return "%s(%r)" % (self.__class__.__name__, self.ellipsis())
+
+
+def string_end(s: str, start: int, max_escaped: Optional[int] = None) -> int:
+    """
+    The index of the closing quote of the JSON string starting at start (after
+    its opening quote), or -1 if there is none. Note: quotes are found with
+    str.find, which is much faster than a regex; a quote is escaped if an odd
+    number of backslashes precede it. Returns -2 if more than max_escaped
+    escaped quotes were passed (finding the end is then slower than decoding).
+    """
+    pos = start
+    escaped = 0
+    while True:
+        i = s.find('"', pos)
+        if i < 0:
+            return -1
+        j = i - 1
+        while j >= start and s[j] == "\\":
+            j = j - 1
+        if (i - j) % 2 == 1:  # not escaped
+            return i
+        escaped = escaped + 1
+        if max_escaped is not None and escaped > max_escaped:
+            return -2
+        pos = i + 1
+
+
+def at_least(s: Union[str, LazyString], length: int) -> bool:
+    """ Whether s has at least length characters, decoding no more than needed """
+    if isinstance(s, LazyString):
+        return len(s.prefix(length)) >= length
+    return len(s) >= length
+
+
+def resolved(value: Any) -> Any:
+    """ The value, with any LazyString decoded """
+    return value.decode() if isinstance(value, LazyString) else value
+
+
+def lazy_strings(
+    s: str, lazy_keys: Iterable[str], min_size: int
+) -> Iterator[Tuple[int, int, Union[str, LazyString]]]:
+    """
+    The (start, end, value) of each string value of one of lazy_keys that is
+    at least min_size characters long (escaped). Note an unescaped quote
+    followed by the key and a quote can only open that key, and a key is
+    followed by a colon; the document is searched once, skipping the values.
+
+    A string with many escaped quotes (e.g. html) is decoded right away with
+    the C scanner instead, as finding its end would cost more than decoding it.
+    """
+    pattern = key_pattern(frozenset(lazy_keys))
+    pos = 0
+    while True:
+        match = pattern.search(s, pos)
+        if match is None:
+            return
+        i = match.start()
+        start = match.end()
+        j = i - 1
+        while j >= 0 and s[j] == "\\":
+            j = j - 1
+        if (i - j) % 2 == 0:  # escaped, within a string
+            pos = i + 1
+            continue
+        end = string_end(s, start, MAX_ESCAPED_QUOTES)
+        if end == -1:
+            return
+        if end == -2:
+            value, pos = scanstring(s, start)
+            if pos - start - 1 >= min_size:
+                yield (start, pos - 1, value)
+            continue
+        if end - start >= min_size:
+            yield (start, end, LazyString(s, start, end))
+        pos = end + 1
+
+
+@lru_cache(maxsize=8)
+def key_pattern(lazy_keys: FrozenSet[str]) -> Pattern:
+    """ A key of lazy_keys, its colon and the opening quote of a string value """
+    keys = "|".join(re.escape(json.dumps(key)) for key in sorted(lazy_keys))
+    return re.compile(r"(?:%s)[ \t\n\r]*:[ \t\n\r]*\"" % (keys,))
+
+
+def loads(
+    s: Union[str, bytes],
+    lazy_keys: Iterable[str] = LAZY_KEYS,
+    min_size: int = MIN_SIZE,
+) -> Any:
+    """
+    Note: the large strings are replaced by placeholders, then the document is
+    decoded with json.loads, with the placeholders of lazy keys swapped back.
+    """
+    if isinstance(s, bytes):
+        s = s.decode("utf-8")
+    lazy_keys = frozenset(lazy_keys)
+    spans = list(lazy_strings(s, lazy_keys, min_size))
+    if len(spans) == 0:
+        return json.loads(s)
+
+    nonce = os.urandom(8).hex()
+    placeholders = {}
+    parts = []
+    pos = 0
+    for (start, end, value) in spans:
+        placeholder = "lazy:%s:%d" % (nonce, len(placeholders))
+        placeholders[placeholder] = value
+        parts.append(s[pos:start])
+        parts.append(placeholder)
+        pos = end
+    parts.append(s[pos:])
+
+    def object_from_pairs(pairs) -> dict:
+        return {
+            k: (placeholders.get(v, v) if k in lazy_keys and isinstance(v, str) else v)
+            for (k, v) in pairs
+        }
+
+    return json.loads("".join(parts), object_pairs_hook=object_from_pairs)
@@ -0,0 +1,166 @@
+from dataclasses import MISSING, Field, dataclass, field, fields
+from typing import Any, Callable, Iterable, Optional, Tuple, Union
+
+"""
+Compact records for models, events and commands.
+
+@record makes a class a dataclass with __slots__ (so instances carry no
+per-instance __dict__), frozen unless frozen=False, and generates its to_json
+and from_json from its fields, unless the class defines its own. Note the
+slots are added here (see slotted) rather than by dataclass(slots=True), which
+needs Python 3.10.
+
+to_json returns a new dict: the class name as "$type", then each field, then
+any computed attributes named (e.g. a message property). It never changes the
+instance. Records and other values with a to_json are encoded with it; use
+json_field to give a field its own encoder or decoder (e.g. for nested
+records). from_json reads only the fields, and fields with defaults are
+optional.
+
+Note each class in a hierarchy must be decorated itself (even with no fields
+of its own), so that it is slotted and gets methods for its own fields.
+"""
+
+TYPE_KEY = "$type"
+PLAIN_TYPES = (str, int, float, bool, type(None))
+
+
+def json_field(
+    encode: Optional[Callable[[Any], Any]] = None,
+    decode: Optional[Callable[[Any], Any]] = None,
+    **kwargs
+):
+    """ A dataclass field, with its own encoder and/or decoder """
+    metadata = dict(kwargs.pop("metadata", {}))
+    if encode is not None:
+        metadata["encode"] = encode
+    if decode is not None:
+        metadata["decode"] = decode
+    return field(metadata=metadata, **kwargs)
+
+
+def record(cls=None, *, frozen: bool = True, computed: Iterable[str] = ()):
+    def wrap(cls):
+        own = set(cls.__dict__)
+        cls = slotted(dataclass(cls, frozen=frozen), frozen)
+        if "to_json" not in own:
+            cls.to_json = generated_to_json(fields(cls), tuple(computed))
+        if "from_json" not in own:
+            cls.from_json = classmethod(generated_from_json(cls, fields(cls)))
+        return cls
+
+    return wrap if cls is None else wrap(cls)
+
+
+def slotted(cls, frozen: bool):
+    """
+    A copy of the dataclass cls with __slots__ for its fields. Note the class
+    attributes holding field defaults are dropped (the generated __init__ has
+    its own copy), as they would clash with the slots.
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = {
+        k: v
+        for (k, v) in cls.__dict__.items()
+        if k not in names and k not in ("__dict__", "__weakref__")
+    }
+    namespace["__slots__"] = tuple(
+        name for name in names if not any(name in slots_of(b) for b in cls.__mro__[1:])
+    )
+    if frozen:
+        # pickle would restore state with setattr, which frozen classes refuse
+        namespace["__getstate__"] = _getstate
+        namespace["__setstate__"] = _setstate
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+def slots_of(cls) -> Tuple[str, ...]:
+    slots = cls.__dict__.get("__slots__", ())
+    return (slots,) if isinstance(slots, str) else tuple(slots)
+
+
+def _getstate(self) -> tuple:
+    return tuple(getattr(self, f.name) for f in fields(self))
+
+
+def _setstate(self, state: tuple):
+    for (f, value) in zip(fields(self), state):
+        object.__setattr__(self, f.name, value)
+
+
+def encode_value(value: Any) -> Any:
+    return value.to_json() if hasattr(value, "to_json") else value
+
+
+def encode_with(encode: Callable[[Any], Any], value: Any) -> Any:
+    return None if value is None else encode(value)
+
+
+def decode_with(decode: Callable[[Any], Any], value: Any) -> Any:
+    return None if value is None else decode(value)
+
+
+def is_plain(typ) -> bool:
+    """ Whether values of the type are encoded as they are """
+    if typ in PLAIN_TYPES:
+        return True
+    return getattr(typ, "__origin__", None) is Union and all(
+        t in PLAIN_TYPES for t in getattr(typ, "__args__", ())
+    )
+
+
+def generated_to_json(fields_: Tuple[Field, ...], computed: Tuple[str, ...]):
+    """
+    Note: like dataclass methods, generated as source for speed (one dict
+    display, no loop over the fields per call).
+    """
+    scope = {"encode_value": encode_value, "encode_with": encode_with}
+    items = ["%r: self.__class__.__name__" % (TYPE_KEY,)]
+    for (i, f) in enumerate(fields_):
+        if "encode" in f.metadata:
+            scope["encode_%d" % (i,)] = f.metadata["encode"]
+            items.append("%r: encode_with(encode_%d, self.%s)" % (f.name, i, f.name))
+        elif is_plain(f.type):
+            items.append("%r: self.%s" % (f.name, f.name))
+        else:
+            items.append("%r: encode_value(self.%s)" % (f.name, f.name))
+    items.extend("%r: self.%s" % (name, name) for name in computed)
+    source = "def to_json(self):\n    return {%s}\n" % (", ".join(items),)
+    exec(source, scope)
+    return scope["to_json"]
+
+
+def generated_from_json(cls, fields_: Tuple[Field, ...]):
+    """
+    Note: unless the class has a __post_init__, the instance is made without
+    calling __init__, and each field is set with its slot's own setter: a
+    frozen dataclass __init__ sets each field through object.__setattr__,
+    which is slower.
+    """
+    scope = {"decode_with": decode_with, "new": object.__new__}
+    values = []
+    for (i, f) in enumerate(fields_):
+        if f.default is not MISSING:
+            scope["default_%d" % (i,)] = f.default
+            value = "d.get(%r, default_%d)" % (f.name, i)
+        elif f.default_factory is not MISSING:
+            scope["factory_%d" % (i,)] = f.default_factory
+            value = "(d[%r] if %r in d else factory_%d())" % (f.name, f.name, i)
+        else:
+            value = "d[%r]" % (f.name,)
+        if "decode" in f.metadata:
+            scope["decode_%d" % (i,)] = f.metadata["decode"]
+            value = "decode_with(decode_%d, %s)" % (i, value)
+        values.append((f.name, value))
+    if hasattr(cls, "__post_init__"):
+        args = ", ".join("%s=%s" % (name, value) for (name, value) in values)
+        source = "def from_json(cls, d):\n    return cls(%s)\n" % (args,)
+    else:
+        lines = ["def from_json(cls, d):", "    self = new(cls)"]
+        for (i, (name, value)) in enumerate(values):
+            scope["set_%d" % (i,)] = getattr(cls, name).__set__
+            lines.append("    set_%d(self, %s)" % (i, value))
+        lines.append("    return self")
+        source = "\n".join(lines) + "\n"
+    exec(source, scope)
+    return scope["from_json"]
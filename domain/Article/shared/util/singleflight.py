@@ -0,0 +1,64 @@
+import asyncio
+from concurrent.futures import Future
+from threading import Lock
+from typing import Any, Callable, Hashable, Optional
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the
+    function, and any callers arriving while it is still running wait for and
+    share its result (or its error). Once the call completes, the key is
+    forgotten, so later calls run the function again.
+
+    Usable from threads (`do`) and from asyncio (`do_async`, which runs the
+    function in the loop's default executor). Both share the same in-flight
+    calls.
+    """
+
+    def __init__(self, on_coalesced: Optional[Callable[[Hashable], None]] = None):
+        self._lock = Lock()
+        self._calls = {}
+        self._on_coalesced = on_coalesced
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, fn, *args, **kwargs)
+        return future.result()
+
+    async def do_async(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        future, leader = self._join(key)
+        if leader:
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(
+                None, lambda: self._run(key, future, fn, *args, **kwargs)
+            )
+        return await asyncio.wrap_future(future)
+
+    def _join(self, key):
+        with self._lock:
+            future = self._calls.get(key, None)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.coalesced = self.coalesced + 1
+
+        if not leader and self._on_coalesced is not None:
+            self._on_coalesced(key)
+        return (future, leader)
+
+    def _run(self, key, future, fn, *args, **kwargs):
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                del self._calls[key]
+            future.set_exception(e)
+        else:
+            with self._lock:
+                del self._calls[key]
+            future.set_result(result)
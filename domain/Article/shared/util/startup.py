@@ -0,0 +1,167 @@
+import builtins
+from contextlib import contextmanager
+from functools import wraps
+import os
+import sys
+from threading import Lock, get_ident
+from time import perf_counter, time
+from typing import Callable, Dict, List, Optional
+
+"""
+Opt-in profiling of cold starts (set APP_PROFILE_STARTUP=1).
+
+Call begin() at the very top of a main module, before its other imports. From
+then on, the time taken to import each module (with and without the modules
+it imports in turn) is recorded, as are any phases of startup timed with
+phase() (e.g. logging initialization). Wrap the function's handler with
+profiled(): every invocation is then logged as cold (the first in this
+process) or warm, and the first also logs one ColdStart record, with the
+times from process start to begin() and to the first call, and the slowest
+imports and phases.
+
+When not enabled, begin() does nothing, phase() only runs its block, and
+profiled() returns the handler as it is.
+"""
+
+ENV_VAR = "APP_PROFILE_STARTUP"
+TOP_IMPORTS = 25
+
+
+def enabled() -> bool:
+    return os.environ.get(ENV_VAR, None) == "1"
+
+
+class StartupProfile:
+    def __init__(self):
+        self.began_at: Optional[float] = None
+        self.process_started_at: Optional[float] = process_start_time()
+        self.imports: Dict[str, Dict[str, float]] = {}
+        self.phases: Dict[str, float] = {}
+        self.invocations = 0
+        self._stack: List[List[float]] = []
+        self._lock = Lock()
+        self._thread = None
+        self._original_import = None
+
+    def begin(self):
+        if self._original_import is not None:
+            return
+        self.began_at = time()
+        self._thread = get_ident()
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def end_imports(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        if level != 0 or name in sys.modules or get_ident() != self._thread:
+            return original(name, globals, locals, fromlist, level)
+        self._stack.append([0.0])  # time spent in nested imports
+        t0 = perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            seconds = perf_counter() - t0
+            nested = self._stack.pop()[0]
+            if len(self._stack) > 0:
+                self._stack[-1][0] = self._stack[-1][0] + seconds
+            self.imports[name] = {
+                "seconds": seconds,
+                "self_seconds": max(0.0, seconds - nested),
+            }
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = perf_counter() - t0
+
+    def invoked(self) -> bool:
+        """ Count an invocation; whether it is the first (cold) """
+        with self._lock:
+            self.invocations = self.invocations + 1
+            return self.invocations == 1
+
+    def cold_start_record(self, called_at: float) -> dict:
+        slowest = sorted(
+            self.imports.items(), key=lambda item: item[1]["seconds"], reverse=True
+        )[:TOP_IMPORTS]
+        return {
+            "log_type": "ColdStart",
+            "process_start_to_begin": since(self.process_started_at, self.began_at),
+            "process_start_to_first_call": since(self.process_started_at, called_at),
+            "begin_to_first_call": since(self.began_at, called_at),
+            "imported_modules": len(self.imports),
+            "imports": [{"module": name, **seconds} for (name, seconds) in slowest],
+            "phases": dict(self.phases),
+        }
+
+
+def since(start: Optional[float], end: Optional[float]) -> Optional[float]:
+    return None if start is None or end is None else end - start
+
+
+def process_start_time() -> Optional[float]:
+    """ The wall-clock time the process started (Linux only, else None) """
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # the command name (field 2) may contain spaces: split after it
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        ticks = os.sysconf("SC_CLK_TCK")
+        return time() - (uptime - int(fields[19]) / ticks)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+profile = StartupProfile()
+
+
+def begin():
+    if enabled():
+        profile.begin()
+
+
+@contextmanager
+def phase(name: str):
+    if not enabled():
+        yield
+        return
+    with profile.phase(name):
+        yield
+
+
+def profiled(handler: Callable, logger) -> Callable:
+    if not enabled():
+        return handler
+
+    @wraps(handler)
+    def _profiled(*args, **kwargs):
+        called_at = time()
+        cold = profile.invoked()
+        if cold:
+            profile.end_imports()
+            logger.info(
+                "Cold start: {process_start_to_first_call} sec from process start "
+                "to first call",
+                profile.cold_start_record(called_at),
+            )
+        logger.info(
+            "{invocation_start} invocation {invocations}",
+            {
+                "log_type": "Invocation",
+                "invocation_start": "Cold" if cold else "Warm",
+                "cold": cold,
+                "invocations": profile.invocations,
+            },
+        )
+        return handler(*args, **kwargs)
+
+    return _profiled
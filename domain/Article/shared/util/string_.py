@@ -1,4 +1,6 @@
 def ellipsis(s: str, length: int = 80, take_from: str = "start") -> str:
+    if hasattr(s, "ellipsis"):  # e.g. a lazy_json.LazyString
+        return s.ellipsis(length, take_from)
     if len(s) <= length:
         return s
     if take_from == "start":
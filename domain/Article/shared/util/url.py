@@ -1,6 +1,205 @@
-from urllib.parse import urlparse, urlunparse
+from functools import lru_cache
+import re
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+"""
+Canonical urls, so that variants of an article's url (tracking parameters,
+fragments, default ports, `www.`, trailing slashes) share one key
+(see url_key) for deduplicating, caching and coalescing fetches. Note the
+canonical url is lossy (some sites need `www.`, a trailing slash or one of the
+parameters stripped), so it is only ever used as a key: urls are stored and
+fetched as they were requested (see standardized_url).
+
+A Canonicalizer lowercases the scheme and host, removes default ports,
+fragments and tracking parameters, sorts the query, strips `www.` and
+trailing slashes, then applies any rules for the domain. Only parameters that
+are tracking ids on every site are removed everywhere: others (e.g. `ref`,
+`share`, `outputType`) and AMP markers select content on some sites, so they
+are only removed for the domains whose rules say so (see Canonicalizer).
+Results are memoized.
+
+It can also learn aliases, e.g. from redirects or `rel=canonical` links seen
+when fetching: once learned, the canonical url of an alias is the url it was
+learned to be an alias of. Aliases that look like home or section pages are
+not learned, nor are unverified ones (`rel=canonical`) on another host.
+Aliases are kept in memory, up to max_aliases.
+"""
+
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "mc_cid",
+    "mc_eid",
+    "igshid",
+    "yclid",
+    "_ga",
+    "_hsenc",
+    "_hsmi",
+    "mkt_tok",
+    "ref_src",
+    "smid",
+    "smtyp",
+    "cmpid",
+    "ncid",
+    "ocid",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hmb_", "__twitter", "sh_")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+AMP_PATH = re.compile(r"(/amp/?$|/amp(?=/)|\.amp(?=\.html?$))", re.IGNORECASE)
+CACHE_SIZE = 4096
+MAX_ALIASES = 10000
+
+Rule = Tuple[str, str]
+
+AMP_RULE: Rule = (r"(/amp(?=$|[/?])|\.amp(?=\.html?(?:$|\?)))", "")
+
+
+def param_rule(name: str) -> Rule:
+    """ A rule removing the query parameter (its name as in the canonical url) """
+    return (r"(?<=[?&])%s=[^&]*(&|$)" % (re.escape(name),), "")
+
+
+class Canonicalizer:
+    def __init__(
+        self,
+        tracking_params: Iterable[str] = TRACKING_PARAMS,
+        tracking_prefixes: Tuple[str, ...] = TRACKING_PREFIXES,
+        strip_www: bool = True,
+        strip_amp: bool = False,
+        strip_trailing_slash: bool = True,
+        rules: Optional[Dict[str, List[Rule]]] = None,
+        cache_size: int = CACHE_SIZE,
+        max_aliases: int = MAX_ALIASES,
+    ):
+        """
+        Note: rules are by domain, and apply to its subdomains too. Each rule
+        is a (pattern, replacement) pair, as for re.sub on the canonical url:
+        e.g. AMP_RULE, or param_rule("ref"). strip_amp removes AMP markers for
+        every domain.
+        """
+        self.tracking_params = set(p.lower() for p in tracking_params)
+        self.tracking_prefixes = tuple(p.lower() for p in tracking_prefixes)
+        self.strip_www = strip_www
+        self.strip_amp = strip_amp
+        self.strip_trailing_slash = strip_trailing_slash
+        self.rules = {
+            domain.lower(): [(re.compile(p), r) for (p, r) in domain_rules]
+            for (domain, domain_rules) in ({} if rules is None else rules).items()
+        }
+        self.max_aliases = max_aliases
+        self._aliases: Dict[str, str] = {}
+        self._lock = Lock()
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+
+    def canonical(self, url: str) -> str:
+        normalized = self.normalize(url)
+        return self._aliases.get(normalized, normalized)
+
+    def learn(self, url: str, canonical_url: str, verified: bool = False):
+        """
+        Learn that url is an alias of canonical_url. Note: unless verified
+        (e.g. url redirects to it), canonical_url (e.g. from a rel=canonical
+        link) must be on the same host as url. See also plausible_alias.
+        """
+        alias = self.normalize(url)
+        target = self.canonical(canonical_url)
+        same_host = not verified
+        if alias == target or not plausible_alias(alias, target, same_host):
+            return
+        with self._lock:
+            self._aliases[alias] = target
+            while len(self._aliases) > self.max_aliases:
+                self._aliases.pop(next(iter(self._aliases)))
+
+    def _normalize(self, url: str) -> str:
+        parts = urlparse(url.strip())
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or "").rstrip(".")
+        if ":" in host:
+            host = "[%s]" % (host,)
+        if self.strip_www and host.startswith("www."):
+            host = host[4:]
+        netloc = host
+        try:
+            port = parts.port
+        except ValueError:  # not a valid port, leave it be
+            port = None
+            netloc = parts.netloc.rsplit("@", 1)[-1].lower()
+        if port is not None and DEFAULT_PORTS.get(scheme, None) != port:
+            netloc = "%s:%d" % (host, port)
+        if parts.username is not None:
+            netloc = "%s@%s" % (parts.netloc.rsplit("@", 1)[0], netloc)
+
+        path = parts.path
+        if self.strip_amp:
+            path = AMP_PATH.sub("", path)
+        if self.strip_trailing_slash and len(path) > 1:
+            path = path.rstrip("/") or "/"
+
+        query = urlencode(
+            sorted(
+                (k, v)
+                for (k, v) in parse_qsl(parts.query, keep_blank_values=True)
+                if not self.is_tracking_param(k)
+            )
+        )
+        canonical = urlunparse((scheme, netloc, path, parts.params, query, ""))
+        for (pattern, replacement) in self.rules_for(host):
+            canonical = pattern.sub(replacement, canonical)
+        return canonical.rstrip("?&") if query != "" else canonical
+
+    def is_tracking_param(self, name: str) -> bool:
+        name = name.lower()
+        return name in self.tracking_params or name.startswith(self.tracking_prefixes)
+
+    def rules_for(self, host: str) -> List[Tuple[re.Pattern, str]]:
+        if len(self.rules) == 0:
+            return []
+        labels = host.split(".")
+        return [
+            rule
+            for i in range(len(labels))
+            for rule in self.rules.get(".".join(labels[i:]), [])
+        ]
+
+
+def plausible_alias(alias: str, target: str, same_host: bool = True) -> bool:
+    """
+    Whether target could be the canonical url of the article at alias: an http
+    url with a path, which is not a parent of the alias' path (sites point the
+    canonical urls of e.g. removed or paywalled articles at their home or
+    section pages, which would make all such articles share one key).
+    """
+    alias_parts = urlparse(alias)
+    target_parts = urlparse(target)
+    if target_parts.scheme not in ("http", "https"):
+        return False
+    if same_host and alias_parts.netloc != target_parts.netloc:
+        return False
+    alias_path = alias_parts.path.rstrip("/")
+    target_path = target_parts.path.rstrip("/")
+    if target_path == "":
+        return False
+    return target_path == alias_path or not alias_path.startswith(target_path + "/")
+
+
+canonicalizer = Canonicalizer()
 
 
 def standardized_url(url: str) -> str:
+    """ Note: lossless, as urls are stored and fetched as standardized """
     parts = urlparse(url)
     return urlunparse(parts._replace(netloc=parts.netloc.lower()))
+
+
+def url_key(url: str) -> str:
+    """ The canonical url, as the key of an article, e.g. to deduplicate """
+    return canonicalizer.canonical(url)
+
+
+def learn_canonical_url(url: str, canonical_url: str, verified: bool = False):
+    canonicalizer.learn(url, canonical_url, verified=verified)